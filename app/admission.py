@@ -0,0 +1,155 @@
+"""
+Admission - Decide whether the host can take another running profile
+"""
+import collections
+import threading
+import time
+from config import (ADMISSION_COMMIT_RATIO, ADMISSION_MIN_AVAILABLE_MB, ADMISSION_LAUNCH_MB,
+                    ADMISSION_QUEUE_TIMEOUT, ADMISSION_RECHECK_INTERVAL)
+
+MEMINFO_PATH = "/proc/meminfo"
+
+
+def read_meminfo():
+    """MemTotal and MemAvailable in MB"""
+    values = {}
+    with open(MEMINFO_PATH) as f:
+        for line in f:
+            key, _, rest = line.partition(':')
+            if key in ('MemTotal', 'MemAvailable'):
+                values[key] = int(rest.split()[0]) // 1024  # kB -> MB
+    return values['MemTotal'], values['MemAvailable']
+
+
+class _Waiter:
+    __slots__ = ('profile_name', 'on_admit', 'on_timeout', 'is_cancelled', 'deadline')
+
+    def __init__(self, profile_name, on_admit, on_timeout, is_cancelled, deadline):
+        self.profile_name = profile_name
+        self.on_admit = on_admit
+        self.on_timeout = on_timeout
+        self.is_cancelled = is_cancelled
+        self.deadline = deadline
+
+
+class AdmissionController:
+    """Memory-based admission for profile starts
+
+    A start is admitted while (a) the memory limits of running, paused and
+    starting profiles plus the new one stay within ADMISSION_COMMIT_RATIO x
+    MemTotal and (b) MemAvailable minus an ADMISSION_LAUNCH_MB estimate per
+    profile still starting leaves ADMISSION_MIN_AVAILABLE_MB. Admitted
+    starts hold a reservation until release(), so a burst of concurrent
+    starts cannot all pass on the same reading. Queued starts are admitted
+    in FIFO order by one background thread.
+    """
+
+    def __init__(self, docker_mgr):
+        self.docker_mgr = docker_mgr
+        self._lock = threading.Lock()
+        self._inflight = {}  # profile name -> reserved memory limit (MB)
+        self._queue = collections.deque()
+        self._wakeup = threading.Event()
+        threading.Thread(target=self._run_queue, name='admission', daemon=True).start()
+
+    def _evaluate(self, profile_name):
+        """Reason the profile cannot start now, or None; call with the lock held"""
+        statuses = self.docker_mgr.get_status_snapshot()
+        active = {name for name, status in statuses.items() if status in ('running', 'paused')}
+        if profile_name in active or profile_name in self._inflight:
+            # Already holds its memory (resume / duplicate click)
+            return None
+
+        memory_mb = self.docker_mgr.registry.get_resources(profile_name)['memory_mb']
+        committed = sum(self.docker_mgr.registry.get_resources(name)['memory_mb'] for name in active)
+        committed += sum(mb for name, mb in self._inflight.items() if name not in active)
+        try:
+            mem_total, mem_available = read_meminfo()
+        except (OSError, KeyError, ValueError):
+            # Not Linux or no MemAvailable (kernel < 3.14): do not block starts
+            return None
+
+        allowed = int(mem_total * ADMISSION_COMMIT_RATIO)
+        if committed + memory_mb > allowed:
+            return (f'Running profiles already reserve {committed} MB; starting {profile_name} '
+                    f'({memory_mb} MB) would exceed the {allowed} MB allowed on this host')
+
+        starting = sum(1 for name in self._inflight if name not in active)
+        headroom = mem_available - ADMISSION_LAUNCH_MB * (starting + 1)
+        if headroom < ADMISSION_MIN_AVAILABLE_MB:
+            return (f'Only {mem_available} MB of memory is available on the host; '
+                    f'{ADMISSION_MIN_AVAILABLE_MB + ADMISSION_LAUNCH_MB * (starting + 1)} MB '
+                    f'is needed to start another profile')
+        return None
+
+    def try_admit(self, profile_name):
+        """Reserve capacity for a start; returns (admitted, reason)"""
+        with self._lock:
+            reason = self._evaluate(profile_name)
+            if reason is None:
+                self._inflight.setdefault(
+                    profile_name, self.docker_mgr.registry.get_resources(profile_name)['memory_mb'])
+                return True, None
+            return False, reason
+
+    def release(self, profile_name):
+        """Drop the reservation once the start finished (the container now counts itself)"""
+        with self._lock:
+            self._inflight.pop(profile_name, None)
+        self._wakeup.set()
+
+    def enqueue(self, profile_name, on_admit, on_timeout, is_cancelled=lambda: False,
+                timeout=ADMISSION_QUEUE_TIMEOUT):
+        """Admit a start as soon as capacity allows
+
+        on_admit() is called with the reservation held; on_timeout(reason)
+        if it could not be admitted within timeout seconds.
+        """
+        with self._lock:
+            self._queue.append(_Waiter(profile_name, on_admit, on_timeout, is_cancelled,
+                                       time.monotonic() + timeout))
+        self._wakeup.set()
+
+    def status(self):
+        """Host memory, reservations and queue, for /api/admission"""
+        try:
+            mem_total, mem_available = read_meminfo()
+        except (OSError, KeyError, ValueError):
+            mem_total = mem_available = None
+        with self._lock:
+            return {
+                'mem_total_mb': mem_total,
+                'mem_available_mb': mem_available,
+                'starting': dict(self._inflight),
+                'queued': [w.profile_name for w in self._queue],
+            }
+
+    def _run_queue(self):
+        while True:
+            self._wakeup.wait(ADMISSION_RECHECK_INTERVAL)
+            self._wakeup.clear()
+            while True:
+                with self._lock:
+                    if not self._queue:
+                        break
+                    waiter = self._queue[0]
+                    if waiter.is_cancelled():
+                        self._queue.popleft()
+                        continue
+                    reason = self._evaluate(waiter.profile_name)
+                    if reason is None:
+                        self._queue.popleft()
+                        self._inflight.setdefault(
+                            waiter.profile_name,
+                            self.docker_mgr.registry.get_resources(waiter.profile_name)['memory_mb'])
+                        callback = waiter.on_admit
+                    elif time.monotonic() > waiter.deadline:
+                        self._queue.popleft()
+                        callback = lambda: waiter.on_timeout(reason)
+                    else:
+                        # Strict FIFO: later starts wait behind the head of the queue
+                        break
+                try:
+                    callback()
+                except Exception as e:
+                    print(f"⚠️  Admission callback for {waiter.profile_name} failed: {e}")
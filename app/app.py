@@ -1,12 +1,37 @@
 """
 Chrome Isolation Manager - Main Flask Application
 """
-from flask import Flask, render_template, jsonify, request
+from flask import (Flask, Response, g, render_template, jsonify, request, send_file,
+                   stream_with_context)
+import json
 import os
+import queue
 import shutil
-from docker_manager import DockerManager
+import time
+from docker_manager import DockerManager, is_valid_profile_name
 from desktop_manager import DesktopManager
-from config import HOST, PORT, DEBUG, CHROME_PROFILES_DIR
+from event_stream import ContainerEventStream
+from profile_archive import (EXPORT_CODECS, ArchiveImportError, check_export_level,
+                             receive_profile_upload, stream_profile_export,
+                             write_profile_export)
+from jobs import FINISHED_STATES, JobManager, JobCancelled
+from bulk import run_bulk
+from admission import AdmissionController
+from stats_sampler import StatsSampler
+from idle_reaper import IdleReaper
+from profile_compactor import ProfileCompactor
+from profile_clone import ProfileCloner
+from profile_registry import ProfileRegistry
+from profile_feed import SORT_FIELDS, ProfileFeed, ProfileFilter, coarse_stats
+from metrics import REGISTRY, ARCHIVE_BYTES, ARCHIVE_SECONDS, HTTP_REQUEST_SECONDS, count_bytes
+from snapshot_store import SnapshotStore, SnapshotNotFound
+from host_windows import HostWindows
+from launcher_socket import LauncherSocketServer
+from config import (HOST, PORT, DEBUG, CHROME_PROFILES_DIR, EVENTS_HEARTBEAT_INTERVAL,
+                    EXPORT_DEFAULT_CODEC, STOP_TIMEOUT, BULK_DEFAULT_CONCURRENCY,
+                    BULK_MAX_CONCURRENCY, ADMISSION_POLICY, STATS_SAMPLE_INTERVAL, CACHE_MODES,
+                    COMPACTION_MIN_QUOTA_MB, CLONE_MAX_TARGETS, PROFILES_PAGE_MAX,
+                    LAUNCH_WAIT_TIMEOUT, LAUNCH_WAIT_MAX, LAUNCHER_SOCKET)
 
 app = Flask(__name__)
 
@@ -14,31 +39,150 @@ app = Flask(__name__)
 LAUNCHER_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(__file__)), 
                                'scripts', 'chrome-launcher.sh')
 
-docker_mgr = DockerManager()
+# Docker is connected to (and the image built) in the background so the
+# web server is up at once; see /api/health
+registry = ProfileRegistry()
+registry.start()
+job_manager = JobManager()
+docker_mgr = DockerManager(registry, job_manager=job_manager)
 desktop_mgr = DesktopManager(LAUNCHER_SCRIPT)
+event_stream = ContainerEventStream(docker_mgr)
+event_stream.start()
+snapshot_store = SnapshotStore()
+docker_mgr.start_background_init()
+admission = AdmissionController(docker_mgr)
+stats_sampler = StatsSampler(docker_mgr)
+stats_sampler.start()
+idle_reaper = IdleReaper(docker_mgr, stats_sampler, registry, event_stream)
+idle_reaper.start()
+compactor = ProfileCompactor(docker_mgr, registry)
+compactor.start()
+cloner = ProfileCloner()
+host_windows = HostWindows(docker_mgr.launch_context)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    if request.method not in ('GET', 'HEAD'):
+        # Whatever it changed shows up in the next profile list
+        profile_feed.invalidate()
+    started = g.pop('request_started', None)
+    if started is not None:
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            route=request.url_rule.rule if request.url_rule else 'unmatched',
+            status=response.status_code)
+    return response
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics"""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+def job_accepted(job):
+    """202 response pointing at a background job"""
+    response = jsonify({'status': 'queued', 'job_id': job.id, 'job': job.to_dict()})
+    response.headers['Location'] = f'/api/jobs/{job.id}'
+    return response, 202
+
+@app.route('/api/health')
+def health():
+    """Readiness: 200 once Docker is reachable and the image exists, 503 before"""
+    readiness = docker_mgr.readiness
+    return jsonify({
+        'ready': readiness['state'] == 'ready',
+        'docker': readiness,
+        'events_connected': event_stream.connected,
+    }), 200 if readiness['state'] == 'ready' else 503
 
 @app.route('/')
 def index():
     """Main dashboard"""
     return render_template('index.html')
 
+def build_profile_entries():
+    """Current state of every profile, as listed by /api/profiles"""
+    profiles = []
+    
+    # Picks up profile directories added or deleted outside the manager
+    registry.reconcile_if_changed()
+    # One daemon call for all container states, one query for all profiles
+    statuses = docker_mgr.get_status_snapshot()
+    desktop_entries = desktop_mgr.list_desktop_entries()
+    for entry in registry.list():
+        profile_name = entry['name']
+        status = statuses.get(profile_name, 'not_found')
+        size_mb, size_updated_at = docker_mgr.get_profile_size_info(
+            profile_name, running=(status == 'running'))
+        stats = stats_sampler.summary(profile_name) if status == 'running' else None
+        profiles.append({
+            'name': profile_name,
+            'path': entry['path'],
+            'status': status,
+            'size_mb': size_mb,
+            'size_updated_at': size_updated_at,
+            'last_started_at': entry['last_started_at'],
+            'tags': entry['tags'],
+            'resources': entry['resources'],
+            'cache_mode': entry['cache_mode'],
+            'quota_mb': entry['settings'].get('quota_mb'),
+            'template': bool(entry['settings'].get('template')),
+            'stats': coarse_stats(stats),
+            'has_desktop_entry': profile_name in desktop_entries
+        })
+    return profiles
+
+profile_feed = ProfileFeed(build_profile_entries)
+
 @app.route('/api/profiles', methods=['GET'])
 def list_profiles():
-    """List all profiles"""
-    profiles = []
+    """List profiles
+    
+    Filters: ?q= (name contains), ?tag=, ?status=. Sorting: ?sort=name,
+    status, size or last_started and ?order=asc or desc. ?limit= returns
+    pages of that size; pass the response's next_cursor as ?cursor= for the
+    next one. The response's version is also its ETag (If-None-Match gives
+    304 while nothing changed), and ?since=<version> returns only the
+    profiles changed or removed since then ("full": true with the whole
+    list if the version is too old or from before a restart).
+    """
+    args = request.args
+    sort = args.get('sort', 'name')
+    if sort not in SORT_FIELDS:
+        return jsonify({'error': f'sort must be one of: {", ".join(SORT_FIELDS)}'}), 400
+    if args.get('order', 'asc') not in ('asc', 'desc'):
+        return jsonify({'error': 'order must be asc or desc'}), 400
+    limit = args.get('limit', type=int)
+    if 'limit' in args and (limit is None or not 1 <= limit <= PROFILES_PAGE_MAX):
+        return jsonify({'error': f'limit must be between 1 and {PROFILES_PAGE_MAX}'}), 400
+    matches = ProfileFilter(args.get('q'), args.get('tag'), args.get('status'))
     
-    if os.path.exists(CHROME_PROFILES_DIR):
-        for profile_name in os.listdir(CHROME_PROFILES_DIR):
-            profile_path = os.path.join(CHROME_PROFILES_DIR, profile_name)
-            if os.path.isdir(profile_path):
-                profiles.append({
-                    'name': profile_name,
-                    'status': docker_mgr.container_status(profile_name),
-                    'size_mb': docker_mgr.get_profile_size(profile_name),
-                    'has_desktop_entry': desktop_mgr.desktop_entry_exists(profile_name)
-                })
+    try:
+        changes = profile_feed.changes(args['since'], matches) if 'since' in args else None
+        if changes is not None:
+            version, changed, removed = changes
+            body = {'version': version, 'full': False, 'changed': changed, 'removed': removed}
+        else:
+            version, profiles, total, next_cursor = profile_feed.page(
+                matches, sort, args.get('order') == 'desc', limit, args.get('cursor'))
+            body = {'version': version, 'profiles': profiles, 'total': total,
+                    'next_cursor': next_cursor}
+            if 'since' in args:
+                body['full'] = True
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    return jsonify({'profiles': profiles})
+    if request.if_none_match.contains(version):
+        response = Response(status=304)
+    else:
+        response = jsonify(body)
+    response.set_etag(version)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @app.route('/api/profiles', methods=['POST'])
 def create_profile():
@@ -51,7 +195,7 @@ def create_profile():
         return jsonify({'error': 'Profile name is required'}), 400
     
     # Validate profile name (alphanumeric, dash, underscore only)
-    if not all(c.isalnum() or c in '-_' for c in profile_name):
+    if not is_valid_profile_name(profile_name):
         return jsonify({'error': 'Invalid profile name. Use only letters, numbers, dash, and underscore'}), 400
     
     # Determine profile directory
@@ -62,14 +206,17 @@ def create_profile():
             profile_dir = os.path.abspath(profile_dir)
     else:
         # Use default location
-        profile_dir = docker_mgr.get_profile_dir(profile_name)
+        profile_dir = os.path.join(CHROME_PROFILES_DIR, profile_name)
     
+    if os.path.isdir(docker_mgr.get_profile_dir(profile_name)):
+        return jsonify({'error': 'Profile already exists'}), 400
     if os.path.exists(profile_dir):
         return jsonify({'error': 'Profile directory already exists'}), 400
     
-    # Create profile directory
+    # Create profile directory and record where it is
     os.makedirs(profile_dir, exist_ok=True)
     os.makedirs(os.path.join(profile_dir, 'Downloads'), exist_ok=True)
+    registry.register(profile_name, profile_dir)
     
     # Create desktop entry
     desktop_mgr.create_desktop_entry(profile_name)
@@ -80,11 +227,10 @@ def create_profile():
         'path': profile_dir
     })
 
-@app.route('/api/profiles/<profile_name>', methods=['DELETE'])
-def delete_profile(profile_name):
-    """Delete a profile"""
+def remove_profile(profile_name, stop_timeout=STOP_TIMEOUT):
+    """Stop and remove a profile's container, desktop entry, data and settings"""
     # Stop and remove container if exists
-    docker_mgr.stop_container(profile_name)
+    docker_mgr.stop_container(profile_name, timeout=stop_timeout)
     docker_mgr.remove_container(profile_name)
     
     # Remove desktop entry
@@ -94,208 +240,831 @@ def delete_profile(profile_name):
     profile_dir = docker_mgr.get_profile_dir(profile_name)
     if os.path.exists(profile_dir):
         shutil.rmtree(profile_dir)
+    docker_mgr.forget_profile(profile_name)
+    compactor.forget(profile_name)
+    registry.remove(profile_name)
     
+    return {'status': 'deleted'}
+
+@app.route('/api/profiles/<profile_name>', methods=['DELETE'])
+def delete_profile(profile_name):
+    """Delete a profile"""
+    remove_profile(profile_name)
     return jsonify({'status': 'deleted', 'name': profile_name})
 
+@app.route('/api/profiles/<profile_name>/tags', methods=['PUT'])
+def set_profile_tags(profile_name):
+    """Replace the tags of a profile, e.g. {"tags": ["work", "social"]}"""
+    if not is_valid_profile_name(profile_name) or \
+            not os.path.isdir(docker_mgr.get_profile_dir(profile_name)):
+        return jsonify({'error': 'Profile not found'}), 404
+    
+    data = request.get_json(silent=True) or {}
+    tags = data.get('tags')
+    if not isinstance(tags, list) or not all(isinstance(t, str) and t.strip() for t in tags):
+        return jsonify({'error': 'tags must be a list of non-empty strings'}), 400
+    
+    tags = sorted({t.strip() for t in tags})
+    registry.update(profile_name, tags=tags or None)
+    return jsonify({'name': profile_name, 'tags': tags})
+
+# Bulk action -> operation(profile_name, options) returning a result dict
+BULK_ACTIONS = {
+    'start': lambda name, options: start_or_queue(name),
+    'stop': lambda name, options: docker_mgr.stop_container(name, timeout=options['timeout']),
+    'hibernate': lambda name, options: docker_mgr.hibernate_container(
+        name, options.get('reclaim_memory')),
+    'delete': lambda name, options: remove_profile(name, stop_timeout=options['timeout']),
+}
+
+@app.route('/api/profiles/bulk', methods=['POST'])
+def bulk_profiles():
+    """Start, stop, hibernate or delete many profiles concurrently
+    
+    Body: {"action": ..., "profiles": [names]} or {"action": ..., "tag": tag},
+    plus optional "concurrency" and "timeout" (graceful stop seconds).
+    Streams one JSON line per profile as it finishes, then a summary line.
+    """
+    data = request.get_json(silent=True) or {}
+    action = data.get('action')
+    if action not in BULK_ACTIONS:
+        return jsonify({'error': f'action must be one of: {", ".join(BULK_ACTIONS)}'}), 400
+    
+    if 'tag' in data:
+        if not isinstance(data['tag'], str) or not data['tag'].strip():
+            return jsonify({'error': 'tag must be a non-empty string'}), 400
+        profile_names = registry.names_with_tag(data['tag'])
+    else:
+        profile_names = data.get('profiles')
+        if not isinstance(profile_names, list) or not profile_names:
+            return jsonify({'error': 'Provide a non-empty "profiles" list or a "tag"'}), 400
+        profile_names = list(dict.fromkeys(profile_names))
+        if not all(isinstance(n, str) and is_valid_profile_name(n) for n in profile_names):
+            return jsonify({'error': 'Invalid profile name'}), 400
+    
+    concurrency = data.get('concurrency', BULK_DEFAULT_CONCURRENCY)
+    timeout = data.get('timeout', STOP_TIMEOUT)
+    if not isinstance(concurrency, int) or not 1 <= concurrency <= BULK_MAX_CONCURRENCY:
+        return jsonify({'error': f'concurrency must be between 1 and {BULK_MAX_CONCURRENCY}'}), 400
+    if not isinstance(timeout, int) or timeout < 0:
+        return jsonify({'error': 'timeout must be a non-negative integer'}), 400
+    
+    options = {'timeout': timeout, 'reclaim_memory': data.get('reclaim_memory')}
+    operation = BULK_ACTIONS[action]
+    
+    def run(profile_name):
+        if not os.path.isdir(docker_mgr.get_profile_dir(profile_name)):
+            return {'status': 'not_found'}
+        return operation(profile_name, options)
+    
+    def generate():
+        started = time.perf_counter()
+        failed = 0
+        try:
+            for result in run_bulk(profile_names, run, concurrency):
+                failed += result['status'] in ('error', 'refused')
+                yield json.dumps({'action': action, **result}) + '\n'
+        finally:
+            # after_request ran before any of this; the list has changed since
+            profile_feed.invalidate()
+        yield json.dumps({
+            'done': True,
+            'action': action,
+            'total': len(profile_names),
+            'failed': failed,
+            'elapsed': round(time.perf_counter() - started, 3),
+        }) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson', headers={
+        'X-Accel-Buffering': 'no'
+    })
+
 @app.route('/api/profiles/<profile_name>/start', methods=['POST'])
 def start_profile(profile_name):
-    """Start a profile container"""
-    result = docker_mgr.start_container(profile_name)
+    """Start a profile container; {"fresh": true} or ?fresh=1 forces a new container"""
+    data = request.get_json(silent=True) or {}
+    fresh = bool(data.get('fresh')) or request.args.get('fresh') in ('1', 'true')
+    result = start_or_queue(profile_name, fresh)
+    if result['status'] == 'queued':
+        return job_accepted(job_manager.get(result['job_id']))
+    if result['status'] == 'refused':
+        response = jsonify({'error': result['reason']})
+        response.headers['Retry-After'] = '30'
+        return response, 503
     return jsonify(result)
 
+def start_or_queue(profile_name, fresh=False):
+    """Start a profile now if Docker is ready and admission allows it
+    
+    Otherwise the start is queued as a 'start' job (status 'queued' with its
+    job_id) or, with ADMISSION_POLICY = 'refuse', refused (status 'refused')
+    with the reason.
+    """
+    if docker_mgr.is_ready:
+        admitted, reason = admission.try_admit(profile_name)
+        if admitted:
+            try:
+                return docker_mgr.start_container(profile_name, force_recreate=fresh)
+            finally:
+                admission.release(profile_name)
+        if ADMISSION_POLICY == 'refuse':
+            return {'status': 'refused', 'reason': reason}
+    else:
+        reason = 'Waiting for Docker and the browser image'
+    
+    def run(job):
+        job.update(message='Starting profile')
+        try:
+            return docker_mgr.start_container(profile_name, force_recreate=fresh)
+        finally:
+            admission.release(profile_name)
+    
+    def admitted():
+        job_manager.submit('start', run, job=job, on_skip=lambda: admission.release(profile_name))
+    
+    def timed_out(reason):
+        job.finish(error=f'Not started: {reason}')
+    
+    def queue_for_admission():
+        job.update(message='Waiting for memory to start the profile')
+        admission.enqueue(profile_name, admitted, timed_out, lambda: job.cancelled)
+    
+    job = job_manager.create('start')
+    job.update(message=reason)
+    docker_mgr.when_ready(queue_for_admission)
+    return {'status': 'queued', 'job_id': job.id, 'reason': reason}
+
+@app.route('/api/profiles/<profile_name>/launch', methods=['POST'])
+def launch_profile(profile_name):
+    """Start a profile and block until it is ready; raise its window if it already runs
+    
+    Ready means the profile's window is mapped on the host display (with
+    xdotool or wmctrl installed) or else a chromium process is running.
+    Waits ?timeout= seconds (default LAUNCH_WAIT_TIMEOUT), including any time
+    queued for Docker or admission; 504 if the profile is not ready by then.
+    Used by the desktop entries' launcher (scripts/chrome-launch.py).
+    """
+    if not is_valid_profile_name(profile_name) or \
+            not os.path.isdir(docker_mgr.get_profile_dir(profile_name)):
+        return jsonify({'error': 'Profile not found'}), 404
+    try:
+        timeout = float(request.args.get('timeout', LAUNCH_WAIT_TIMEOUT))
+    except ValueError:
+        timeout = -1
+    if not 0 < timeout <= LAUNCH_WAIT_MAX:
+        return jsonify({'error': f'timeout must be between 0 and {LAUNCH_WAIT_MAX} seconds'}), 400
+    started = time.perf_counter()
+    deadline = time.monotonic() + timeout
+    
+    if docker_mgr.is_ready and docker_mgr.container_status(profile_name) == 'running':
+        if host_windows.raise_window(profile_name):
+            return jsonify({'status': 'raised', 'ready': 'window',
+                            'elapsed': round(time.perf_counter() - started, 3)})
+        # No window yet: the profile is still starting, so wait for it below
+        result = {'status': 'already_running'}
+    else:
+        result = start_or_queue(profile_name)
+    if result['status'] == 'refused':
+        response = jsonify({'error': result['reason']})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+    if result['status'] == 'queued':
+        job = job_manager.get(result['job_id'])
+        if not job.wait(deadline - time.monotonic()):
+            return jsonify({'error': f'Still queued: {job.message}', 'job_id': job.id}), 504
+        if job.state != 'succeeded':
+            return jsonify({'error': job.error or 'Start cancelled', 'job_id': job.id}), 500
+        result = job.result
+    
+    if not docker_mgr.wait_until_ready(profile_name, max(deadline - time.monotonic(), 0)):
+        return jsonify({'error': 'Browser did not start in time', **result}), 504
+    ready = 'process'
+    if host_windows.available:
+        if not host_windows.wait(profile_name, max(deadline - time.monotonic(), 0)):
+            return jsonify({'error': 'Browser window did not appear in time', **result}), 504
+        ready = 'window'
+    return jsonify({**result, 'ready': ready,
+                    'elapsed': round(time.perf_counter() - started, 3)})
+
+@app.route('/api/profiles/<profile_name>/resources', methods=['PUT'])
+def set_profile_resources(profile_name):
+    """Set resource limits, e.g. {"memory_mb": 2048, "cpu_shares": 512, "pids_limit": 1024}
+    
+    A null value resets that limit to the default. Applied the next time the
+    profile's container is created (a running profile keeps its limits).
+    """
+    if not is_valid_profile_name(profile_name) or \
+            not os.path.isdir(docker_mgr.get_profile_dir(profile_name)):
+        return jsonify({'error': 'Profile not found'}), 404
+    
+    data = request.get_json(silent=True) or {}
+    limits = {'memory_mb': 256, 'cpu_shares': 2, 'pids_limit': 64}
+    resources = dict(registry.get(profile_name).get('resources', {}))
+    for key, value in data.items():
+        if key not in limits:
+            return jsonify({'error': f'Unknown resource: {key}'}), 400
+        if value is None:
+            resources.pop(key, None)
+        elif not isinstance(value, int) or isinstance(value, bool) or value < limits[key]:
+            return jsonify({'error': f'{key} must be an integer of at least {limits[key]}'}), 400
+        else:
+            resources[key] = value
+    
+    registry.update(profile_name, resources=resources or None)
+    return jsonify({'name': profile_name, 'resources': registry.get_resources(profile_name)})
+
+@app.route('/api/profiles/<profile_name>/cache', methods=['PUT'])
+def set_profile_cache(profile_name):
+    """Choose where the profile's caches live: {"mode": "disk" | "tmpfs" | "scratch"}
+    
+    A null mode resets to the default. Applied the next time the profile's
+    container is created; cache data left behind by the previous mode is
+    removed then.
+    """
+    if not is_valid_profile_name(profile_name) or \
+            not os.path.isdir(docker_mgr.get_profile_dir(profile_name)):
+        return jsonify({'error': 'Profile not found'}), 404
+    
+    data = request.get_json(silent=True) or {}
+    mode = data.get('mode')
+    if mode is not None and mode not in CACHE_MODES:
+        return jsonify({'error': f'mode must be one of: {", ".join(CACHE_MODES)}'}), 400
+    registry.update(profile_name, cache_mode=mode)
+    return jsonify({'name': profile_name, 'cache_mode': registry.get_cache_mode(profile_name)})
+
+@app.route('/api/profiles/<profile_name>/template', methods=['PUT'])
+def set_profile_template(profile_name):
+    """Mark a profile as a template for new profiles: {"template": true}"""
+    if not is_valid_profile_name(profile_name) or \
+            not os.path.isdir(docker_mgr.get_profile_dir(profile_name)):
+        return jsonify({'error': 'Profile not found'}), 404
+    
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data.get('template'), bool):
+        return jsonify({'error': 'template must be true or false'}), 400
+    registry.update(profile_name, template=data['template'] or None)
+    return jsonify({'name': profile_name, 'template': data['template']})
+
+@app.route('/api/templates', methods=['GET'])
+def list_templates():
+    """Profiles marked as templates"""
+    return jsonify({'templates': registry.names_with_setting('template')})
+
+@app.route('/api/profiles/<profile_name>/clone', methods=['POST'])
+def clone_profile(profile_name):
+    """Create new profiles from a stopped profile: {"name": "new"} or {"names": [...]}
+    
+    Data is reflinked where the filesystem supports it and copied otherwise;
+    lock and identity files are not carried over. The new profiles also get
+    the source's settings (tags, resources, ...) except its template flag.
+    """
+    source_dir = docker_mgr.get_profile_dir(profile_name)
+    if not is_valid_profile_name(profile_name) or not os.path.isdir(source_dir):
+        return jsonify({'error': 'Profile not found'}), 404
+    
+    data = request.get_json(silent=True) or {}
+    names = data.get('names', [data['name']] if 'name' in data else None)
+    if not isinstance(names, list) or not names:
+        return jsonify({'error': 'Give the new profile name as "name" or a list as "names"'}), 400
+    if len(names) > CLONE_MAX_TARGETS:
+        return jsonify({'error': f'At most {CLONE_MAX_TARGETS} profiles per request'}), 400
+    names = [name.strip() if isinstance(name, str) else '' for name in names]
+    invalid = [name for name in names if not is_valid_profile_name(name)]
+    if invalid or len(set(names)) != len(names):
+        return jsonify({'error': 'Invalid or duplicate profile names. Use only letters, numbers, dash, and underscore'}), 400
+    existing = [name for name in names if os.path.exists(docker_mgr.get_profile_dir(name))]
+    if existing:
+        return jsonify({'error': f'Profile already exists: {", ".join(existing)}'}), 400
+    if docker_mgr.container_status(profile_name) in ('running', 'paused'):
+        return jsonify({'error': f'Profile {profile_name} is running. Stop it before cloning'}), 409
+    
+    def run(job):
+        # Keeps the source from starting (and changing) while it is read
+        docker_mgr.begin_maintenance(profile_name)
+        try:
+            results = cloner.clone(source_dir, names, job)
+        finally:
+            docker_mgr.end_maintenance(profile_name)
+        
+        settings = {key: value for key, value in registry.get(profile_name).items()
+                    if key != 'template'}
+        for result in results:
+            if result['status'] != 'created':
+                continue
+            registry.register(result['name'], result['path'])
+            if settings:
+                registry.update(result['name'], **settings)
+            docker_mgr.size_index.request_refresh(result['path'])
+            try:
+                desktop_mgr.create_desktop_entry(result['name'])
+            except Exception as e:
+                print(f"⚠️  Failed to create desktop entry for {result['name']}: {e}")
+        
+        created = sum(1 for r in results if r['status'] == 'created')
+        print(f"✅ Cloned {profile_name} into {created}/{len(names)} profile(s)")
+        return {'source': profile_name, 'created': created, 'results': results}
+    
+    return job_accepted(job_manager.submit('clone', run))
+
+@app.route('/api/profiles/<profile_name>/quota', methods=['PUT'])
+def set_profile_quota(profile_name):
+    """Set the disk quota enforced by compaction: {"quota_mb": 2048}, null removes it"""
+    if not is_valid_profile_name(profile_name) or \
+            not os.path.isdir(docker_mgr.get_profile_dir(profile_name)):
+        return jsonify({'error': 'Profile not found'}), 404
+    
+    data = request.get_json(silent=True) or {}
+    quota_mb = data.get('quota_mb')
+    if quota_mb is not None and (not isinstance(quota_mb, int) or isinstance(quota_mb, bool) or
+                                 quota_mb < COMPACTION_MIN_QUOTA_MB):
+        return jsonify({'error': f'quota_mb must be an integer of at least {COMPACTION_MIN_QUOTA_MB}'}), 400
+    registry.update(profile_name, quota_mb=quota_mb)
+    return jsonify({'name': profile_name, 'quota_mb': quota_mb})
+
+@app.route('/api/profiles/<profile_name>/compact', methods=['POST'])
+def compact_profile(profile_name):
+    """Prune disposable data of a stopped profile down to its quota (all of it without one)"""
+    if not is_valid_profile_name(profile_name) or \
+            not os.path.isdir(docker_mgr.get_profile_dir(profile_name)):
+        return jsonify({'error': 'Profile not found'}), 404
+    if docker_mgr.container_status(profile_name) in ('running', 'paused'):
+        return jsonify({'error': 'Stop the profile before compacting it'}), 409
+    
+    job = job_manager.submit('compact', lambda job: compactor.compact(profile_name, job))
+    return job_accepted(job)
+
+@app.route('/api/compaction', methods=['GET'])
+def compaction_status():
+    """Quotas and the last compaction result of each profile"""
+    return jsonify({
+        'quotas': {name: registry.get(name)['quota_mb']
+                   for name in registry.names_with_setting('quota_mb')},
+        'results': compactor.results(),
+    })
+
+@app.route('/api/profiles/<profile_name>/reaper', methods=['PUT'])
+def set_profile_reaper(profile_name):
+    """Exempt a profile from the idle reaper: {"exempt": true}"""
+    if not is_valid_profile_name(profile_name) or \
+            not os.path.isdir(docker_mgr.get_profile_dir(profile_name)):
+        return jsonify({'error': 'Profile not found'}), 404
+    
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data.get('exempt'), bool):
+        return jsonify({'error': 'exempt must be true or false'}), 400
+    registry.update(profile_name, reaper_exempt=data['exempt'] or None)
+    return jsonify({'name': profile_name, 'exempt': data['exempt']})
+
+@app.route('/api/reaper', methods=['GET'])
+def reaper_status():
+    """Idle reaper policy, exempt profiles and how long running profiles have been idle"""
+    return jsonify({
+        'policy': idle_reaper.policy,
+        'exempt': registry.names_with_setting('reaper_exempt'),
+        'profiles': idle_reaper.idle_status(),
+    })
+
+@app.route('/api/reaper', methods=['PUT'])
+def update_reaper():
+    """Change the idle reaper policy, e.g. {"action": "stop", "idle_minutes": 30, "dry_run": true}"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Expected a JSON object'}), 400
+    try:
+        return jsonify({'policy': idle_reaper.update_policy(**data)})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/reaper/audit', methods=['GET'])
+def reaper_audit():
+    """Actions taken (or, in dry-run mode, planned) by the idle reaper, newest first"""
+    limit = min(max(request.args.get('limit', 100, type=int), 1), 1000)
+    return jsonify({'entries': idle_reaper.audit_log(limit)})
+
+@app.route('/api/admission', methods=['GET'])
+def admission_status():
+    """Host memory, starting and queued profiles as seen by admission control"""
+    return jsonify({'policy': ADMISSION_POLICY, **admission.status()})
+
 @app.route('/api/profiles/<profile_name>/stop', methods=['POST'])
 def stop_profile(profile_name):
     """Stop a profile container"""
     result = docker_mgr.stop_container(profile_name)
     return jsonify(result)
 
+@app.route('/api/profiles/<profile_name>/hibernate', methods=['POST'])
+def hibernate_profile(profile_name):
+    """Freeze a running profile; {"reclaim_memory": true} also hints the kernel to swap it out"""
+    data = request.get_json(silent=True) or {}
+    result = docker_mgr.hibernate_container(profile_name, data.get('reclaim_memory'))
+    if result['status'] == 'not_found':
+        return jsonify({'error': 'Profile container not found'}), 404
+    if result['status'] == 'not_running':
+        return jsonify({'error': 'Profile is not running'}), 409
+    return jsonify(result)
+
+@app.route('/api/profiles/<profile_name>/resume', methods=['POST'])
+def resume_profile(profile_name):
+    """Resume a hibernated profile"""
+    result = docker_mgr.resume_container(profile_name)
+    if result['status'] == 'not_found':
+        return jsonify({'error': 'Profile container not found'}), 404
+    if result['status'] == 'not_hibernated':
+        return jsonify({'error': 'Profile is not hibernated'}), 409
+    return jsonify(result)
+
 @app.route('/api/profiles/<profile_name>/status', methods=['GET'])
 def profile_status(profile_name):
     """Get profile status"""
+    status = docker_mgr.container_status(profile_name)
+    size_mb, size_updated_at = docker_mgr.get_profile_size_info(
+        profile_name, running=(status == 'running'))
+    return jsonify({
+        'name': profile_name,
+        'status': status,
+        'size_mb': size_mb,
+        'size_updated_at': size_updated_at
+    })
+
+@app.route('/api/profiles/<profile_name>/stats', methods=['GET'])
+def profile_stats(profile_name):
+    """Recent CPU, memory, network and block I/O samples of a running profile
+    
+    ?since= (unix time) returns only newer samples, for incremental polling.
+    """
+    if not is_valid_profile_name(profile_name) or \
+            not os.path.isdir(docker_mgr.get_profile_dir(profile_name)):
+        return jsonify({'error': 'Profile not found'}), 404
+    
+    since = request.args.get('since', type=float)
     return jsonify({
         'name': profile_name,
         'status': docker_mgr.container_status(profile_name),
-        'size_mb': docker_mgr.get_profile_size(profile_name)
+        'interval': STATS_SAMPLE_INTERVAL,
+        'available': stats_sampler.is_available(profile_name),
+        'memory_limit_bytes': registry.get_resources(profile_name)['memory_mb'] * 1024 * 1024,
+        'samples': stats_sampler.history(profile_name, since),
+    })
+
+@app.route('/api/events', methods=['GET'])
+def profile_events():
+    """Stream profile state changes (started, died, OOM-killed, removed) as Server-Sent Events"""
+    def generate():
+        q = event_stream.subscribe()
+        try:
+            yield f"event: snapshot\ndata: {json.dumps(event_stream.snapshot())}\n\n"
+            while True:
+                try:
+                    delta = q.get(timeout=EVENTS_HEARTBEAT_INTERVAL)
+                except queue.Empty:
+                    # Comment line keeps proxies and the browser from timing out
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"data: {json.dumps(delta)}\n\n"
+        finally:
+            event_stream.unsubscribe(q)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
     })
 
 @app.route('/api/profiles/<profile_name>/export', methods=['GET'])
 def export_profile(profile_name):
-    """Export profile as zip archive - includes all data: logins, cookies, bookmarks, history, extensions, etc."""
-    import zipfile
-    import tempfile
-    from flask import send_file
+    """Export profile as an archive streamed while it is generated - includes all data: logins, cookies, bookmarks, history, extensions, etc.
     
+    Query parameters: codec (store, deflate or zstd) and level (0-9 for deflate,
+    1-22 for zstd).
+    """
     profile_dir = docker_mgr.get_profile_dir(profile_name)
     if not os.path.exists(profile_dir):
         return jsonify({'error': 'Profile not found'}), 404
     
-    # Create temporary zip file
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.zip')
+    codec = request.args.get('codec', EXPORT_DEFAULT_CODEC)
+    if codec not in EXPORT_CODECS:
+        return jsonify({'error': f'Unsupported codec. Use one of: {", ".join(EXPORT_CODECS)}'}), 400
+    level = request.args.get('level', type=int)
+    if 'level' in request.args and level is None:
+        return jsonify({'error': 'level must be an integer'}), 400
+    
+    try:
+        chunks = stream_profile_export(profile_dir, codec, level)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    extension, mimetype = EXPORT_CODECS[codec]
+    return Response(stream_with_context(count_bytes(chunks, 'export')), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="{profile_name}.{extension}"'
+    })
+
+@app.route('/api/profiles/<profile_name>/export', methods=['POST'])
+def create_export_job(profile_name):
+    """Write an export archive in the background; download it from /api/jobs/<id>/artifact
+    
+    Body (optional): {"codec": ..., "level": ...} as for the streaming GET export.
+    """
+    profile_dir = docker_mgr.get_profile_dir(profile_name)
+    if not is_valid_profile_name(profile_name) or not os.path.isdir(profile_dir):
+        return jsonify({'error': 'Profile not found'}), 404
     
+    data = request.get_json(silent=True) or {}
+    codec = data.get('codec', EXPORT_DEFAULT_CODEC)
+    if codec not in EXPORT_CODECS:
+        return jsonify({'error': f'Unsupported codec. Use one of: {", ".join(EXPORT_CODECS)}'}), 400
+    level = data.get('level')
     try:
-        with zipfile.ZipFile(temp_file.name, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            # Walk through the directory and add ALL files (including hidden files)
-            # This ensures we capture:
-            # - Login Data (saved passwords/credentials)
-            # - Cookies
-            # - Bookmarks
-            # - History
-            # - Preferences
-            # - Extensions
-            # - All other profile data
-            # Define exclusion patterns (Cache and Locks)
-            EXCLUDE_DIRS = {'Cache', 'Code Cache', 'GPUCache', 'ShaderCache', 'GrShaderCache'}
-            EXCLUDE_FILES = {'SingletonLock', 'SingletonCookie', 'Lock'}
+        check_export_level(codec, level)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    extension, mimetype = EXPORT_CODECS[codec]
+    
+    def run(job):
+        job.update(message='Writing archive')
+        path = job_manager.artifact_path(job, f'.{extension}')
+        job.update(artifact={'path': path, 'filename': f'{profile_name}.{extension}',
+                             'mimetype': mimetype})
+        with ARCHIVE_SECONDS.time(operation='export'):
+            size = write_profile_export(profile_dir, path, job, codec, level)
+        ARCHIVE_BYTES.inc(size, operation='export')
+        return {'name': profile_name, 'codec': codec, 'bytes': size}
+    
+    return job_accepted(job_manager.submit('export', run))
+
+@app.route('/api/profiles/<profile_name>/snapshots', methods=['POST'])
+def create_snapshot(profile_name):
+    """Snapshot a stopped profile in the background - only chunks not already in the store are written"""
+    profile_dir = docker_mgr.get_profile_dir(profile_name)
+    if not is_valid_profile_name(profile_name) or not os.path.isdir(profile_dir):
+        return jsonify({'error': 'Profile not found'}), 404
+    if docker_mgr.container_status(profile_name) in ('running', 'paused'):
+        return jsonify({'error': f'Profile {profile_name} is running. Stop it before taking a snapshot'}), 409
+    
+    def run(job):
+        job.update(message='Snapshotting profile')
+        # Keeps the profile from starting (and changing) while it is read
+        docker_mgr.begin_maintenance(profile_name)
+        try:
+            return snapshot_store.create(profile_name, profile_dir)
+        finally:
+            docker_mgr.end_maintenance(profile_name)
+    
+    return job_accepted(job_manager.submit('snapshot', run))
+
+@app.route('/api/profiles/<profile_name>/snapshots', methods=['GET'])
+def list_snapshots(profile_name):
+    """List snapshots of a profile, newest first"""
+    if not is_valid_profile_name(profile_name):
+        return jsonify({'error': 'Profile not found'}), 404
+    return jsonify({'snapshots': snapshot_store.list(profile_name)})
+
+@app.route('/api/profiles/<profile_name>/snapshots/<snapshot_id>/restore', methods=['POST'])
+def restore_snapshot(profile_name, snapshot_id):
+    """Restore a snapshot over the profile, or into a new profile given as {"target": name}"""
+    data = request.get_json(silent=True) or {}
+    target_name = data.get('target', profile_name) if isinstance(data, dict) else None
+    if not isinstance(target_name, str) or not is_valid_profile_name(profile_name) or \
+            not is_valid_profile_name(target_name.strip()):
+        return jsonify({'error': 'Invalid profile name'}), 400
+    target_name = target_name.strip()
+    
+    if docker_mgr.container_status(target_name) in ('running', 'paused'):
+        return jsonify({'error': f'Profile {target_name} is running. Stop it before restoring'}), 409
+    
+    target_dir = docker_mgr.get_profile_dir(target_name)
+    if target_name != profile_name and os.path.exists(target_dir):
+        return jsonify({'error': f'Profile {target_name} already exists'}), 400
+    
+    if not snapshot_store.exists(profile_name, snapshot_id):
+        return jsonify({'error': 'Snapshot not found'}), 404
+    
+    def run(job):
+        job.update(message='Restoring snapshot')
+        # Keeps the target from starting while its directory is swapped
+        docker_mgr.begin_maintenance(target_name)
+        try:
+            # Restore next to the profile (on the same filesystem, wherever it
+            # is located), then swap it in so a failure leaves it untouched
+            parent_dir = os.path.dirname(target_dir)
+            staging_dir = os.path.join(parent_dir, f'.restore-{target_name}-{snapshot_id}')
+            try:
+                summary = snapshot_store.restore(profile_name, snapshot_id, staging_dir)
+                os.makedirs(os.path.join(staging_dir, 'Downloads'), exist_ok=True)
+                if os.path.exists(target_dir):
+                    old_dir = os.path.join(parent_dir, f'.replaced-{target_name}-{int(time.time())}')
+                    os.rename(target_dir, old_dir)
+                    os.rename(staging_dir, target_dir)
+                    shutil.rmtree(old_dir, ignore_errors=True)
+                else:
+                    os.rename(staging_dir, target_dir)
+            finally:
+                if os.path.exists(staging_dir):
+                    shutil.rmtree(staging_dir, ignore_errors=True)
             
-            for root, dirs, files in os.walk(profile_dir):
-                # Filter out cache directories to keep export clean and focused on User Data
-                dirs[:] = [d for d in dirs if d not in EXCLUDE_DIRS]
-                
-                for file in files:
-                    if file in EXCLUDE_FILES:
-                        continue
-                        
-                    file_path = os.path.join(root, file)
-                    
-                    # Skip if it's a symlink that points outside the profile
-                    if os.path.islink(file_path):
-                        try:
-                            link_target = os.readlink(file_path)
-                            if not os.path.isabs(link_target) or not link_target.startswith(profile_dir):
-                                continue  # Skip external symlinks
-                        except:
-                            continue
-                    
-                    # Only include files that exist and are readable
-                    if not os.path.isfile(file_path):
-                        continue
-                    
-                    try:
-                        # Calculate arcname (relative path inside zip)
-                        # We want the profile_name as the root folder in the zip
-                        rel_path = os.path.relpath(file_path, os.path.dirname(profile_dir))
-                        zipf.write(file_path, rel_path)
-                    except (OSError, PermissionError) as e:
-                        # Skip files we can't read (permissions, locked files, etc.)
-                        continue
+            registry.register(target_name, target_dir)
+        finally:
+            docker_mgr.end_maintenance(target_name)
+        docker_mgr.size_index.request_refresh(target_dir)
+        if not desktop_mgr.desktop_entry_exists(target_name):
+            desktop_mgr.create_desktop_entry(target_name)
         
-        return send_file(
-            temp_file.name,
-            as_attachment=True,
-            download_name=f'{profile_name}.zip',
-            mimetype='application/zip'
-        )
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-    finally:
-        # Clean up temp file after sending (if it still exists)
+        return {'status': 'restored', 'name': target_name, 'path': target_dir, 'snapshot': summary}
+    
+    return job_accepted(job_manager.submit('restore', run))
+
+@app.route('/api/profiles/<profile_name>/snapshots/<snapshot_id>', methods=['DELETE'])
+def delete_snapshot(profile_name, snapshot_id):
+    """Delete a snapshot and garbage-collect chunks only it referenced"""
+    if not is_valid_profile_name(profile_name):
+        return jsonify({'error': 'Snapshot not found'}), 404
+    try:
+        result = snapshot_store.delete(profile_name, snapshot_id)
+    except SnapshotNotFound:
+        return jsonify({'error': 'Snapshot not found'}), 404
+    return jsonify({'status': 'deleted', 'id': snapshot_id, **result})
+
+@app.route('/api/snapshots/prune', methods=['POST'])
+def prune_snapshots():
+    """Keep the newest keep_last snapshots (per profile, or of one "profile") and free unused chunks"""
+    data = request.get_json(silent=True) or {}
+    keep_last = data.get('keep_last')
+    profile_name = data.get('profile')
+    if not isinstance(keep_last, int) or keep_last < 0:
+        return jsonify({'error': 'keep_last must be a non-negative integer'}), 400
+    if profile_name is not None and not is_valid_profile_name(profile_name):
+        return jsonify({'error': 'Invalid profile name'}), 400
+    
+    return jsonify(snapshot_store.prune(keep_last, profile_name))
+
+@app.route('/api/image/build', methods=['POST'])
+def build_image():
+    """Rebuild the browser image in the background (joins a build already running)"""
+    return job_accepted(docker_mgr.request_build())
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """List jobs, newest first; ?kind= filters by job kind"""
+    jobs = sorted(job_manager.list(request.args.get('kind')), key=lambda j: j.created_at,
+                  reverse=True)
+    return jsonify({'jobs': [job.to_dict() for job in jobs]})
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Get state and progress of a job"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancel a queued or running job"""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Stream progress of one job as Server-Sent Events until it finishes"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    def generate():
+        q = job_manager.subscribe()
         try:
-            if os.path.exists(temp_file.name):
-                # File will be deleted after Flask sends it, but we try anyway
-                pass
-        except:
-            pass
+            update = job.to_dict()
+            while True:
+                yield f"data: {json.dumps(update)}\n\n"
+                if update['state'] in FINISHED_STATES:
+                    return
+                update = None
+                while update is None:
+                    try:
+                        candidate = q.get(timeout=EVENTS_HEARTBEAT_INTERVAL)
+                        if candidate['id'] == job_id:
+                            update = candidate
+                    except queue.Empty:
+                        # Re-sent as heartbeat, which also catches up on dropped updates
+                        update = job.to_dict()
+        finally:
+            job_manager.unsubscribe(q)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/api/jobs/<job_id>/log', methods=['GET'])
+def job_log(job_id):
+    """Stream a job's output (e.g. docker build) as plain text, following it until the job ends"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    def generate():
+        cursor = 0
+        while True:
+            finished = job.finished
+            lines, cursor = job.read_log(cursor, timeout=EVENTS_HEARTBEAT_INTERVAL)
+            if lines:
+                yield ''.join(f'{line}\n' for line in lines)
+            if finished:
+                return
+    
+    return Response(generate(), mimetype='text/plain', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/api/jobs/<job_id>/artifact', methods=['GET'])
+def job_artifact(job_id):
+    """Download the file produced by a finished job (e.g. an export)"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job.state != 'succeeded' or not job.artifact or not os.path.exists(job.artifact['path']):
+        return jsonify({'error': 'Job has no artifact'}), 404
+    return send_file(job.artifact['path'], mimetype=job.artifact['mimetype'],
+                     as_attachment=True, download_name=job.artifact['filename'])
+
+@app.route('/api/imports', methods=['POST'])
+def create_import_job():
+    """Create an import job up front so its progress can be followed during the upload"""
+    job = job_manager.create('import')
+    return jsonify({'job_id': job.id}), 201
+
+@app.route('/api/imports/<job_id>', methods=['GET'])
+def import_job_status(job_id):
+    """Get progress of an import job"""
+    job = job_manager.get(job_id)
+    if job is None or job.kind != 'import':
+        return jsonify({'error': 'Import job not found'}), 404
+    return jsonify(job.to_dict())
 
 @app.route('/api/profiles/import', methods=['POST'])
 def import_profile():
-    """Import profile from archive (zip or tar.gz) - restores all data including logins, cookies, bookmarks, etc."""
-    import zipfile
-    import tarfile
-    import tempfile
+    """Import profile from archive (zip or tar.gz) - restores all data including logins, cookies, bookmarks, etc.
     
-    if 'file' not in request.files:
+    The archive is read straight from the request body (filename in the
+    ?filename= parameter). Multipart form uploads are rejected: Werkzeug
+    would spool the whole file before the import could start. Pass ?job_id=
+    from POST /api/imports to follow progress. Once the upload is received
+    the rest of the import (zip extraction) continues as a background job
+    and 202 is returned.
+    """
+    if request.mimetype == 'multipart/form-data':
+        return jsonify({'error': 'Send the archive as the raw request body, '
+                                 'with its name in ?filename='}), 415
+    stream, filename = request.stream, request.args.get('filename', '')
+    if not request.content_length and not request.headers.get('Transfer-Encoding'):
         return jsonify({'error': 'No file provided'}), 400
     
-    file = request.files['file']
-    if file.filename == '':
-        return jsonify({'error': 'No file selected'}), 400
-    
-    # Save uploaded file temporarily
-    # We don't enforce extension check here to allow flexibility
-    suffix = os.path.splitext(file.filename)[1]
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
-    file.save(temp_file.name)
+    job = job_manager.get(request.args.get('job_id', '')) or job_manager.create('import')
+    if job.kind != 'import' or job.state != 'queued':
+        return jsonify({'error': 'Import job already used'}), 409
+    job.update(bytes_total=request.content_length)
     
+    # The request body can only be read here, in the request thread
+    started = time.perf_counter()
     try:
-        profile_name = None
-        
-        # Try opening as ZIP
-        if zipfile.is_zipfile(temp_file.name):
-            with zipfile.ZipFile(temp_file.name, 'r') as zipf:
-                file_list = zipf.namelist()
-                if not file_list:
-                    raise Exception('Empty archive')
-                
-                # Get profile name from archive structure
-                first_item = file_list[0]
-                if '/' in first_item:
-                    profile_name = first_item.split('/')[0]
-                else:
-                    # If no directory structure, use filename without extension
-                    profile_name = os.path.splitext(file.filename)[0]
-                
-                profile_dir = docker_mgr.get_profile_dir(profile_name)
-                if os.path.exists(profile_dir):
-                    raise Exception(f'Profile {profile_name} already exists')
-                
-                # Extract all files preserving directory structure
-                # This restores all profile data including:
-                # - Login Data (saved passwords/credentials)
-                # - Cookies
-                # - Bookmarks
-                # - History
-                # - Preferences
-                # - Extensions
-                # - All other profile data
-                zipf.extractall(path=CHROME_PROFILES_DIR)
-                
-        # Try opening as TAR (tar.gz, .tgz, etc)
-        elif tarfile.is_tarfile(temp_file.name):
-            with tarfile.open(temp_file.name, 'r:*') as tar:
-                members = tar.getmembers()
-                if not members:
-                    raise Exception('Empty archive')
-                
-                # Get profile name from archive structure
-                profile_name = members[0].name.split('/')[0]
-                profile_dir = docker_mgr.get_profile_dir(profile_name)
-                
-                if os.path.exists(profile_dir):
-                    raise Exception(f'Profile {profile_name} already exists')
-                
-                # Extract all files preserving directory structure and permissions
-                tar.extractall(path=CHROME_PROFILES_DIR)
-        else:
-            raise Exception('Unsupported archive format. Please use .zip or .tar.gz')
-        
-        # Verify the profile directory was created
-        profile_dir = docker_mgr.get_profile_dir(profile_name)
-        if not os.path.exists(profile_dir):
-            raise Exception(f'Failed to extract profile directory')
+        pending = receive_profile_upload(
+            stream, os.path.basename(filename), job,
+            profile_exists=lambda name: os.path.exists(docker_mgr.get_profile_dir(name)))
+    except ArchiveImportError as e:
+        job.finish(error=str(e))
+        return jsonify({'error': str(e), 'job_id': job.id}), e.status_code
+    except JobCancelled:
+        job.update(state='cancelled', message='Cancelled', finished_at=time.time())
+        return jsonify({'error': 'Import cancelled', 'job_id': job.id}), 409
+    except Exception as e:
+        job.finish(error=str(e))
+        return jsonify({'error': str(e), 'job_id': job.id}), 500
+    
+    def run(job):
+        profile_name, profile_dir = pending.complete()
+        ARCHIVE_SECONDS.observe(time.perf_counter() - started, operation='import')
+        registry.register(profile_name, profile_dir)
         
         # Ensure Downloads directory exists (Chrome expects it)
-        downloads_dir = os.path.join(profile_dir, 'Downloads')
-        os.makedirs(downloads_dir, exist_ok=True)
-            
-        # Create desktop entry
-        if profile_name:
-            desktop_mgr.create_desktop_entry(profile_name)
+        os.makedirs(os.path.join(profile_dir, 'Downloads'), exist_ok=True)
         
-        # Clean up temp file
-        os.unlink(temp_file.name)
+        # Create desktop entry
+        desktop_mgr.create_desktop_entry(profile_name)
         
-        return jsonify({
+        return {
             'status': 'imported',
             'name': profile_name,
             'path': profile_dir,
             'message': 'Profile imported successfully with all data (logins, cookies, bookmarks, history, extensions, etc.)'
-        })
-    except Exception as e:
-        if os.path.exists(temp_file.name):
-            os.unlink(temp_file.name)
-        return jsonify({'error': str(e)}), 500
+        }
+    
+    return job_accepted(job_manager.submit('import', run, job=job, on_skip=pending.discard))
 
 if __name__ == '__main__':
     print(f"🚀 Chrome Isolation Manager starting on http://{HOST}:{PORT}")
     print(f"📁 Profiles directory: {CHROME_PROFILES_DIR}")
-    app.run(host=HOST, port=PORT, debug=DEBUG)
+    LauncherSocketServer(app, LAUNCHER_SOCKET).start()
+    # threaded: each open /api/events stream holds a request thread
+    app.run(host=HOST, port=PORT, debug=DEBUG, threaded=True)
@@ -0,0 +1,34 @@
+"""
+Bulk - Apply one profile operation to many profiles concurrently
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+def run_bulk(profile_names, operation, concurrency):
+    """Run operation(profile_name) for every profile on a bounded thread pool
+
+    Yields one result dict per profile in completion order, so the total
+    time is that of the slowest batch rather than the sum of all of them.
+    Profiles not started yet are cancelled if the consumer stops iterating
+    (e.g. the client disconnected).
+    """
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='bulk')
+    try:
+        futures = {}
+        for profile_name in profile_names:
+            futures[executor.submit(_timed, operation, profile_name)] = profile_name
+        for future in as_completed(futures):
+            yield {'name': futures[future], **future.result()}
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _timed(operation, profile_name):
+    started = time.perf_counter()
+    try:
+        result = operation(profile_name)
+    except Exception as e:
+        result = {'status': 'error', 'error': str(e)}
+    result['elapsed'] = round(time.perf_counter() - started, 3)
+    return result
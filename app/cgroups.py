@@ -0,0 +1,53 @@
+"""
+Cgroups - Locate and use the cgroup of a profile container on the host
+"""
+import glob
+import os
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+
+# cgroup v2 layouts for the systemd and cgroupfs drivers, rootless Docker,
+# then the cgroup v1 memory hierarchy
+_CGROUP_PATTERNS = [
+    "system.slice/docker-{id}.scope",
+    "docker/{id}",
+    "user.slice/user-*.slice/user@*.service/*/docker-{id}.scope",
+    "memory/system.slice/docker-{id}.scope",
+    "memory/docker/{id}",
+]
+
+
+def find_container_cgroup(container_id):
+    """Get the cgroup directory of a container, or None if it cannot be found"""
+    for pattern in _CGROUP_PATTERNS:
+        matches = glob.glob(os.path.join(CGROUP_ROOT, pattern.format(id=container_id)))
+        if matches:
+            return matches[0]
+    return None
+
+
+def reclaim_memory(container_id):
+    """Ask the kernel to swap out / drop a container's memory (cgroup v2 memory.reclaim)
+
+    Used as a swap-out hint for hibernated profiles. Returns 'applied',
+    'unsupported' (no cgroup v2 or kernel older than 5.19) or
+    'permission_denied' (the cgroup files are usually root-owned).
+    """
+    cgroup_dir = find_container_cgroup(container_id)
+    if cgroup_dir is None:
+        return 'unsupported'
+    reclaim_path = os.path.join(cgroup_dir, 'memory.reclaim')
+    if not os.path.exists(reclaim_path):
+        return 'unsupported'
+
+    try:
+        with open(os.path.join(cgroup_dir, 'memory.current')) as f:
+            current = int(f.read())
+        with open(reclaim_path, 'w') as f:
+            f.write(str(current))
+    except PermissionError:
+        return 'permission_denied'
+    except OSError:
+        # EAGAIN: the kernel could not reclaim the full amount, which is expected
+        pass
+    return 'applied'
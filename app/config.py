@@ -7,16 +7,223 @@ import os
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 CHROME_PROFILES_DIR = os.path.expanduser("~/Chrome")
 DESKTOP_ENTRIES_DIR = os.path.expanduser("~/.local/share/applications")
+# Manager state that must survive reinstalls (install.sh wipes the install dir)
+DATA_DIR = os.path.expanduser("~/.local/state/chrome-isolation-manager")
+SNAPSHOTS_DIR = os.path.join(DATA_DIR, "snapshots")
+# Background job artifacts (e.g. exports), deleted with the job
+JOBS_DIR = os.path.join(DATA_DIR, "jobs")
+# Profile registry (SQLite): every profile's directory, settings, tags and
+# cached size/launch state. Directories changed outside the manager are
+# reconciled every REGISTRY_RECONCILE_INTERVAL seconds (and on listing when
+# CHROME_PROFILES_DIR itself changed).
+REGISTRY_DB_FILE = os.path.join(DATA_DIR, "profiles.db")
+REGISTRY_RECONCILE_INTERVAL = 60
+# Idle SQLite connections kept for reuse (request threads are short-lived)
+REGISTRY_POOL_SIZE = 8
+# Settings file of earlier versions, imported into the registry once
+PROFILE_SETTINGS_FILE = os.path.join(DATA_DIR, "profile-settings.json")
+# Idle reaper policy (as changed via the API) and audit log
+REAPER_POLICY_FILE = os.path.join(DATA_DIR, "reaper-policy.json")
+REAPER_AUDIT_FILE = os.path.join(DATA_DIR, "reaper-audit.jsonl")
 
 # Docker configuration
 DOCKER_IMAGE_NAME = "isolated-chrome"
+# Image build context; images are tagged with a hash of these files (keep
+# in sync with .dockerignore) and only rebuilt when it changes
+BUILD_CONTEXT_DIR = os.path.dirname(BASE_DIR)
+IMAGE_CONTEXT_FILES = ['Dockerfile', 'chrome-entrypoint.sh']
+IMAGE_CONTEXT_LABEL = "chrome-isolation.context-hash"
 CONTAINER_PREFIX = "chrome-"
+# Labels set on profile containers; the fingerprint identifies the effective
+# launch configuration so unchanged containers can be restarted as-is
+PROFILE_LABEL = "chrome-isolation.profile"
+FINGERPRINT_LABEL = "chrome-isolation.fingerprint"
+
+# Seconds between attempts to reach the Docker daemon at startup
+DOCKER_RETRY_INTERVAL = 5
+
+# Container status snapshot: one containers.list() serves every profile
+# lookup until it is older than this many seconds (or explicitly invalidated)
+STATUS_CACHE_TTL = 2.0
+
+# A launch counts as ready once a chromium process shows up in the container
+CHROMIUM_READY_TIMEOUT = 30
+CHROMIUM_READY_POLL_INTERVAL = 0.2
+
+# POST /api/profiles/<name>/launch waits up to LAUNCH_WAIT_TIMEOUT seconds
+# (?timeout=, at most LAUNCH_WAIT_MAX) for the profile to be ready: its
+# window mapped on the host display when xdotool or wmctrl is installed,
+# else a chromium process running
+LAUNCH_WAIT_TIMEOUT = 30
+LAUNCH_WAIT_MAX = 300
+WINDOW_POLL_INTERVAL = 0.2
+# Seconds before a hung xdotool/wmctrl call is given up on
+WINDOW_TOOL_TIMEOUT = 5
+
+# Default per-profile resource limits, overridable per profile via
+# PUT /api/profiles/<name>/resources
+DEFAULT_PROFILE_RESOURCES = {
+    'memory_mb': 4096,   # hard memory limit (mem_limit)
+    'cpu_shares': 1024,  # relative CPU weight under contention
+    'pids_limit': 2048,  # processes and threads
+}
+
+# Admission control: a start is admitted only while the memory limits of
+# running profiles stay below ADMISSION_COMMIT_RATIO x host RAM and the
+# host keeps ADMISSION_MIN_AVAILABLE_MB of MemAvailable after reserving
+# ADMISSION_LAUNCH_MB for the new profile. Otherwise the start is queued
+# ('queue', for up to ADMISSION_QUEUE_TIMEOUT seconds) or refused ('refuse').
+ADMISSION_POLICY = 'queue'
+ADMISSION_COMMIT_RATIO = 1.5
+ADMISSION_MIN_AVAILABLE_MB = 512
+ADMISSION_LAUNCH_MB = 768
+ADMISSION_QUEUE_TIMEOUT = 600
+ADMISSION_RECHECK_INTERVAL = 2
+
+# Seconds Chrome gets to shut down cleanly on stop before it is killed
+STOP_TIMEOUT = 10
+
+# Bulk operations (/api/profiles/bulk): default and maximum number of
+# profiles handled concurrently
+BULK_DEFAULT_CONCURRENCY = 8
+BULK_MAX_CONCURRENCY = 32
+
+# Hibernate (docker pause): also ask the kernel to swap the frozen profile out
+# (the idle reaper always does)
+HIBERNATE_RECLAIM_MEMORY = False
+
+# Profile size index: cached sizes older than this are rescanned in the
+# background; directories are fully re-listed at least every
+# SIZE_FULL_RESCAN_INTERVAL seconds even if their mtime did not change
+SIZE_REFRESH_INTERVAL = 30
+SIZE_FULL_RESCAN_INTERVAL = 600
+# Watch directories of running profiles with inotify for faster updates
+SIZE_INDEX_INOTIFY = True
+
+# Profile data that is disposable (caches) or must not be copied (locks);
+# excluded from exports
+EXCLUDE_DIRS = {'Cache', 'Code Cache', 'GPUCache', 'ShaderCache', 'GrShaderCache'}
+EXCLUDE_FILES = {'SingletonLock', 'SingletonCookie', 'Lock'}
+
+# Cloning profiles from templates: files that identify or lock the source
+# profile are not copied (the identity files are regenerated on first
+# start), nor is the top-level Downloads folder. Files are reflinked
+# (FICLONE) where the filesystem supports it, otherwise copied on
+# CLONE_WORKERS threads. At most CLONE_MAX_TARGETS clones per request.
+CLONE_STRIP_FILES = EXCLUDE_FILES | {'SingletonSocket', 'hardware-signature.json', 'user-agent.txt'}
+CLONE_WORKERS = min(32, (os.cpu_count() or 2) * 4)
+CLONE_MAX_TARGETS = 200
+
+# Disk quotas: every COMPACTION_INTERVAL seconds, stopped profiles above
+# their quota_mb setting have disposable directories removed, least recently
+# written first, until they fit. COMPACTION_DIRS are the export exclusions
+# plus crash dumps and Service Worker caches.
+COMPACTION_INTERVAL = 3600
+COMPACTION_DIRS = EXCLUDE_DIRS | {'Crashpad', 'Crash Reports', 'CacheStorage'}
+COMPACTION_MIN_QUOTA_MB = 100
+
+# Where Chromium keeps each EXCLUDE_DIRS cache inside the container. The HTTP
+# cache goes to $XDG_CACHE_HOME, the others live in the profile directory.
+CACHE_CONTAINER_PATHS = {
+    'Cache': '/home/chrome/.cache/chromium',
+    'Code Cache': '/home/chrome/.config/chromium/Default/Code Cache',
+    'GPUCache': '/home/chrome/.config/chromium/Default/GPUCache',
+    'ShaderCache': '/home/chrome/.config/chromium/ShaderCache',
+    'GrShaderCache': '/home/chrome/.config/chromium/GrShaderCache',
+}
+# Cache placement for profiles without their own setting: 'disk' (inside
+# the profile directory), 'tmpfs' (in RAM, size-capped, lost on stop; the
+# pages count towards the container's memory limit) or 'scratch' (bind
+# mounts under CACHE_SCRATCH_DIR, ideally on a fast local disk)
+CACHE_DEFAULT_MODE = 'disk'
+CACHE_MODES = ('disk', 'tmpfs', 'scratch')
+# tmpfs size cap per cache directory (MB); others get CACHE_TMPFS_DEFAULT_MB
+CACHE_TMPFS_MB = {'Cache': 512, 'Code Cache': 128}
+CACHE_TMPFS_DEFAULT_MB = 64
+# Owner of the tmpfs mounts: the image's chrome user (Dockerfile USER_ID/GROUP_ID)
+CACHE_TMPFS_OWNER = (1000, 1000)
+CACHE_SCRATCH_DIR = os.path.join(DATA_DIR, "cache-scratch")
+
+# Streaming export: default codec ('store', 'deflate' or 'zstd'), output
+# chunk size, files up to EXPORT_PARALLEL_MAX_FILE bytes are compressed in
+# parallel on EXPORT_WORKERS threads
+EXPORT_DEFAULT_CODEC = 'deflate'
+EXPORT_CHUNK_SIZE = 1024 * 1024
+EXPORT_PARALLEL_MAX_FILE = 4 * 1024 * 1024
+EXPORT_WORKERS = os.cpu_count() or 2
+
+# Import limits: compressed upload size, total extracted size, entry count;
+# zip members are extracted on IMPORT_WORKERS threads
+IMPORT_MAX_UPLOAD_BYTES = 20 * 1024 ** 3
+IMPORT_MAX_BYTES = 50 * 1024 ** 3
+IMPORT_MAX_ENTRIES = 500000
+IMPORT_WORKERS = os.cpu_count() or 2
+
+# Snapshots: files are split into fixed-size chunks stored once by SHA-256
+SNAPSHOT_CHUNK_SIZE = 1024 * 1024
+SNAPSHOT_WORKERS = os.cpu_count() or 2
+
+# Background jobs: worker threads, seconds finished jobs and their
+# artifacts are kept, cleanup period, minimum seconds between progress events
+JOB_WORKERS = 4
+JOB_RETENTION = 3600
+JOB_CLEANUP_INTERVAL = 60
+JOB_PROGRESS_INTERVAL = 0.25
+# Output lines kept per job (e.g. docker build logs)
+JOB_LOG_LINES = 2000
+# Job kinds someone is waiting on (queued profile starts, /launch) run on
+# their own JOB_INTERACTIVE_WORKERS threads, never behind builds, exports,
+# clones or compaction
+JOB_INTERACTIVE_KINDS = ('start',)
+JOB_INTERACTIVE_WORKERS = 4
+
+# Resource telemetry: seconds between samples of running profiles and
+# samples kept per profile (300 x 2 s = the last 10 minutes)
+STATS_SAMPLE_INTERVAL = 2
+STATS_HISTORY = 300
+
+# Idle reaper: act on running profiles whose CPU use and network traffic
+# stayed below the thresholds (percent of one core, bytes/s) for
+# idle_minutes. action is 'hibernate', 'stop' or 'notify'; dry_run only
+# records what would have been done. Changeable at runtime via /api/reaper.
+DEFAULT_REAPER_POLICY = {
+    'enabled': True,
+    'action': 'hibernate',
+    'idle_minutes': 60,
+    'dry_run': False,
+    'cpu_threshold': 2.0,
+    'net_threshold': 2048,
+}
+REAPER_CHECK_INTERVAL = 60
+REAPER_AUDIT_MAX_BYTES = 1024 * 1024
+
+# Profile list (/api/profiles): it is rebuilt at most every PROFILE_FEED_TTL
+# seconds however many clients poll (and after any change made through the
+# API); removals are remembered for delta (?since=) requests for the last
+# PROFILE_FEED_TOMBSTONES profiles. At most PROFILES_PAGE_MAX per page.
+PROFILE_FEED_TTL = 1.0
+PROFILE_FEED_TOMBSTONES = 1000
+PROFILES_PAGE_MAX = 1000
+# Telemetry in the list is rounded to these steps, so a profile only gets
+# a new version when its load visibly changes (/api/profiles/<name>/stats
+# has the exact samples)
+PROFILE_FEED_CPU_STEP = 5
+PROFILE_FEED_MEMORY_STEP_MB = 16
+
+# Docker events stream / Server-Sent Events
+EVENTS_RECONNECT_DELAY = 5
+EVENTS_HEARTBEAT_INTERVAL = 15
 
 # Web server configuration
 HOST = "127.0.0.1"
 PORT = 5000
 DEBUG = False
+# The API is also served on this Unix socket, for scripts/chrome-launch.py.
+# A fixed path under DATA_DIR: the systemd service has no XDG_RUNTIME_DIR,
+# while desktop sessions do, so both sides must not depend on it.
+LAUNCHER_SOCKET = os.path.join(DATA_DIR, 'chrome-isolation-manager.sock')
 
 # Ensure directories exist
 os.makedirs(CHROME_PROFILES_DIR, exist_ok=True)
 os.makedirs(DESKTOP_ENTRIES_DIR, exist_ok=True)
+os.makedirs(DATA_DIR, exist_ok=True)
@@ -71,3 +71,12 @@ X-AppImage-Version={profile_name}
     def desktop_entry_exists(self, profile_name):
         """Check if desktop entry exists"""
         return os.path.exists(self.get_desktop_file_path(profile_name))
+
+    def list_desktop_entries(self):
+        """Names of all profiles that have a desktop entry (one directory listing)"""
+        try:
+            file_names = os.listdir(DESKTOP_ENTRIES_DIR)
+        except FileNotFoundError:
+            return set()
+        return {name[len('chrome-'):-len('.desktop')] for name in file_names
+                if name.startswith('chrome-') and name.endswith('.desktop')}
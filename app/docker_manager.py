@@ -1,101 +1,534 @@
 """
 Docker Manager - Handle container lifecycle operations
 """
+import collections
 import docker
+import hashlib
+import requests
+import json
 import os
+import shutil
 import subprocess
-from config import DOCKER_IMAGE_NAME, CONTAINER_PREFIX, CHROME_PROFILES_DIR
+import threading
+import time
+import cgroups
+from launch_context import HostLaunchContext
+from metrics import LAUNCH_PHASE_SECONDS, LAUNCHES_TOTAL, record_docker_response
+from config import (DOCKER_IMAGE_NAME, CONTAINER_PREFIX, STATUS_CACHE_TTL,
+                    PROFILE_LABEL, FINGERPRINT_LABEL, HIBERNATE_RECLAIM_MEMORY,
+                    CHROMIUM_READY_TIMEOUT, CHROMIUM_READY_POLL_INTERVAL, STOP_TIMEOUT,
+                    BULK_MAX_CONCURRENCY, DOCKER_RETRY_INTERVAL, BUILD_CONTEXT_DIR,
+                    IMAGE_CONTEXT_FILES, IMAGE_CONTEXT_LABEL, CACHE_CONTAINER_PATHS,
+                    CACHE_TMPFS_MB, CACHE_TMPFS_DEFAULT_MB, CACHE_TMPFS_OWNER, CACHE_SCRATCH_DIR)
 from desktop_manager import DesktopManager
+from size_index import ProfileSizeIndex
+from profile_registry import ProfileRegistry, is_valid_profile_name
+from stealth_identity import StealthIdentities
+from jobs import Job
+
+def image_context_hash():
+    """SHA-256 over the files that make up the image build context"""
+    digest = hashlib.sha256()
+    for name in sorted(IMAGE_CONTEXT_FILES):
+        digest.update(name.encode() + b'\0')
+        with open(os.path.join(BUILD_CONTEXT_DIR, name), 'rb') as f:
+            digest.update(f.read())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def image_tag_for(context_hash):
+    return f"{DOCKER_IMAGE_NAME}:ctx-{context_hash[:12]}"
 
 class DockerManager:
-    def __init__(self):
-        self.client = docker.from_env()
-        self.ensure_image_exists()
+    """Container lifecycle for profiles
+
+    Nothing touches the Docker daemon at construction time: the client is
+    created on first use, and start_background_init() connects, checks the
+    image and builds it if missing while the web server is already serving.
+    """
+
+    def __init__(self, registry=None, client=None, job_manager=None):
+        self.registry = registry or ProfileRegistry()
+        # A given client (e.g. the benchmark's fake) is used as-is, without metrics hooks
+        self._client = client
+        self._client_fixed = client is not None
+        self._client_lock = threading.Lock()
+        # Readiness: connecting -> (docker_unavailable) -> (building) -> ready,
+        # or build_failed until a build is requested again
+        self._ready_lock = threading.Lock()
+        self._readiness = {'state': 'connecting', 'message': '', 'build_job_id': None,
+                           'since': time.time()}
+        self._ready_callbacks = []
+        # Runs image builds; without one (e.g. in scripts) they run synchronously
+        self._job_manager = job_manager
+        self._build_job = None
+        # Image launches use (content-hash tag or image ID); None until ready
+        self.image_ref = None
+        self._stale_images = False
+        self._retired_images = set()
+        self._gc_lock = threading.Lock()
+        # Profile name -> container status, refreshed by one containers.list()
+        self._status_snapshot = None
+        self._status_snapshot_time = 0.0
+        self._status_lock = threading.Lock()
+        # Sizes are cached in the registry, so they are known right after a restart
+        self.size_index = ProfileSizeIndex(on_scanned=self.registry.record_size)
+        for profile_dir, size_bytes, updated_at in self.registry.cached_sizes():
+            self.size_index.seed(profile_dir, size_bytes, updated_at)
+        self.launch_context = HostLaunchContext()
+        self.identities = StealthIdentities()
+        # Profiles whose desktop entry is known to exist
+        self._desktop_entries = set()
+        # Profiles being started / having their files maintained (compaction);
+        # the two exclude each other
+        self._maintenance_lock = threading.Lock()
+        self._starting = collections.Counter()
+        self._maintenance = set()
         # Initialize desktop manager for creating desktop entries
         launcher_script = os.path.join(os.path.dirname(os.path.dirname(__file__)), 
                                        'scripts', 'chrome-launcher.sh')
         self.desktop_mgr = DesktopManager(launcher_script)
     
-    def ensure_image_exists(self):
-        """Check if Docker image exists, build if missing"""
+    @property
+    def client(self):
+        """Docker client, created on first use"""
+        with self._client_lock:
+            if self._client is None:
+                # Bulk operations talk to the daemon from many threads at once; a pool
+                # smaller than that would serialise them on connection checkout
+                client = docker.from_env(max_pool_size=BULK_MAX_CONCURRENCY + 4)
+                # Count and time every Docker API call for /metrics
+                client.api.hooks['response'].append(record_docker_response)
+                self._client = client
+            return self._client
+    
+    def _reset_client(self):
+        with self._client_lock:
+            if self._client is not None and not self._client_fixed:
+                self._client.close()
+                self._client = None
+    
+    @property
+    def readiness(self):
+        with self._ready_lock:
+            return dict(self._readiness)
+    
+    @property
+    def is_ready(self):
+        return self.readiness['state'] == 'ready'
+    
+    def _set_readiness(self, state, message=''):
+        with self._ready_lock:
+            if self._readiness['state'] != state:
+                self._readiness['since'] = time.time()
+            self._readiness.update(state=state, message=message)
+            callbacks = []
+            if state == 'ready':
+                callbacks, self._ready_callbacks = self._ready_callbacks, []
+        for callback in callbacks:
+            callback()
+    
+    def when_ready(self, callback):
+        """Call callback() now if ready, otherwise as soon as the image is available"""
+        with self._ready_lock:
+            if self._readiness['state'] != 'ready':
+                self._ready_callbacks.append(callback)
+                return
+        callback()
+    
+    def start_background_init(self, job_manager=None):
+        """Connect to Docker and make sure the image exists, without blocking the caller"""
+        if job_manager is not None:
+            self._job_manager = job_manager
+        threading.Thread(target=self._initialize, name='docker-init', daemon=True).start()
+    
+    def _initialize(self):
+        while True:
+            try:
+                self._select_image()
+                return
+            except (docker.errors.DockerException, requests.exceptions.ConnectionError) as e:
+                if self.readiness['state'] != 'docker_unavailable':
+                    print(f"⚠️  Docker is not available, retrying every {DOCKER_RETRY_INTERVAL}s: {e}")
+                self._set_readiness('docker_unavailable', str(e))
+                self._reset_client()
+            time.sleep(DOCKER_RETRY_INTERVAL)
+    
+    def _select_image(self):
+        """Use the image built from the current build context, building it if needed
+        
+        While a changed build context is rebuilt, launches keep using the
+        previous image, so an upgrade never makes profiles unstartable.
+        """
+        expected = image_tag_for(image_context_hash())
+        try:
+            self.client.images.get(expected)
+            print(f"✅ Docker image '{expected}' found")
+            self.image_ref = expected
+            self._set_readiness('ready')
+            self.collect_stale_images()
+            return
+        except docker.errors.ImageNotFound:
+            pass
+        
         try:
-            self.client.images.get(DOCKER_IMAGE_NAME)
-            print(f"✅ Docker image '{DOCKER_IMAGE_NAME}' found")
+            previous = self.client.images.get(f"{DOCKER_IMAGE_NAME}:latest")
+            self.image_ref = previous.id
+            # Untagged by the rebuild, so the cleanup has to remember it
+            self._retired_images.add(previous.id)
+            self._set_readiness('ready')
+            print(f"ℹ️  Build context changed, rebuilding '{expected}' in the background")
         except docker.errors.ImageNotFound:
-            print(f"⚠️  Docker image '{DOCKER_IMAGE_NAME}' not found. Building...")
-            self.build_image()
+            print(f"⚠️  Docker image '{DOCKER_IMAGE_NAME}' not found. Building in the background...")
+        self.request_build()
     
-    def build_image(self):
-        """Build the Docker image"""
+    def request_build(self):
+        """Build the image as a background job; returns the running build job if there is one"""
+        with self._ready_lock:
+            if self._build_job is not None and not self._build_job.finished:
+                return self._build_job
+            # Rebuilding an existing image keeps the current one usable meanwhile
+            if self._readiness['state'] != 'ready':
+                self._readiness.update(state='building', message='Building the browser image',
+                                       since=time.time())
+            if self._job_manager is not None:
+                self._build_job = self._job_manager.submit('build', self._run_build)
+                self._readiness['build_job_id'] = self._build_job.id
+                return self._build_job
+            job = self._build_job = Job('build')
+            self._readiness['build_job_id'] = job.id
+        
+        # No job manager: build in the caller's thread
+        job.update(state='running')
         try:
-            # Get the directory containing the Dockerfile
-            dockerfile_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            
-            print(f"🔨 Building Docker image from {dockerfile_dir}...")
+            job.finish(result=self._run_build(job))
+        except Exception as e:
+            job.finish(error=str(e))
+        return job
+    
+    def _run_build(self, job):
+        job.update(message='Building image')
+        try:
+            tag = self.build_image(job)
+        except Exception as e:
+            if not self.is_ready:
+                self._set_readiness('build_failed', str(e))
+            raise
+        # Containers pick up the new image the next time they are started
+        if self.image_ref:
+            try:
+                self._retired_images.add(self.client.images.get(self.image_ref).id)
+            except docker.errors.ImageNotFound:
+                pass
+        self.image_ref = tag
+        self._set_readiness('ready')
+        self.collect_stale_images()
+        return {'image': tag}
+    
+    def build_image(self, job=None):
+        """Build the Docker image and tag it with its build context hash
+        
+        Output is streamed line by line to stdout and to the job log; the
+        job can cancel the build. Returns the content-hash tag.
+        """
+        try:
+            context_hash = image_context_hash()
+            tag = image_tag_for(context_hash)
+            print(f"🔨 Building Docker image {tag} from {BUILD_CONTEXT_DIR}...")
             
             # Use subprocess to run docker build with BuildKit
             env = os.environ.copy()
             env['DOCKER_BUILDKIT'] = '1'
             
-            result = subprocess.run(
-                ['docker', 'build', '-t', DOCKER_IMAGE_NAME, dockerfile_dir],
+            process = subprocess.Popen(
+                ['docker', 'build', '--progress=plain',
+                 '--label', f'{IMAGE_CONTEXT_LABEL}={context_hash}',
+                 '-t', tag, '-t', f'{DOCKER_IMAGE_NAME}:latest', BUILD_CONTEXT_DIR],
                 env=env,
-                capture_output=True,
-                text=True
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                bufsize=1
             )
+            tail = collections.deque(maxlen=20)
+            try:
+                for line in process.stdout:
+                    line = line.rstrip('\n')
+                    tail.append(line)
+                    print(f"   {line}")
+                    if job is not None:
+                        job.log(line)
+                        if job.cancelled:
+                            process.terminate()
+                process.wait()
+            finally:
+                if process.poll() is None:
+                    process.kill()
+                    process.wait()
+            if job is not None:
+                job.raise_if_cancelled()
             
-            if result.returncode == 0:
-                print(f"✅ Successfully built Docker image '{DOCKER_IMAGE_NAME}'")
-            else:
-                print(f"❌ Failed to build Docker image:")
-                print(result.stderr)
-                raise Exception(f"Docker build failed: {result.stderr}")
+            if process.returncode == 0:
+                print(f"✅ Successfully built Docker image '{tag}'")
+                return tag
+            
+            print(f"❌ Failed to build Docker image:")
+            raise Exception("Docker build failed: " + "\n".join(tail))
                 
         except Exception as e:
             print(f"❌ Error building Docker image: {e}")
             raise
     
+    def collect_stale_images(self):
+        """Remove images of this repository other than the one in use
+        
+        An image still used by a running or paused container is kept until
+        a later pass (stale containers are recreated on their next start
+        anyway); stopped containers of a stale image are removed with it.
+        Returns the IDs of the removed images.
+        """
+        if not self.image_ref or not self._gc_lock.acquire(blocking=False):
+            return []
+        removed = []
+        try:
+            current_id = self.client.images.get(self.image_ref).id
+            self._stale_images = False
+            # Tagged images of the repository, plus earlier builds left
+            # untagged when :latest moved on
+            candidates = {image.id for image in self.client.images.list(name=DOCKER_IMAGE_NAME)}
+            candidates.update(image.id for image in self.client.images.list(
+                filters={'label': IMAGE_CONTEXT_LABEL}))
+            candidates.update(self._retired_images)
+            candidates.discard(current_id)
+            for image_id in sorted(candidates):
+                try:
+                    image = self.client.images.get(image_id)
+                except docker.errors.ImageNotFound:
+                    self._retired_images.discard(image_id)
+                    continue
+                containers = self.client.containers.list(all=True, filters={'ancestor': image.id})
+                if any(c.status in ('running', 'paused', 'restarting') for c in containers):
+                    self._stale_images = True
+                    continue
+                try:
+                    for container in containers:
+                        container.remove(force=True)
+                    self.client.images.remove(image.id, force=True)
+                    self._retired_images.discard(image.id)
+                    removed.append(image.id)
+                    print(f"🗑️  Removed stale Docker image {image.short_id}")
+                except docker.errors.APIError as e:
+                    self._stale_images = True
+                    print(f"⚠️  Failed to remove stale image {image.short_id}: {e}")
+            if removed:
+                self.invalidate_status_cache()
+        except (docker.errors.DockerException, requests.exceptions.ConnectionError) as e:
+            print(f"⚠️  Stale image cleanup failed: {e}")
+        finally:
+            self._gc_lock.release()
+        return removed
+    
+    def on_container_stopped(self):
+        """Called when a profile container exits; retries deferred image cleanup"""
+        if self._stale_images:
+            threading.Thread(target=self.collect_stale_images, name='image-gc',
+                             daemon=True).start()
+    
     def get_container_name(self, profile_name):
         """Get container name for a profile"""
         return f"{CONTAINER_PREFIX}{profile_name}"
     
     def get_profile_dir(self, profile_name):
-        """Get profile directory path"""
-        return os.path.join(CHROME_PROFILES_DIR, profile_name)
+        """Get profile directory path (as recorded in the registry)"""
+        return self.registry.path(profile_name)
     
     def container_exists(self, profile_name):
         """Check if container exists"""
-        try:
-            self.client.containers.get(self.get_container_name(profile_name))
-            return True
-        except docker.errors.NotFound:
-            return False
+        return profile_name in self.get_status_snapshot()
     
     def container_status(self, profile_name):
         """Get container status"""
+        return self.get_status_snapshot().get(profile_name, "not_found")
+    
+    def get_status_snapshot(self):
+        """Get a profile name -> container status map for all profile containers
+        
+        Served from a single containers.list() call that is reused for
+        STATUS_CACHE_TTL seconds, so listing N profiles costs one daemon round
+        trip instead of N.
+        """
+        with self._status_lock:
+            now = time.monotonic()
+            if (self._status_snapshot is None or
+                    now - self._status_snapshot_time > STATUS_CACHE_TTL):
+                try:
+                    self._status_snapshot = self._fetch_status_snapshot()
+                except (docker.errors.DockerException, requests.exceptions.ConnectionError) as e:
+                    # Daemon down or still starting: report every profile as not found
+                    print(f"⚠️  Failed to list containers: {e}")
+                    return {}
+                self._status_snapshot_time = now
+            return dict(self._status_snapshot)
+    
+    def invalidate_status_cache(self):
+        """Drop the status snapshot so the next lookup hits the daemon"""
+        with self._status_lock:
+            self._status_snapshot = None
+    
+    def _fetch_status_snapshot(self):
+        """List all profile containers in one call"""
+        # sparse=True avoids docker-py inspecting every container individually;
+        # the name filter is a substring match, so re-check the prefix below
+        containers = self.client.containers.list(
+            all=True, sparse=True, filters={'name': CONTAINER_PREFIX})
+        
+        snapshot = {}
+        for container in containers:
+            for name in container.attrs.get('Names') or []:
+                name = name.lstrip('/')
+                if name.startswith(CONTAINER_PREFIX):
+                    snapshot[name[len(CONTAINER_PREFIX):]] = container.attrs.get('State')
+        return snapshot
+    
+    def start_container(self, profile_name, force_recreate=False):
+        """Start a Chrome container for the profile
+        
+        A stopped container whose launch fingerprint matches the current
+        configuration is restarted as-is; it is recreated only when the
+        configuration drifted or force_recreate is set.
+        """
+        with self._maintenance_lock:
+            if profile_name in self._maintenance:
+                raise RuntimeError(f"Profile {profile_name} is being compacted, try again shortly")
+            self._starting[profile_name] += 1
         try:
-            container = self.client.containers.get(self.get_container_name(profile_name))
-            return container.status
+            return self._start_container(profile_name, force_recreate)
+        finally:
+            with self._maintenance_lock:
+                self._starting[profile_name] -= 1
+                if not self._starting[profile_name]:
+                    del self._starting[profile_name]
+    
+    def begin_maintenance(self, profile_name):
+        """Block starts of a stopped profile while its files are modified
+        
+        Returns the profile's (stopped) container or None if it has none;
+        raises RuntimeError if the profile is running, paused or starting.
+        Pair with end_maintenance().
+        """
+        with self._maintenance_lock:
+            if profile_name in self._starting or profile_name in self._maintenance:
+                raise RuntimeError('profile is starting or already being maintained')
+            try:
+                container = self.client.containers.get(self.get_container_name(profile_name))
+            except docker.errors.NotFound:
+                container = None
+            if container is not None and container.status in ('running', 'paused', 'restarting'):
+                raise RuntimeError(f'profile is {container.status}')
+            self._maintenance.add(profile_name)
+            return container
+    
+    def end_maintenance(self, profile_name):
+        with self._maintenance_lock:
+            self._maintenance.discard(profile_name)
+    
+    def _start_container(self, profile_name, force_recreate):
+        container_name = self.get_container_name(profile_name)
+        started = time.perf_counter()
+        
+        # Check if container already exists
+        try:
+            with LAUNCH_PHASE_SECONDS.time(phase='inspect'):
+                container = self.client.containers.get(container_name)
+            if container.status == "running":
+                LAUNCHES_TOTAL.inc(result='already_running')
+                return {"status": "already_running"}
+            if container.status == "paused":
+                LAUNCHES_TOTAL.inc(result='resumed')
+                return self.resume_container(profile_name)
         except docker.errors.NotFound:
-            return "not_found"
+            container = None
+        
+        if self.image_ref is None:
+            raise RuntimeError("The browser image is not ready yet")
+        launch_config = self._build_launch_config(profile_name)
+        with LAUNCH_PHASE_SECONDS.time(phase='image_check'):
+            fingerprint = self._launch_fingerprint(launch_config)
+        
+        if container is not None:
+            if not force_recreate and container.labels.get(FINGERPRINT_LABEL) == fingerprint:
+                with LAUNCH_PHASE_SECONDS.time(phase='container_start'):
+                    container.start()
+                self.invalidate_status_cache()
+                self.registry.record_start(profile_name, fingerprint)
+                self._launched(container, started, 'reused')
+                return {"status": "started", "container_id": container.id, "reused": True}
+            
+            # Remove the stopped container so it is re-created from the latest image
+            # This ensures updates to the Dockerfile/Flags are applied immediately
+            print(f"♻️  Recreating container {container_name} (launch configuration changed)")
+            with LAUNCH_PHASE_SECONDS.time(phase='container_remove'):
+                container.remove(force=True)
+            self.invalidate_status_cache()
+        
+        # Create and start container
+        with LAUNCH_PHASE_SECONDS.time(phase='containers_run'):
+            container = self.client.containers.run(
+                detach=True,
+                labels={PROFILE_LABEL: profile_name, FINGERPRINT_LABEL: fingerprint},
+                **launch_config
+            )
+        self.invalidate_status_cache()
+        self.registry.record_start(profile_name, fingerprint)
+        self._launched(container, started, 'created')
+        
+        return {"status": "created", "container_id": container.id, "reused": False}
     
-    def _get_device_group_ids(self):
-        """Get GIDs for video and render groups to allow GPU access"""
-        gids = []
+    def _launched(self, container, started, result):
+        """Record launch metrics and time Chromium startup in the background"""
+        LAUNCH_PHASE_SECONDS.observe(time.perf_counter() - started, phase='total')
+        LAUNCHES_TOTAL.inc(result=result)
+        
+        def track_ready():
+            container_started = time.perf_counter()
+            if self.wait_for_chromium(container):
+                LAUNCH_PHASE_SECONDS.observe(time.perf_counter() - container_started,
+                                             phase='chromium_ready')
+            else:
+                LAUNCHES_TOTAL.inc(result='not_ready')
+        
+        threading.Thread(target=track_ready, name='launch-ready', daemon=True).start()
+    
+    def wait_for_chromium(self, container, timeout=CHROMIUM_READY_TIMEOUT):
+        """Wait until a chromium process runs in the container; False on timeout or exit"""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                processes = container.top().get('Processes') or []
+            except docker.errors.APIError:
+                return False  # Container stopped or is gone
+            if any('chromium' in ' '.join(process) for process in processes):
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(CHROMIUM_READY_POLL_INTERVAL)
+    
+    def wait_until_ready(self, profile_name, timeout=CHROMIUM_READY_TIMEOUT):
+        """wait_for_chromium() for a profile's container; False if it has none"""
         try:
-            import grp
-            for group in ['video', 'render']:
-                try:
-                    gid = grp.getgrnam(group).gr_gid
-                    gids.append(gid)
-                except KeyError:
-                    pass
-        except Exception as e:
-            print(f"⚠️  Failed to get device group IDs: {e}")
-        return gids
+            container = self.client.containers.get(self.get_container_name(profile_name))
+        except docker.errors.NotFound:
+            return False
+        return self.wait_for_chromium(container, timeout)
 
-    def start_container(self, profile_name):
-        """Start a Chrome container for the profile"""
+    def _launch_fingerprint(self, launch_config):
+        """Hash of the image ID and every containers.run() option"""
+        image_id = self.client.images.get(launch_config['image']).id
+        payload = json.dumps({'image_id': image_id, **launch_config}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()[:32]
+    
+    def _build_launch_config(self, profile_name):
+        """Prepare the host and return the containers.run() options for a profile"""
         container_name = self.get_container_name(profile_name)
         profile_dir = self.get_profile_dir(profile_name)
         downloads_dir = os.path.join(profile_dir, "Downloads")
@@ -104,165 +537,202 @@ class DockerManager:
         os.makedirs(profile_dir, exist_ok=True)
         os.makedirs(downloads_dir, exist_ok=True)
         
-        # Check if container already exists
-        try:
-            container = self.client.containers.get(container_name)
-            if container.status == "running":
-                return {"status": "already_running"}
-            else:
-                # Remove the stopped container to force valid re-creation from the latest image
-                # This ensures updates to the Dockerfile/Flags are applied immediately
-                print(f"♻️  Removing stopped container {container_name} to ensure freshness")
-                container.remove(force=True)
-        except docker.errors.NotFound:
-            pass
-        
-        # Get PulseAudio cookie
-        pulse_cookie = None
-        for path in [os.path.expanduser("~/.config/pulse/cookie"), 
-                     os.path.expanduser("~/.pulse-cookie")]:
-            if os.path.exists(path):
-                pulse_cookie = path
-                break
-        
-        if not pulse_cookie:
-            pulse_cookie = "/tmp/pulse-cookie-generated"
-            open(pulse_cookie, 'a').close()
+        # Host probing (xhost, groups, DNS, PulseAudio) is cached across starts
+        with LAUNCH_PHASE_SECONDS.time(phase='display_setup'):
+            context = self.launch_context.get()
         
         # Container configuration
-        user_id = os.getuid()
         volumes = {
             '/tmp/.X11-unix': {'bind': '/tmp/.X11-unix', 'mode': 'rw'},
-            f'/run/user/{user_id}/pulse': {'bind': '/run/user/1000/pulse', 'mode': 'rw'},
-            pulse_cookie: {'bind': '/home/chrome/.config/pulse/cookie', 'mode': 'ro'},
+            f"/run/user/{context['user_id']}/pulse": {'bind': '/run/user/1000/pulse', 'mode': 'rw'},
+            context['pulse_cookie']: {'bind': '/home/chrome/.config/pulse/cookie', 'mode': 'ro'},
             profile_dir: {'bind': '/home/chrome/.config/chromium', 'mode': 'rw'},
             downloads_dir: {'bind': '/home/chrome/Downloads', 'mode': 'rw'}
         }
         
+        # Spoofed identity, generated once per profile and kept in its directory
+        with LAUNCH_PHASE_SECONDS.time(phase='identity'):
+            identity_env, stealth_flags = self.identities.launch_options(profile_name, profile_dir)
+        
         environment = {
-            'DISPLAY': os.environ.get('DISPLAY', ':0'),
+            'DISPLAY': context['display'],
             'PULSE_SERVER': 'unix:/run/user/1000/pulse/native',
             'PULSE_COOKIE': '/home/chrome/.config/pulse/cookie',
-            'CHROME_PROFILE': profile_name,  # Pass profile name for stealth fingerprinting
-            'TZ': 'UTC',  # Will be overridden by stealth scripts
+            'CHROME_PROFILE': profile_name,
             'LANG': 'en_US.UTF-8',
-            'LC_ALL': 'en_US.UTF-8'
+            'LC_ALL': 'en_US.UTF-8',
+            **identity_env
         }
         
         devices = ['/dev/dri']
+        resources = self.registry.get_resources(profile_name)
+        cache_tmpfs = self._cache_mounts(profile_name, volumes)
         
-        # Get host DNS servers for proper network resolution
-        dns_servers = self._get_host_dns_servers()
+        with LAUNCH_PHASE_SECONDS.time(phase='desktop_entry'):
+            self._ensure_desktop_entry(profile_name)
         
-        # Automatically setup X11/Wayland access
-        self._setup_display_access()
+        launch_config = {
+            'image': self.image_ref,
+            'name': container_name,
+            'ipc_mode': 'host',
+            'cap_add': ['SYS_ADMIN', 'SYS_PTRACE', 'NET_ADMIN'],
+            'volumes': volumes,
+            'environment': environment,
+            'devices': devices,
+            'group_add': list(context['group_add']),
+            'security_opt': ['seccomp=unconfined'],
+            'dns': list(context['dns_servers']),
+            'dns_opt': ['ndots:0'],
+            # Resource limits are part of the fingerprint: changing them recreates the container
+            'mem_limit': f"{resources['memory_mb']}m",
+            'cpu_shares': resources['cpu_shares'],
+            'pids_limit': resources['pids_limit'],
+            # Arguments to chromium-browser (the image entrypoint only execs it)
+            'command': stealth_flags + [
+                f'--class=chrome-{profile_name}',
+                '--enable-features=VulkanFromANGLE,DefaultANGLEVulkan',
+                '--use-gl=angle',
+                '--use-angle=vulkan'
+            ]
+        }
+        if cache_tmpfs:
+            # Only set when used, so 'disk' profiles keep their fingerprint
+            launch_config['tmpfs'] = cache_tmpfs
+        return launch_config
+    
+    def _cache_mounts(self, profile_name, volumes):
+        """Move the profile's caches to tmpfs or scratch mounts, as configured
         
-        # Get device group IDs for GPU access
-        device_gids = self._get_device_group_ids()
-        group_add = ['audio'] + device_gids
+        Adds scratch bind mounts to volumes and returns the tmpfs option. In
+        the profile directory the mountpoints are created up front (so Docker
+        does not create them owned by root) and emptied of any cache data
+        written while the profile was in 'disk' mode; scratch data is
+        dropped when leaving 'scratch' mode.
+        """
+        mode = self.registry.get_cache_mode(profile_name)
+        if mode != 'scratch':
+            shutil.rmtree(self.get_cache_scratch_dir(profile_name), ignore_errors=True)
+        if mode == 'disk':
+            return {}
         
-        # Create desktop entry if it doesn't exist
+        profile_dir = self.get_profile_dir(profile_name)
+        tmpfs = {}
+        for name, container_path in CACHE_CONTAINER_PATHS.items():
+            relative = os.path.relpath(container_path, '/home/chrome/.config/chromium')
+            if not relative.startswith('..'):
+                mountpoint = os.path.join(profile_dir, relative)
+                os.makedirs(mountpoint, exist_ok=True)
+                self._empty_dir(mountpoint)
+            if mode == 'tmpfs':
+                size_mb = CACHE_TMPFS_MB.get(name, CACHE_TMPFS_DEFAULT_MB)
+                uid, gid = CACHE_TMPFS_OWNER
+                tmpfs[container_path] = f"size={size_mb}m,uid={uid},gid={gid},mode=0700"
+            else:
+                scratch_dir = os.path.join(self.get_cache_scratch_dir(profile_name), name)
+                os.makedirs(scratch_dir, exist_ok=True)
+                volumes[scratch_dir] = {'bind': container_path, 'mode': 'rw'}
+        return tmpfs
+    
+    def _empty_dir(self, path):
+        with os.scandir(path) as it:
+            entries = list(it)
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path)
+                else:
+                    os.remove(entry.path)
+            except OSError as e:
+                print(f"⚠️  Failed to clear cache entry {entry.path}: {e}")
+    
+    def get_cache_scratch_dir(self, profile_name):
+        return os.path.join(CACHE_SCRATCH_DIR, profile_name)
+    
+    def _ensure_desktop_entry(self, profile_name):
+        """Create desktop entry if it doesn't exist (checked once per profile)"""
+        if profile_name in self._desktop_entries:
+            return
         if not self.desktop_mgr.desktop_entry_exists(profile_name):
             try:
                 self.desktop_mgr.create_desktop_entry(profile_name)
                 print(f"✅ Created desktop entry for profile: {profile_name}")
             except Exception as e:
                 print(f"⚠️  Failed to create desktop entry: {e}")
-        
-        # Create and start container
-        container = self.client.containers.run(
-            DOCKER_IMAGE_NAME,
-            name=container_name,
-            detach=True,
-            ipc_mode='host',
-            cap_add=['SYS_ADMIN', 'SYS_PTRACE', 'NET_ADMIN'],
-            volumes=volumes,
-            environment=environment,
-            devices=devices,
-            group_add=group_add,
-            security_opt=['seccomp=unconfined'],
-            dns=dns_servers,
-            dns_opt=['ndots:0'],
-            command=[
-                f'--class=chrome-{profile_name}',
-                '--enable-features=VulkanFromANGLE,DefaultANGLEVulkan',
-                '--use-gl=angle',
-                '--use-angle=vulkan'
-            ]
-        )
-        
-        return {"status": "created", "container_id": container.id}
+                return
+        self._desktop_entries.add(profile_name)
+    
+    def forget_profile(self, profile_name):
+        """Drop cached state about a deleted profile"""
+        self._desktop_entries.discard(profile_name)
+        self.size_index.forget(self.get_profile_dir(profile_name))
+        self.identities.forget(self.get_profile_dir(profile_name))
+        shutil.rmtree(self.get_cache_scratch_dir(profile_name), ignore_errors=True)
     
-    def stop_container(self, profile_name):
-        """Stop a container"""
+    def stop_container(self, profile_name, timeout=STOP_TIMEOUT):
+        """Stop a container, killing it if it has not exited after timeout seconds"""
         try:
             container = self.client.containers.get(self.get_container_name(profile_name))
-            container.stop()
+            if container.status == "paused":
+                # A frozen Chrome cannot handle SIGTERM and shut down cleanly
+                container.unpause()
+            container.stop(timeout=timeout)
+            self.invalidate_status_cache()
             return {"status": "stopped"}
         except docker.errors.NotFound:
             return {"status": "not_found"}
     
-    def remove_container(self, profile_name):
-        """Remove a container"""
+    def hibernate_container(self, profile_name, reclaim_memory=None):
+        """Freeze a running container (cgroup freezer) so it uses no CPU but keeps its session"""
         try:
             container = self.client.containers.get(self.get_container_name(profile_name))
-            container.remove(force=True)
-            return {"status": "removed"}
         except docker.errors.NotFound:
             return {"status": "not_found"}
-    
-    def _get_host_dns_servers(self):
-        """Get DNS servers - use Docker bridge gateway to access host DNS"""
-        # Use Docker bridge gateway (172.17.0.1) to access host's DNS resolver
-        # This allows containers to use the host's DNS configuration
-        dns_servers = ['172.17.0.1']
         
-        # Add fallback DNS servers for reliability
-        dns_servers.extend(['8.8.8.8', '8.8.4.4'])
+        if container.status == "paused":
+            return {"status": "already_hibernated"}
+        if container.status != "running":
+            return {"status": "not_running"}
         
-        print(f"✅ Using Docker bridge gateway DNS (172.17.0.1) with fallbacks: {', '.join(dns_servers[1:])}")
+        container.pause()
+        self.invalidate_status_cache()
+        result = {"status": "hibernated"}
         
-        return dns_servers
+        if reclaim_memory is None:
+            reclaim_memory = HIBERNATE_RECLAIM_MEMORY
+        if reclaim_memory:
+            result["memory_reclaim"] = cgroups.reclaim_memory(container.id)
+        return result
     
-    def _setup_display_access(self):
-        """Setup X11/Wayland display access for Docker containers"""
-        import subprocess
+    def resume_container(self, profile_name):
+        """Unfreeze a hibernated container"""
+        try:
+            container = self.client.containers.get(self.get_container_name(profile_name))
+        except docker.errors.NotFound:
+            return {"status": "not_found"}
         
-        # Detect display server
-        wayland_display = os.environ.get('WAYLAND_DISPLAY')
-        xdg_session_type = os.environ.get('XDG_SESSION_TYPE', '').lower()
+        if container.status != "paused":
+            return {"status": "not_hibernated"}
         
-        # Setup X11 access (works for both X11 and XWayland)
+        container.unpause()
+        self.invalidate_status_cache()
+        return {"status": "resumed", "container_id": container.id}
+    
+    def remove_container(self, profile_name):
+        """Remove a container"""
         try:
-            # We explicitly run this every time to ensure permissions are correct
-            result = subprocess.run(['xhost', '+local:docker'], 
-                          capture_output=True, 
-                          text=True,
-                          check=False)
-            
-            if result.returncode == 0:
-                print("✅ X11 access configured for Docker")
-            else:
-                print(f"⚠️  Failed to configure X11 access: {result.stderr}")
-                
-        except FileNotFoundError:
-            print("⚠️  xhost not found - X11 access may not work")
-        
-        # Additional Wayland setup if needed
-        if wayland_display or xdg_session_type == 'wayland':
-            print("ℹ️  Wayland detected - using XWayland compatibility")
+            container = self.client.containers.get(self.get_container_name(profile_name))
+            container.remove(force=True)
+            self.invalidate_status_cache()
+            return {"status": "removed"}
+        except docker.errors.NotFound:
+            return {"status": "not_found"}
     
-    def get_profile_size(self, profile_name):
-        """Get profile directory size in MB"""
-        profile_dir = self.get_profile_dir(profile_name)
-        if not os.path.exists(profile_dir):
-            return 0
-        
-        total_size = 0
-        for dirpath, dirnames, filenames in os.walk(profile_dir):
-            for filename in filenames:
-                filepath = os.path.join(dirpath, filename)
-                if os.path.exists(filepath):
-                    total_size += os.path.getsize(filepath)
-        
-        return round(total_size / (1024 * 1024), 2)  # Convert to MB
+    def get_profile_size(self, profile_name, running=False):
+        """Get profile directory size in MB (cached, never blocks on a walk)"""
+        return self.get_profile_size_info(profile_name, running)[0]
+    
+    def get_profile_size_info(self, profile_name, running=False):
+        """Get (size in MB, unix time the size was measured or None)"""
+        size_bytes, updated_at = self.size_index.get(
+            self.get_profile_dir(profile_name), watch=running)
+        return round(size_bytes / (1024 * 1024), 2), updated_at  # Convert to MB
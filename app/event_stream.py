@@ -0,0 +1,139 @@
+"""
+Event Stream - Push profile state changes from the Docker events API
+"""
+import queue
+import threading
+import time
+from config import CONTAINER_PREFIX, EVENTS_RECONNECT_DELAY
+
+# Docker container event -> (delta name sent to clients, resulting status)
+# A status of None leaves the profile's status unchanged
+EVENT_KINDS = {
+    'start': ('started', 'running'),
+    'die': ('died', 'exited'),
+    'oom': ('oom_killed', None),
+    'destroy': ('removed', 'not_found'),
+    'pause': ('hibernated', 'paused'),
+    'unpause': ('resumed', 'running'),
+}
+
+
+class ContainerEventStream:
+    """Single consumer of client.events() fanned out to any number of subscribers
+
+    Keeps an in-memory profile -> status table and hands each subscriber a
+    queue of deltas. One daemon connection serves every open dashboard tab.
+    """
+
+    SUBSCRIBER_QUEUE_SIZE = 256
+
+    def __init__(self, docker_mgr):
+        self.docker_mgr = docker_mgr
+        self.connected = False
+        self._states = {}
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """Start the background consumer thread (idempotent)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='docker-events', daemon=True)
+            self._thread.start()
+
+    def subscribe(self):
+        """Register a subscriber and return its delta queue"""
+        q = queue.Queue(maxsize=self.SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def snapshot(self):
+        """Current state table, as sent to a new subscriber"""
+        with self._lock:
+            return {'connected': self.connected, 'profiles': dict(self._states)}
+
+    def publish(self, delta):
+        """Send a delta that does not come from Docker (e.g. idle notifications)"""
+        self._publish(delta)
+
+    def _publish(self, delta):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(delta)
+            except queue.Full:
+                # Slow client: drop its backlog and make it refetch everything
+                while not q.empty():
+                    try:
+                        q.get_nowait()
+                    except queue.Empty:
+                        break
+                q.put_nowait({'event': 'resync'})
+
+    def _run(self):
+        # The manager's client is only usable once Docker was reached
+        ready = threading.Event()
+        self.docker_mgr.when_ready(ready.set)
+        ready.wait()
+        while True:
+            try:
+                self._consume()
+            except Exception as e:
+                print(f"⚠️  Docker event stream interrupted: {e}")
+            if self.connected:
+                self.connected = False
+                self._publish({'event': 'disconnected'})
+            time.sleep(EVENTS_RECONNECT_DELAY)
+
+    def _consume(self):
+        # Uses the manager's client (and its metrics hook); only the stream
+        # is closed afterwards. Open the stream before taking the snapshot
+        # so nothing falls between the two
+        events = self.docker_mgr.client.events(decode=True, filters={
+            'type': 'container',
+            'event': list(EVENT_KINDS),
+        })
+        try:
+            self.docker_mgr.invalidate_status_cache()
+            states = self.docker_mgr.get_status_snapshot()
+            with self._lock:
+                self._states = states
+                self.connected = True
+            self._publish({'event': 'resync'})
+            print("✅ Subscribed to Docker container events")
+
+            for event in events:
+                self._handle(event)
+        finally:
+            events.close()
+
+    def _handle(self, event):
+        attributes = (event.get('Actor') or {}).get('Attributes') or {}
+        container_name = attributes.get('name', '')
+        action = event.get('Action') or event.get('status')
+        if not container_name.startswith(CONTAINER_PREFIX) or action not in EVENT_KINDS:
+            return
+
+        profile_name = container_name[len(CONTAINER_PREFIX):]
+        delta_name, status = EVENT_KINDS[action]
+        with self._lock:
+            if status is None:
+                status = self._states.get(profile_name, 'not_found')
+            elif status == 'not_found':
+                self._states.pop(profile_name, None)
+            else:
+                self._states[profile_name] = status
+
+        self.docker_mgr.invalidate_status_cache()
+        if action in ('die', 'destroy'):
+            self.docker_mgr.on_container_stopped()
+        delta = {'event': delta_name, 'name': profile_name, 'status': status}
+        if action == 'die':
+            delta['exit_code'] = attributes.get('exitCode')
+        self._publish(delta)
@@ -0,0 +1,91 @@
+"""
+Host Windows - Find and raise profile browser windows on the host X display
+"""
+import os
+import re
+import shutil
+import subprocess
+import time
+from config import WINDOW_POLL_INTERVAL, WINDOW_TOOL_TIMEOUT
+
+
+class HostWindows:
+    """Profile windows on the host display, via xdotool (or wmctrl)
+
+    Chromium runs with --class=chrome-<profile>, so a profile's windows are
+    the ones whose WM_CLASS class is exactly that. Without either tool
+    nothing is found, and callers fall back to process readiness.
+    """
+
+    def __init__(self, launch_context):
+        self.launch_context = launch_context
+        self.xdotool = shutil.which('xdotool')
+        self.wmctrl = shutil.which('wmctrl')
+
+    @property
+    def available(self):
+        return bool(self.xdotool or self.wmctrl)
+
+    def find(self, profile_name):
+        """ID of a mapped (visible) window of the profile, or None"""
+        window_ids = self._window_ids(profile_name, visible_only=True)
+        return window_ids[0] if window_ids else None
+
+    def wait(self, profile_name, timeout):
+        """Wait until a window of the profile is mapped; its ID, or None on timeout"""
+        deadline = time.monotonic() + timeout
+        while True:
+            window_id = self.find(profile_name)
+            if window_id or time.monotonic() >= deadline:
+                return window_id
+            time.sleep(WINDOW_POLL_INTERVAL)
+
+    def raise_window(self, profile_name):
+        """Activate (raise and focus) the profile's window; False if it has none
+
+        A minimized window is unmapped, so when no window is visible every
+        window of the profile is activated: the window manager restores the
+        minimized ones and ignores Chromium's unmanaged helper windows.
+        """
+        window_ids = (self._window_ids(profile_name, visible_only=True) or
+                      self._window_ids(profile_name, visible_only=False))
+        raised = False
+        for window_id in window_ids:
+            if self.xdotool:
+                raised |= self._run([self.xdotool, 'windowactivate', window_id]) is not None
+            else:
+                raised |= self._run([self.wmctrl, '-i', '-a', window_id]) is not None
+        return raised
+
+    def _window_ids(self, profile_name, visible_only):
+        if self.xdotool:
+            command = [self.xdotool, 'search']
+            if visible_only:
+                command.append('--onlyvisible')
+            output = self._run(command + ['--class', f'^{re.escape(self._wm_class(profile_name))}$'])
+            return output.split() if output else []
+        if self.wmctrl:
+            # Lists the windows managed by the window manager, minimized or not:
+            # <id> <desktop> <res_name>.<res_class> <host> <title>
+            window_ids = []
+            for line in (self._run([self.wmctrl, '-l', '-x']) or '').splitlines():
+                fields = line.split(None, 3)
+                if len(fields) >= 3 and fields[2].rpartition('.')[2] == self._wm_class(profile_name):
+                    window_ids.append(fields[0])
+            return window_ids
+        return []
+
+    def _wm_class(self, profile_name):
+        return f'chrome-{profile_name}'
+
+    def _run(self, command):
+        """stdout of a tool run against the profile display, None if it failed"""
+        env = {**os.environ, 'DISPLAY': self.launch_context.get()['display']}
+        try:
+            result = subprocess.run(command, capture_output=True, text=True, env=env,
+                                    timeout=WINDOW_TOOL_TIMEOUT, check=False)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            print(f"⚠️  {os.path.basename(command[0])} failed: {e}")
+            return None
+        # xdotool search exits 1 when nothing matched
+        return result.stdout if result.returncode == 0 else None
@@ -0,0 +1,196 @@
+"""
+Idle Reaper - Hibernate, stop or flag profiles that have been idle for too long
+"""
+import collections
+import json
+import os
+import threading
+import time
+from config import (REAPER_POLICY_FILE, REAPER_AUDIT_FILE, REAPER_AUDIT_MAX_BYTES,
+                    REAPER_CHECK_INTERVAL, DEFAULT_REAPER_POLICY)
+
+REAPER_ACTIONS = ('hibernate', 'stop', 'notify')
+
+
+class IdleReaper:
+    """Policy engine applying an action to profiles idle for idle_minutes
+
+    Activity comes from the stats sampler: a sample counts as active when
+    CPU use or network traffic is above the policy thresholds. Each idle
+    period triggers the action once; exempt profiles (profile setting
+    'reaper_exempt') are never touched. In dry-run mode the decision is
+    only written to the audit log (a JSON-lines file under DATA_DIR).
+    """
+
+    def __init__(self, docker_mgr, stats_sampler, settings, event_stream):
+        self.docker_mgr = docker_mgr
+        self.stats_sampler = stats_sampler
+        self.settings = settings
+        self.event_stream = event_stream
+        self._lock = threading.Lock()
+        self._policy = self._load_policy()
+        # profile name -> {'last_active', 'checked_at', 'handled'}
+        self._activity = {}
+        self._thread = None
+
+    def start(self):
+        """Start the reaper thread (idempotent)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='idle-reaper', daemon=True)
+            self._thread.start()
+
+    def _load_policy(self):
+        policy = dict(DEFAULT_REAPER_POLICY)
+        try:
+            with open(REAPER_POLICY_FILE) as f:
+                stored = json.load(f)
+            policy.update({k: v for k, v in stored.items() if k in policy})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Failed to read reaper policy, using defaults: {e}")
+        return policy
+
+    @property
+    def policy(self):
+        with self._lock:
+            return dict(self._policy)
+
+    def update_policy(self, **fields):
+        """Validate and persist policy changes; raises ValueError on bad input"""
+        for key, value in fields.items():
+            if key not in DEFAULT_REAPER_POLICY:
+                raise ValueError(f'Unknown policy field: {key}')
+            if key in ('enabled', 'dry_run'):
+                if not isinstance(value, bool):
+                    raise ValueError(f'{key} must be true or false')
+            elif key == 'action':
+                if value not in REAPER_ACTIONS:
+                    raise ValueError(f'action must be one of: {", ".join(REAPER_ACTIONS)}')
+            elif not isinstance(value, (int, float)) or isinstance(value, bool) or value < 0:
+                raise ValueError(f'{key} must be a non-negative number')
+        if fields.get('idle_minutes') == 0:
+            raise ValueError('idle_minutes must be greater than 0')
+
+        with self._lock:
+            self._policy.update(fields)
+            tmp_path = f"{REAPER_POLICY_FILE}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self._policy, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, REAPER_POLICY_FILE)
+            return dict(self._policy)
+
+    def idle_status(self):
+        """Seconds each running profile has been idle, as last seen by the reaper"""
+        now = time.time()
+        with self._lock:
+            return {name: {'idle_seconds': round(now - state['last_active']),
+                           'handled': state['handled']}
+                    for name, state in self._activity.items()}
+
+    def audit_log(self, limit=100):
+        """Most recent audit entries, newest first"""
+        entries = collections.deque(maxlen=limit)
+        for path in (f"{REAPER_AUDIT_FILE}.1", REAPER_AUDIT_FILE):
+            try:
+                with open(path) as f:
+                    for line in f:
+                        try:
+                            entries.append(json.loads(line))
+                        except ValueError:
+                            continue
+            except FileNotFoundError:
+                continue
+        return list(reversed(entries))
+
+    def _audit(self, entry):
+        line = json.dumps(entry, sort_keys=True) + '\n'
+        try:
+            if os.path.exists(REAPER_AUDIT_FILE) and \
+                    os.path.getsize(REAPER_AUDIT_FILE) + len(line) > REAPER_AUDIT_MAX_BYTES:
+                os.replace(REAPER_AUDIT_FILE, f"{REAPER_AUDIT_FILE}.1")
+            with open(REAPER_AUDIT_FILE, 'a') as f:
+                f.write(line)
+        except OSError as e:
+            print(f"⚠️  Failed to write reaper audit log: {e}")
+
+    def _run(self):
+        while True:
+            time.sleep(REAPER_CHECK_INTERVAL)
+            try:
+                self.check()
+            except Exception as e:
+                print(f"⚠️  Idle reaper check failed: {e}")
+
+    def _is_active(self, sample, policy):
+        if sample['cpu_percent'] is None:
+            return True  # First sample after start: no rate yet
+        return (sample['cpu_percent'] > policy['cpu_threshold'] or
+                (sample['net_rx_rate'] or 0) + (sample['net_tx_rate'] or 0) > policy['net_threshold'])
+
+    def check(self):
+        """Update activity of running profiles and act on those idle for too long"""
+        policy = self.policy
+        now = time.time()
+        statuses = self.docker_mgr.get_status_snapshot()
+        running = {name for name, status in statuses.items() if status == 'running'}
+
+        due = []
+        with self._lock:
+            for name in list(self._activity):
+                if name not in running:
+                    del self._activity[name]
+            for name in running:
+                state = self._activity.setdefault(
+                    name, {'last_active': now, 'checked_at': now, 'handled': False})
+                samples = self.stats_sampler.history(name, since=state['checked_at'])
+                state['checked_at'] = now
+                active = [s['t'] for s in samples if self._is_active(s, policy)]
+                if active:
+                    state['last_active'] = max(state['last_active'], active[-1])
+                    state['handled'] = False
+                elif not samples and not self.stats_sampler.is_available(name):
+                    # No telemetry for this container: never treat it as idle
+                    state['last_active'] = now
+                idle_seconds = now - state['last_active']
+                if (policy['enabled'] and not state['handled'] and
+                        idle_seconds >= policy['idle_minutes'] * 60):
+                    state['handled'] = True
+                    due.append((name, idle_seconds))
+
+        for name, idle_seconds in due:
+            if self.settings.get(name).get('reaper_exempt'):
+                continue
+            self._apply(name, idle_seconds, policy)
+
+    def _apply(self, profile_name, idle_seconds, policy):
+        action = policy['action']
+        entry = {
+            't': round(time.time(), 3),
+            'profile': profile_name,
+            'action': action,
+            'dry_run': policy['dry_run'],
+            'idle_minutes': round(idle_seconds / 60, 1),
+        }
+        if policy['dry_run'] or action == 'notify':
+            entry['result'] = 'skipped' if policy['dry_run'] else 'notified'
+        elif action == 'hibernate':
+            # Reclaim regardless of HIBERNATE_RECLAIM_MEMORY: freeing the idle
+            # profile's RAM is the point of reaping it
+            result = self.docker_mgr.hibernate_container(profile_name, reclaim_memory=True)
+            entry['result'] = result['status']
+            entry['memory_reclaimed'] = result.get('memory_reclaim') == 'applied'
+        else:
+            entry['result'] = self.docker_mgr.stop_container(profile_name)['status']
+
+        print(f"💤 Idle reaper: {profile_name} idle for {entry['idle_minutes']} min -> "
+              f"{action}{' (dry run)' if policy['dry_run'] else ''}: {entry['result']}")
+        self._audit(entry)
+        self.event_stream.publish({
+            'event': 'idle',
+            'name': profile_name,
+            'action': action,
+            'dry_run': policy['dry_run'],
+            'result': entry['result'],
+            'idle_minutes': entry['idle_minutes'],
+        })
@@ -0,0 +1,293 @@
+"""
+Jobs - Run long operations in the background and track their progress
+"""
+import collections
+import os
+import queue
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import (JOBS_DIR, JOB_WORKERS, JOB_RETENTION, JOB_CLEANUP_INTERVAL,
+                    JOB_PROGRESS_INTERVAL, JOB_LOG_LINES, JOB_INTERACTIVE_KINDS,
+                    JOB_INTERACTIVE_WORKERS)
+
+FINISHED_STATES = ('succeeded', 'failed', 'cancelled')
+
+
+class JobCancelled(Exception):
+    """Raised inside a job function once the job has been cancelled"""
+
+
+class Job:
+    """Progress record of one long-running operation"""
+
+    def __init__(self, kind, manager=None):
+        self.id = secrets.token_hex(8)
+        self.kind = kind
+        self.state = 'queued'
+        self.message = ''
+        self.bytes_done = 0
+        self.bytes_total = None
+        self.entries = 0
+        self.result = None
+        self.error = None
+        # {'path', 'filename', 'mimetype'} of a file produced by the job
+        self.artifact = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.finished_at = None
+        # Handed to a worker pool (jobs from create() may never be)
+        self.submitted = False
+        self._manager = manager
+        self._cancel_event = threading.Event()
+        # Output lines; the oldest are dropped past JOB_LOG_LINES
+        self._log = collections.deque(maxlen=JOB_LOG_LINES)
+        self._log_count = 0
+        self._log_cond = threading.Condition()
+
+    def update(self, **fields):
+        state_changed = 'state' in fields and fields['state'] != self.state
+        for key, value in fields.items():
+            setattr(self, key, value)
+        self.updated_at = time.time()
+        if self._manager:
+            self._manager._changed(self, force=state_changed)
+        if state_changed:
+            with self._log_cond:
+                self._log_cond.notify_all()
+
+    def log(self, line):
+        """Append an output line; it also becomes the job message"""
+        with self._log_cond:
+            self._log.append(line)
+            self._log_count += 1
+            self._log_cond.notify_all()
+        if line.strip():
+            self.update(message=line)
+
+    def read_log(self, cursor=0, timeout=None):
+        """Log lines after cursor and the new cursor, waiting up to timeout for more
+
+        Lines dropped from the bounded buffer are skipped.
+        """
+        with self._log_cond:
+            if timeout and self._log_count <= cursor and not self.finished:
+                self._log_cond.wait(timeout)
+            first = self._log_count - len(self._log)
+            lines = list(self._log)[max(cursor - first, 0):]
+            return lines, self._log_count
+
+    def finish(self, result=None, error=None):
+        self.update(state='failed' if error else 'succeeded', result=result, error=error,
+                    finished_at=time.time())
+
+    def wait(self, timeout=None):
+        """Block until the job finished or timeout passed; True if it finished"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._log_cond:
+            while not self.finished:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._log_cond.wait(remaining)
+            return True
+
+    def cancel(self):
+        """Ask the job to stop; a job that has not started yet is cancelled at once"""
+        self._cancel_event.set()
+        if self.state == 'queued':
+            self.update(state='cancelled', finished_at=time.time())
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    @property
+    def finished(self):
+        return self.state in FINISHED_STATES
+
+    def raise_if_cancelled(self):
+        """Called by job functions between units of work"""
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+
+    @property
+    def progress(self):
+        """Fraction done (0-1), or None while the total is unknown"""
+        if self.state == 'succeeded':
+            return 1.0
+        if not self.bytes_total:
+            return None
+        return min(self.bytes_done / self.bytes_total, 1.0)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'state': self.state,
+            'message': self.message,
+            'progress': self.progress,
+            'bytes_done': self.bytes_done,
+            'bytes_total': self.bytes_total,
+            'entries': self.entries,
+            'result': self.result,
+            'error': self.error,
+            'artifact': self.artifact['filename'] if self.artifact else None,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class JobManager:
+    """Job table plus the worker pools that run submitted jobs
+
+    JOB_INTERACTIVE_KINDS get a pool of their own, so a start never queues
+    behind long-running maintenance jobs.
+
+    Finished jobs and their artifacts (files under JOBS_DIR) are kept for
+    JOB_RETENTION seconds. Subscribers get a queue of job updates, throttled
+    to one per job every JOB_PROGRESS_INTERVAL seconds except for state
+    changes.
+    """
+
+    SUBSCRIBER_QUEUE_SIZE = 256
+
+    def __init__(self, workers=JOB_WORKERS):
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._published_at = {}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self._interactive_executor = ThreadPoolExecutor(max_workers=JOB_INTERACTIVE_WORKERS,
+                                                        thread_name_prefix='job-interactive')
+        os.makedirs(JOBS_DIR, exist_ok=True)
+        # Jobs do not survive a restart, so neither do their artifacts
+        for name in os.listdir(JOBS_DIR):
+            self._remove_file(os.path.join(JOBS_DIR, name))
+        threading.Thread(target=self._cleanup_loop, name='job-cleanup', daemon=True).start()
+
+    def create(self, kind):
+        """Register a queued job that the caller will run itself"""
+        job = Job(kind, self)
+        with self._lock:
+            self._jobs[job.id] = job
+        return job
+
+    def submit(self, kind, fn, *args, job=None, on_skip=None):
+        """Run fn(job, *args) on the worker pool; its return value becomes the job result
+
+        on_skip is called instead if the job is cancelled before it starts.
+        """
+        if job is None:
+            job = self.create(kind)
+        executor = self._interactive_executor if kind in JOB_INTERACTIVE_KINDS else self._executor
+        job.submitted = True
+        executor.submit(self._run, job, fn, args, on_skip)
+        return job
+
+    def _run(self, job, fn, args, on_skip):
+        if job.cancelled:
+            job.update(state='cancelled', finished_at=time.time())
+            if on_skip:
+                on_skip()
+            return
+        job.update(state='running')
+        try:
+            result = fn(job, *args)
+        except JobCancelled:
+            job.update(state='cancelled', message='Cancelled', finished_at=time.time())
+            self._drop_artifact(job)
+        except Exception as e:
+            print(f"❌ {job.kind} job {job.id} failed: {e}")
+            job.finish(error=str(e))
+            self._drop_artifact(job)
+        else:
+            job.finish(result=result)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self, kind=None):
+        with self._lock:
+            return [j for j in self._jobs.values() if kind is None or j.kind == kind]
+
+    def cancel(self, job_id):
+        """Cancel a job; returns the job, or None if it does not exist"""
+        job = self.get(job_id)
+        if job is not None and not job.finished:
+            job.cancel()
+        return job
+
+    def artifact_path(self, job, extension):
+        """Path a job should write its output file to"""
+        return os.path.join(JOBS_DIR, f'{job.id}{extension}')
+
+    def subscribe(self):
+        q = queue.Queue(maxsize=self.SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def _changed(self, job, force=False):
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._published_at.get(job.id, 0) < JOB_PROGRESS_INTERVAL:
+                return
+            self._published_at[job.id] = now
+            subscribers = list(self._subscribers)
+        update = job.to_dict()
+        for q in subscribers:
+            try:
+                q.put_nowait(update)
+            except queue.Full:
+                # Subscribers re-read the job on their heartbeat, nothing is lost
+                pass
+
+    def _drop_artifact(self, job):
+        if job.artifact:
+            self._remove_file(job.artifact['path'])
+            job.update(artifact=None)
+
+    def _remove_file(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"⚠️  Failed to remove job file {path}: {e}")
+
+    def _cleanup_loop(self):
+        while True:
+            time.sleep(JOB_CLEANUP_INTERVAL)
+            self.cleanup()
+
+    def cleanup(self):
+        """Forget finished jobs older than JOB_RETENTION and delete their artifacts
+
+        Import jobs created up front (POST /api/imports) whose upload never
+        came are forgotten JOB_RETENTION seconds after their last update.
+        """
+        cutoff = time.time() - JOB_RETENTION
+        with self._lock:
+            unused = [j for j in self._jobs.values()
+                      if j.kind == 'import' and j.state == 'queued' and not j.submitted
+                      and j.updated_at < cutoff]
+            expired = [j for j in self._jobs.values()
+                       if j.finished and j.finished_at and j.finished_at < cutoff]
+            for job in expired + unused:
+                del self._jobs[job.id]
+                self._published_at.pop(job.id, None)
+        for job in unused:
+            job.update(state='cancelled', message='Expired: no upload received',
+                       finished_at=time.time())
+        for job in expired:
+            if job.artifact:
+                self._remove_file(job.artifact['path'])
+        return len(expired) + len(unused)
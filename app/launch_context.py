@@ -0,0 +1,140 @@
+"""
+Launch Context - Host probing for container launches, cached between starts
+"""
+import grp
+import os
+import subprocess
+import threading
+
+PULSE_COOKIE_PATHS = [
+    os.path.expanduser("~/.config/pulse/cookie"),
+    os.path.expanduser("~/.pulse-cookie"),
+]
+GENERATED_PULSE_COOKIE = "/tmp/pulse-cookie-generated"
+X11_SOCKET_DIR = "/tmp/.X11-unix"
+
+
+def _mtime_ns(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class HostLaunchContext:
+    """Host facts every container launch needs, probed once and reused
+
+    Probing spawns xhost and reads the group database, so it is only redone
+    when a cheap validity key changes: the DISPLAY/WAYLAND_DISPLAY
+    environment, the X11 socket directory or PulseAudio socket (a restarted
+    server recreates them), /etc/group, or the PulseAudio cookie files.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._key = None
+        self._context = None
+
+    def get(self):
+        """Get the current launch context, re-probing the host only if it changed"""
+        key = self._validity_key()
+        # Held while probing so simultaneous starts share one probe
+        with self._lock:
+            if self._context is None or key != self._key:
+                self._context = self._probe()
+                self._key = key
+            return self._context
+
+    def invalidate(self):
+        with self._lock:
+            self._context = None
+
+    def _validity_key(self):
+        user_id = os.getuid()
+        return (
+            os.environ.get('DISPLAY'),
+            os.environ.get('WAYLAND_DISPLAY'),
+            os.environ.get('XDG_SESSION_TYPE'),
+            _mtime_ns(X11_SOCKET_DIR),
+            _mtime_ns(f'/run/user/{user_id}/pulse/native'),
+            _mtime_ns('/etc/group'),
+            tuple(_mtime_ns(path) for path in PULSE_COOKIE_PATHS),
+        )
+
+    def _probe(self):
+        # Get PulseAudio cookie
+        pulse_cookie = None
+        for path in PULSE_COOKIE_PATHS:
+            if os.path.exists(path):
+                pulse_cookie = path
+                break
+
+        if not pulse_cookie:
+            pulse_cookie = GENERATED_PULSE_COOKIE
+            open(pulse_cookie, 'a').close()
+
+        # Automatically setup X11/Wayland access
+        self._setup_display_access()
+
+        return {
+            'user_id': os.getuid(),
+            'display': os.environ.get('DISPLAY', ':0'),
+            'pulse_cookie': pulse_cookie,
+            # Get host DNS servers for proper network resolution
+            'dns_servers': self._get_host_dns_servers(),
+            # Get device group IDs for GPU access
+            'group_add': ['audio'] + self._get_device_group_ids(),
+        }
+
+    def _get_device_group_ids(self):
+        """Get GIDs for video and render groups to allow GPU access"""
+        gids = []
+        try:
+            for group in ['video', 'render']:
+                try:
+                    gid = grp.getgrnam(group).gr_gid
+                    gids.append(gid)
+                except KeyError:
+                    pass
+        except Exception as e:
+            print(f"⚠️  Failed to get device group IDs: {e}")
+        return gids
+
+    def _get_host_dns_servers(self):
+        """Get DNS servers - use Docker bridge gateway to access host DNS"""
+        # Use Docker bridge gateway (172.17.0.1) to access host's DNS resolver
+        # This allows containers to use the host's DNS configuration
+        dns_servers = ['172.17.0.1']
+
+        # Add fallback DNS servers for reliability
+        dns_servers.extend(['8.8.8.8', '8.8.4.4'])
+
+        print(f"✅ Using Docker bridge gateway DNS (172.17.0.1) with fallbacks: {', '.join(dns_servers[1:])}")
+
+        return dns_servers
+
+    def _setup_display_access(self):
+        """Setup X11/Wayland display access for Docker containers"""
+        # Detect display server
+        wayland_display = os.environ.get('WAYLAND_DISPLAY')
+        xdg_session_type = os.environ.get('XDG_SESSION_TYPE', '').lower()
+
+        # Setup X11 access (works for both X11 and XWayland)
+        try:
+            # Re-run whenever the validity key changes (e.g. X server restart)
+            result = subprocess.run(['xhost', '+local:docker'],
+                          capture_output=True,
+                          text=True,
+                          check=False)
+
+            if result.returncode == 0:
+                print("✅ X11 access configured for Docker")
+            else:
+                print(f"⚠️  Failed to configure X11 access: {result.stderr}")
+
+        except FileNotFoundError:
+            print("⚠️  xhost not found - X11 access may not work")
+
+        # Additional Wayland setup if needed
+        if wayland_display or xdg_session_type == 'wayland':
+            print("ℹ️  Wayland detected - using XWayland compatibility")
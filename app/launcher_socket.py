@@ -0,0 +1,43 @@
+"""
+Launcher Socket - Serve the API on a Unix domain socket for the launcher CLI
+"""
+import os
+import threading
+from werkzeug.serving import make_server
+
+
+class LauncherSocketServer:
+    """The Flask app on a Unix socket next to the TCP listener
+
+    Used by scripts/chrome-launch.py: no TCP handshake, and only the owning
+    user can connect (the socket is chmod 0600). The threaded server speaks
+    HTTP/1.1, so a client can launch several profiles over one connection.
+    """
+
+    def __init__(self, app, path):
+        self.app = app
+        self.path = path
+        self._server = None
+
+    def start(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        try:
+            # Removes a socket file left behind by a previous run
+            self._server = make_server(f'unix://{self.path}', 0, self.app, threaded=True)
+        except (OSError, SystemExit) as e:
+            # make_server reports bind errors itself and exits
+            print(f"⚠️  Launcher socket unavailable at {self.path}: {e}")
+            return
+        os.chmod(self.path, 0o600)
+        threading.Thread(target=self._server.serve_forever, name='launcher-socket',
+                         daemon=True).start()
+        print(f"🔌 Launcher socket listening on {self.path}")
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
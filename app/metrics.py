@@ -0,0 +1,192 @@
+"""
+Metrics - Low-overhead counters and histograms in Prometheus text format
+"""
+import bisect
+import contextlib
+import threading
+import time
+
+# Seconds; covers fast API calls up to a cold image build
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._render_samples(items))
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing value per label set"""
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _render_samples(self, items):
+        for key, value in items:
+            yield f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram; observe() is one bisect and a locked increment"""
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labelnames)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, sum, count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with-block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def totals(self):
+        """(sum, count) per label values tuple"""
+        with self._lock:
+            return {key: (state[1], state[2]) for key, state in self._values.items()}
+
+    def _render_samples(self, items):
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, [('le', bound)])
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = _format_labels(self.labelnames, key)
+            yield f'{self.name}_sum{labels} {_format_value(total)}'
+            yield f'{self.name}_count{labels} {count}'
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (0.0.4)"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_SECONDS = Histogram(
+    'chrome_manager_http_request_duration_seconds',
+    'HTTP request latency (time to response headers) by route',
+    ['method', 'route', 'status'])
+LAUNCH_PHASE_SECONDS = Histogram(
+    'chrome_manager_launch_phase_duration_seconds',
+    'Duration of each start_container phase; chromium_ready is measured from container start',
+    ['phase'])
+LAUNCHES_TOTAL = Counter(
+    'chrome_manager_launches_total',
+    'Container launches by outcome',
+    ['result'])
+DOCKER_API_SECONDS = Histogram(
+    'chrome_manager_docker_api_duration_seconds',
+    'Docker Engine API calls (count and latency to response headers)',
+    ['method', 'endpoint', 'status'])
+ARCHIVE_BYTES = Counter(
+    'chrome_manager_archive_bytes_total',
+    'Bytes streamed by profile exports and received by imports',
+    ['operation'])
+ARCHIVE_SECONDS = Histogram(
+    'chrome_manager_archive_duration_seconds',
+    'Duration of profile exports and imports',
+    ['operation'])
+SIZE_SCAN_SECONDS = Histogram(
+    'chrome_manager_size_scan_duration_seconds',
+    'Duration of incremental profile size scans')
+
+
+def normalize_docker_path(path):
+    """Collapse IDs and names in a Docker API path: /v1.43/containers/abc/json -> containers/{id}/json"""
+    parts = [p for p in path.split('/') if p]
+    if parts and parts[0].startswith('v1.'):
+        parts = parts[1:]
+    for i in range(1, len(parts)):
+        if parts[i - 1] in ('containers', 'images', 'exec', 'networks', 'volumes') and \
+                parts[i] not in ('json', 'create', 'prune', 'search', 'load'):
+            parts[i] = '{id}'
+            # Image names may contain slashes; keep only the action suffix
+            tail = parts[-1] if len(parts) > i + 1 else None
+            parts = parts[:i + 1] + ([tail] if tail else [])
+            break
+    return '/'.join(parts)
+
+
+def record_docker_response(response, *args, **kwargs):
+    """requests response hook installed on the Docker API client"""
+    request = response.request
+    path = request.path_url.split('?', 1)[0]
+    DOCKER_API_SECONDS.observe(
+        response.elapsed.total_seconds(),
+        method=request.method,
+        endpoint=normalize_docker_path(path),
+        status=f'{response.status_code // 100}xx')
+    return response
+
+
+def count_bytes(chunks, operation):
+    """Pass a byte generator through while counting it and timing the whole stream"""
+    start = time.perf_counter()
+    try:
+        for chunk in chunks:
+            ARCHIVE_BYTES.inc(len(chunk), operation=operation)
+            yield chunk
+    finally:
+        ARCHIVE_SECONDS.observe(time.perf_counter() - start, operation=operation)
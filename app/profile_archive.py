@@ -0,0 +1,693 @@
+"""
+Profile Archive - Stream profile exports and imports without staging them on disk
+"""
+import collections
+import os
+import shutil
+import stat
+import struct
+import tarfile
+import threading
+import time
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from config import (CHROME_PROFILES_DIR, EXCLUDE_DIRS, EXCLUDE_FILES, EXPORT_CHUNK_SIZE,
+                    EXPORT_PARALLEL_MAX_FILE, EXPORT_WORKERS, IMPORT_MAX_BYTES,
+                    IMPORT_MAX_ENTRIES, IMPORT_MAX_UPLOAD_BYTES, IMPORT_WORKERS)
+from docker_manager import is_valid_profile_name
+from metrics import ARCHIVE_BYTES
+
+try:
+    import zstandard
+    _ZSTD_ERRORS = (zstandard.ZstdError,)
+except ImportError:
+    zstandard = None
+    _ZSTD_ERRORS = ()
+
+# codec -> (file extension, mimetype)
+EXPORT_CODECS = {
+    'store': ('zip', 'application/zip'),
+    'deflate': ('zip', 'application/zip'),
+    'zstd': ('tar.zst', 'application/zstd'),
+}
+
+# codec -> (lowest, highest) compression level
+EXPORT_LEVELS = {
+    'deflate': (0, 9),
+    'zstd': (1, 22),
+}
+
+# Frame magic of zstd-compressed (tar.zst) uploads
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+_FLAG_DATA_DESCRIPTOR = 0x08
+_FLAG_UTF8 = 0x800
+_MADE_BY_UNIX = 3 << 8 | 45
+
+
+def iter_profile_files(profile_dir):
+    """Yield (file_path, arcname, stat) for every exportable file in a profile
+
+    Cache directories and Chrome lock files are skipped, as are symlinks that
+    point outside the profile. The arcname keeps the profile name as the root
+    folder of the archive.
+    """
+    parent_dir = os.path.dirname(profile_dir)
+    for root, dirs, files in os.walk(profile_dir):
+        # Filter out cache directories to keep export clean and focused on User Data
+        dirs[:] = [d for d in dirs if d not in EXCLUDE_DIRS]
+
+        for file in files:
+            if file in EXCLUDE_FILES:
+                continue
+
+            file_path = os.path.join(root, file)
+
+            # Skip if it's a symlink that points outside the profile
+            if os.path.islink(file_path):
+                try:
+                    link_target = os.readlink(file_path)
+                    if not os.path.isabs(link_target) or not link_target.startswith(profile_dir):
+                        continue  # Skip external symlinks
+                except OSError:
+                    continue
+
+            # Only include files that exist and are regular files
+            try:
+                st = os.stat(file_path)
+            except OSError:
+                continue
+            if not stat.S_ISREG(st.st_mode):
+                continue
+
+            yield file_path, os.path.relpath(file_path, parent_dir), st
+
+
+def check_export_level(codec, level):
+    """Raise ValueError unless level is None or a valid level for the codec"""
+    if level is None:
+        return
+    if not isinstance(level, int) or isinstance(level, bool):
+        raise ValueError('level must be an integer')
+    if codec not in EXPORT_LEVELS:
+        raise ValueError(f'The {codec} codec takes no compression level')
+    lowest, highest = EXPORT_LEVELS[codec]
+    if not lowest <= level <= highest:
+        raise ValueError(f'level must be between {lowest} and {highest} for {codec}')
+
+
+def stream_profile_export(profile_dir, codec='deflate', level=None):
+    """Return a generator of archive bytes for a profile
+
+    codec is one of EXPORT_CODECS; level is the deflate (0-9) or zstd
+    (1-22) compression level. Invalid arguments raise ValueError here,
+    before any byte is generated.
+    """
+    check_export_level(codec, level)
+    if codec == 'store':
+        return _ZipStreamWriter(profile_dir, 0).generate()
+    if codec == 'deflate':
+        return _ZipStreamWriter(profile_dir, 6 if level is None else level).generate()
+    if codec == 'zstd':
+        if zstandard is None:
+            raise ValueError('zstd export requires the zstandard Python package')
+        return _stream_tar_zstd(profile_dir, 3 if level is None else level)
+    raise ValueError(f'Unknown export codec: {codec}')
+
+
+def write_profile_export(profile_dir, path, job, codec='deflate', level=None):
+    """Write an export archive to path for an export job; return its size in bytes"""
+    chunks = stream_profile_export(profile_dir, codec, level)
+    part_path = f'{path}.part'
+    try:
+        with open(part_path, 'wb') as f:
+            for chunk in chunks:
+                job.raise_if_cancelled()
+                f.write(chunk)
+                job.update(bytes_done=job.bytes_done + len(chunk))
+        os.replace(part_path, path)
+    except BaseException:
+        chunks.close()
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    return os.path.getsize(path)
+
+
+class _Sink:
+    """Write-only file object that buffers output until the generator drains it"""
+
+    def __init__(self):
+        self._parts = []
+        self.pending = 0
+        self.offset = 0
+
+    def write(self, data):
+        if data:
+            self._parts.append(bytes(data))
+            self.pending += len(data)
+            self.offset += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        self.pending = 0
+        return data
+
+
+def _dos_datetime(mtime):
+    t = time.localtime(max(mtime, 315532800))  # zip cannot store dates before 1980
+    return ((t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2),
+            ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday)
+
+
+def _read_whole(file_path, level):
+    """Read and compress one small file (runs on the worker pool)"""
+    try:
+        with open(file_path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    crc = zlib.crc32(data)
+    size = len(data)
+    if level > 0:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        compressed = compressor.compress(data) + compressor.flush()
+        # Keep already-compressed content (images, extension packs) stored
+        if len(compressed) < size:
+            return compressed, crc, size, ZIP_DEFLATED
+    return data, crc, size, ZIP_STORED
+
+
+class _ZipStreamWriter:
+    """Zip writer for non-seekable output
+
+    Small files are read and deflated in parallel on a thread pool (zlib
+    releases the GIL). Large files are streamed in chunks with a trailing data
+    descriptor so memory stays bounded. Zip64 records are emitted when sizes,
+    offsets or the entry count need them.
+    """
+
+    def __init__(self, profile_dir, level):
+        self.profile_dir = profile_dir
+        self.level = level
+        self.sink = _Sink()
+        self.entries = []
+
+    def generate(self):
+        window = collections.deque()
+        with ThreadPoolExecutor(max_workers=EXPORT_WORKERS) as pool:
+            for file_path, arcname, st in iter_profile_files(self.profile_dir):
+                if st.st_size <= EXPORT_PARALLEL_MAX_FILE:
+                    window.append((arcname, st, pool.submit(_read_whole, file_path, self.level)))
+                    if len(window) < EXPORT_WORKERS * 2:
+                        continue
+                    # Bound the read-ahead window; flush in walk order
+                    self._write_buffered(*window.popleft())
+                else:
+                    while window:
+                        yield from self._drain_if_full()
+                        self._write_buffered(*window.popleft())
+                    yield from self._write_streamed(file_path, arcname, st)
+                yield from self._drain_if_full()
+
+            while window:
+                self._write_buffered(*window.popleft())
+                yield from self._drain_if_full()
+
+        self._write_central_directory()
+        yield self.sink.drain()
+
+    def _drain_if_full(self):
+        if self.sink.pending >= EXPORT_CHUNK_SIZE:
+            yield self.sink.drain()
+
+    def _write_buffered(self, arcname, st, future):
+        result = future.result()
+        if result is None:
+            return  # Skip files we can't read (permissions, locked files, etc.)
+        data, crc, size, method = result
+        zip64 = size >= ZIP64_LIMIT or len(data) >= ZIP64_LIMIT
+        entry = self._entry(arcname, st, method, 0)
+        entry.update(crc=crc, size=size, compressed=len(data))
+        self._write_local_header(entry, zip64)
+        self.sink.write(data)
+        self.entries.append(entry)
+
+    def _write_streamed(self, file_path, arcname, st):
+        try:
+            f = open(file_path, 'rb')
+        except OSError:
+            return
+        with f:
+            method = ZIP_DEFLATED if self.level > 0 else ZIP_STORED
+            # Decided up front since the local header comes first
+            zip64 = st.st_size >= ZIP64_LIMIT - EXPORT_CHUNK_SIZE * 64
+            entry = self._entry(arcname, st, method, _FLAG_DATA_DESCRIPTOR)
+            self._write_local_header(entry, zip64)
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, -15) if self.level > 0 else None
+            crc = size = compressed = 0
+            while True:
+                try:
+                    chunk = f.read(EXPORT_CHUNK_SIZE)
+                except OSError:
+                    break  # Keep what was read; crc and sizes describe exactly that
+                if not chunk:
+                    break
+                crc = zlib.crc32(chunk, crc)
+                size += len(chunk)
+                if compressor:
+                    chunk = compressor.compress(chunk)
+                compressed += len(chunk)
+                self.sink.write(chunk)
+                yield from self._drain_if_full()
+            if compressor:
+                tail = compressor.flush()
+                compressed += len(tail)
+                self.sink.write(tail)
+        if not zip64 and max(size, compressed) >= ZIP64_LIMIT:
+            raise OSError(f'{file_path} grew past 4 GiB while being exported')
+
+        entry.update(crc=crc, size=size, compressed=compressed)
+        if zip64:
+            self.sink.write(struct.pack('<IIQQ', 0x08074b50, crc, compressed, size))
+        else:
+            self.sink.write(struct.pack('<IIII', 0x08074b50, crc, compressed, size))
+        self.entries.append(entry)
+
+    def _entry(self, arcname, st, method, flags):
+        dos_time, dos_date = _dos_datetime(st.st_mtime)
+        return {
+            'name': arcname.encode('utf-8', 'surrogateescape'),
+            'mode': st.st_mode,
+            'method': method,
+            'flags': flags | _FLAG_UTF8,
+            'time': dos_time,
+            'date': dos_date,
+            'offset': self.sink.offset,
+            'crc': 0,
+            'size': 0,
+            'compressed': 0,
+        }
+
+    def _write_local_header(self, entry, zip64):
+        crc, size, compressed = entry['crc'], entry['size'], entry['compressed']
+        extra = b''
+        if zip64:
+            extra = struct.pack('<HHQQ', 1, 16, size, compressed)
+            size = compressed = ZIP64_LIMIT
+        self.sink.write(struct.pack(
+            '<IHHHHHIIIHH', 0x04034b50, 45 if zip64 else 20, entry['flags'],
+            entry['method'], entry['time'], entry['date'], crc, compressed, size,
+            len(entry['name']), len(extra)))
+        self.sink.write(entry['name'])
+        self.sink.write(extra)
+
+    def _write_central_directory(self):
+        cd_offset = self.sink.offset
+        for entry in self.entries:
+            size, compressed, offset = entry['size'], entry['compressed'], entry['offset']
+            zip64_fields = []
+            if size >= ZIP64_LIMIT:
+                zip64_fields.append(size)
+                size = ZIP64_LIMIT
+            if compressed >= ZIP64_LIMIT:
+                zip64_fields.append(compressed)
+                compressed = ZIP64_LIMIT
+            if offset >= ZIP64_LIMIT:
+                zip64_fields.append(offset)
+                offset = ZIP64_LIMIT
+            extra = b''
+            if zip64_fields:
+                extra = struct.pack(f'<HH{len(zip64_fields)}Q', 1, 8 * len(zip64_fields), *zip64_fields)
+            self.sink.write(struct.pack(
+                '<IHHHHHHIIIHHHHHII', 0x02014b50, _MADE_BY_UNIX, 45 if extra else 20,
+                entry['flags'], entry['method'], entry['time'], entry['date'],
+                entry['crc'], compressed, size, len(entry['name']), len(extra),
+                0, 0, 0, (entry['mode'] & 0xFFFF) << 16, offset))
+            self.sink.write(entry['name'])
+            self.sink.write(extra)
+
+        cd_size = self.sink.offset - cd_offset
+        count = len(self.entries)
+        if count >= 0xFFFF or cd_size >= ZIP64_LIMIT or cd_offset >= ZIP64_LIMIT:
+            eocd64_offset = self.sink.offset
+            self.sink.write(struct.pack(
+                '<IQHHIIQQQQ', 0x06064b50, 44, _MADE_BY_UNIX, 45, 0, 0,
+                count, count, cd_size, cd_offset))
+            self.sink.write(struct.pack('<IIQI', 0x07064b50, 0, eocd64_offset, 1))
+            count = min(count, 0xFFFF)
+            cd_size = min(cd_size, ZIP64_LIMIT)
+            cd_offset = min(cd_offset, ZIP64_LIMIT)
+        self.sink.write(struct.pack(
+            '<IHHHHIIH', 0x06054b50, 0, 0, count, count, cd_size, cd_offset, 0))
+
+
+def _stream_tar_zstd(profile_dir, level):
+    """Stream a zstd-compressed tar, compressing on zstd's own worker threads"""
+    sink = _Sink()
+    compressor = zstandard.ZstdCompressor(level=level, threads=EXPORT_WORKERS)
+    writer = compressor.stream_writer(sink, closefd=False)
+    written = 0
+
+    for file_path, arcname, st in iter_profile_files(profile_dir):
+        try:
+            f = open(file_path, 'rb')
+        except OSError:
+            continue
+        with f:
+            info = tarfile.TarInfo(arcname)
+            info.size = st.st_size
+            info.mode = st.st_mode & 0o7777
+            info.mtime = int(st.st_mtime)
+            header = info.tobuf(tarfile.PAX_FORMAT, 'utf-8', 'surrogateescape')
+            writer.write(header)
+            # The header fixes the size: pad or truncate if the file changed
+            remaining = st.st_size
+            while remaining > 0:
+                try:
+                    chunk = f.read(min(EXPORT_CHUNK_SIZE, remaining))
+                except OSError:
+                    chunk = b''
+                if not chunk:
+                    chunk = bytes(min(EXPORT_CHUNK_SIZE, remaining))
+                writer.write(chunk)
+                remaining -= len(chunk)
+                if sink.pending >= EXPORT_CHUNK_SIZE:
+                    yield sink.drain()
+            padding = -st.st_size % tarfile.BLOCKSIZE
+            writer.write(bytes(padding))
+            written += len(header) + st.st_size + padding
+        if sink.pending >= EXPORT_CHUNK_SIZE:
+            yield sink.drain()
+
+    # End-of-archive marker, padded to a full record like tarfile does
+    end = 2 * tarfile.BLOCKSIZE
+    end += -(written + end) % tarfile.RECORDSIZE
+    writer.write(bytes(end))
+    writer.flush(zstandard.FLUSH_FRAME)
+    yield sink.drain()
+
+
+class ArchiveImportError(Exception):
+    """The uploaded archive cannot be imported"""
+    status_code = 400
+
+
+class ImportLimitExceeded(ArchiveImportError):
+    """The upload or its contents exceed the configured import limits"""
+    status_code = 413
+
+
+class _UploadReader:
+    """Read-only stream wrapper that counts bytes, enforces the upload cap
+    and lets the importer peek at the magic bytes"""
+
+    def __init__(self, stream, job):
+        self._stream = stream
+        self._job = job
+        self._peeked = b''
+
+    def peek(self, size):
+        while len(self._peeked) < size:
+            data = self._read_raw(size - len(self._peeked))
+            if not data:
+                break
+            self._peeked += data
+        return self._peeked[:size]
+
+    def read(self, size=-1):
+        if self._peeked:
+            data = self._peeked if size < 0 else self._peeked[:size]
+            self._peeked = self._peeked[len(data):]
+            return data
+        return self._read_raw(size)
+
+    def _read_raw(self, size):
+        data = self._stream.read(size if size >= 0 else EXPORT_CHUNK_SIZE)
+        self._job.raise_if_cancelled()
+        if data:
+            ARCHIVE_BYTES.inc(len(data), operation='import')
+            self._job.update(bytes_done=self._job.bytes_done + len(data))
+            if self._job.bytes_done > IMPORT_MAX_UPLOAD_BYTES:
+                raise ImportLimitExceeded(
+                    f'Upload exceeds the {IMPORT_MAX_UPLOAD_BYTES} byte import limit')
+        return data
+
+
+def _sanitize_member_path(name):
+    """Normalise an archive member path; reject absolute paths and '..'"""
+    name = name.replace('\\', '/')
+    if name.startswith('/') or (len(name) > 1 and name[1] == ':'):
+        raise ArchiveImportError(f'Archive contains an absolute path: {name}')
+    parts = [p for p in name.split('/') if p not in ('', '.')]
+    if '..' in parts:
+        raise ArchiveImportError(f'Archive contains a path outside the profile: {name}')
+    return parts
+
+
+class _ImportTarget:
+    """Maps sanitised member paths into a hidden staging directory
+
+    The profile name comes from the archive's single top-level directory, or
+    from the uploaded file name when the archive has no directory structure.
+    """
+
+    def __init__(self, filename, job, profile_exists):
+        self.filename = filename
+        self._profile_exists = profile_exists
+        self.staging_dir = os.path.join(CHROME_PROFILES_DIR, f'.import-{job.id}')
+        self.profile_name = None
+        self.rooted = None
+        self._job = job
+        self._entries = 0
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def resolve(self, member_name, is_dir=False):
+        """Staging path for a member, or None if it is the profile root itself"""
+        parts = _sanitize_member_path(member_name)
+        if not parts:
+            return None
+        if self.rooted is None:
+            # Decided by the first member, like the previous extractall() import
+            self.rooted = is_dir or len(parts) > 1
+            self.profile_name = parts[0] if self.rooted else os.path.splitext(self.filename)[0]
+            if self.profile_name.endswith('.tar'):
+                self.profile_name = self.profile_name[:-len('.tar')]
+            if not is_valid_profile_name(self.profile_name):
+                raise ArchiveImportError(f'Invalid profile name in archive: {self.profile_name}')
+            if self._profile_exists(self.profile_name):
+                raise ArchiveImportError(f'Profile {self.profile_name} already exists')
+            os.makedirs(self.staging_dir)
+        if self.rooted:
+            if parts[0] != self.profile_name:
+                raise ArchiveImportError('Archive must contain a single profile directory')
+            parts = parts[1:]
+            if not parts:
+                return None
+        return os.path.join(self.staging_dir, *parts)
+
+    def account(self, size):
+        """Count one entry of the given size against the import limits"""
+        with self._lock:
+            self._entries += 1
+            self._bytes += size
+            if self._entries > IMPORT_MAX_ENTRIES:
+                raise ImportLimitExceeded(f'Archive has more than {IMPORT_MAX_ENTRIES} entries')
+            if self._bytes > IMPORT_MAX_BYTES:
+                raise ImportLimitExceeded(f'Archive expands to more than {IMPORT_MAX_BYTES} bytes')
+            self._job.update(entries=self._entries)
+
+    def commit(self):
+        """Move the staged profile into place and return its directory"""
+        if self.profile_name is None:
+            raise ArchiveImportError('Empty archive')
+        profile_dir = os.path.join(CHROME_PROFILES_DIR, self.profile_name)
+        if os.path.exists(profile_dir) or self._profile_exists(self.profile_name):
+            raise ArchiveImportError(f'Profile {self.profile_name} already exists')
+        os.rename(self.staging_dir, profile_dir)
+        return profile_dir
+
+    def discard(self):
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+
+
+def receive_profile_upload(stream, filename, job, profile_exists=None):
+    """Read an uploaded profile archive; return a PendingImport to complete it
+
+    tar archives (optionally gzip/bzip2/xz/zstd compressed) are extracted on the
+    fly while the upload is still arriving. zip archives need their central
+    directory, so they are spooled to a hidden file next to the profiles and
+    their members are extracted in parallel by PendingImport.complete(),
+    which can run after the request has returned. Member paths are sanitised
+    and the IMPORT_MAX_* limits enforced. Progress is reported on the job.
+    profile_exists(name) tells whether a profile name is taken (by default,
+    whether its directory exists under CHROME_PROFILES_DIR).
+    """
+    if profile_exists is None:
+        profile_exists = lambda name: os.path.exists(os.path.join(CHROME_PROFILES_DIR, name))
+    reader = _UploadReader(stream, job)
+    target = _ImportTarget(filename, job, profile_exists)
+    job.update(state='running', message='Receiving archive')
+    try:
+        magic = reader.peek(4)
+        if magic[:2] == b'PK':
+            return PendingImport(target, job, _spool_upload(reader, job))
+        try:
+            if magic == ZSTD_MAGIC:
+                # tarfile only detects gzip, bzip2 and xz itself
+                if zstandard is None:
+                    raise ArchiveImportError('zstd archives require the zstandard Python package')
+                decompressed = zstandard.ZstdDecompressor().stream_reader(
+                    reader, read_size=EXPORT_CHUNK_SIZE, read_across_frames=True)
+                tar = tarfile.open(fileobj=decompressed, mode='r|')
+            else:
+                tar = tarfile.open(fileobj=reader, mode='r|*')
+        except tarfile.TarError:
+            raise ArchiveImportError(
+                'Unsupported archive format. Please use .zip, .tar.gz or .tar.zst')
+        with tar:
+            _import_tar(tar, target, job)
+    except (tarfile.TarError, *_ZSTD_ERRORS) as e:
+        target.discard()
+        raise ArchiveImportError(f'Corrupt archive: {e}')
+    except BaseException:
+        target.discard()
+        raise
+    return PendingImport(target, job)
+
+
+class PendingImport:
+    """A received upload whose extraction (zip) and commit are still to do"""
+
+    def __init__(self, target, job, spool_path=None):
+        self._target = target
+        self._job = job
+        self._spool_path = spool_path
+
+    def complete(self):
+        """Finish the import; return (profile_name, profile_dir)"""
+        try:
+            if self._spool_path:
+                _import_zip(self._spool_path, self._target, self._job)
+            return self._target.profile_name, self._target.commit()
+        except zipfile.BadZipFile as e:
+            self.discard()
+            raise ArchiveImportError(f'Corrupt archive: {e}')
+        except BaseException:
+            self.discard()
+            raise
+
+    def discard(self):
+        """Remove everything staged so far"""
+        self._target.discard()
+        if self._spool_path and os.path.exists(self._spool_path):
+            os.remove(self._spool_path)
+
+
+def _import_tar(tar, target, job):
+    for member in tar:
+        job.raise_if_cancelled()
+        if member.isdir():
+            path = target.resolve(member.name, is_dir=True)
+            if path:
+                target.account(0)
+                os.makedirs(path, exist_ok=True)
+        elif member.isfile():
+            path = target.resolve(member.name)
+            if path is None:
+                continue
+            target.account(member.size)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            source = tar.extractfile(member)
+            with open(path, 'wb') as f:
+                shutil.copyfileobj(source, f, EXPORT_CHUNK_SIZE)
+            os.chmod(path, (member.mode & 0o777) | 0o600)
+            os.utime(path, (member.mtime, member.mtime))
+        # Links, devices and FIFOs have no place in a Chrome profile: skipped
+
+
+def _spool_upload(reader, job):
+    """Write the rest of the upload to a hidden file and return its path"""
+    spool_path = os.path.join(CHROME_PROFILES_DIR, f'.upload-{job.id}.zip')
+    try:
+        with open(spool_path, 'wb') as f:
+            while True:
+                data = reader.read(EXPORT_CHUNK_SIZE)
+                if not data:
+                    break
+                f.write(data)
+    except BaseException:
+        if os.path.exists(spool_path):
+            os.remove(spool_path)
+        raise
+    return spool_path
+
+
+def _import_zip(spool_path, target, job):
+    job.update(message='Checking archive')
+    try:
+        try:
+            with zipfile.ZipFile(spool_path) as zipf:
+                infos = zipf.infolist()
+        except zipfile.BadZipFile as e:
+            raise ArchiveImportError(f'Corrupt archive: {e}')
+        if not infos:
+            raise ArchiveImportError('Empty archive')
+
+        # Resolve and check every member before writing anything
+        files = []
+        for info in infos:
+            path = target.resolve(info.filename, is_dir=info.is_dir())
+            if path is None:
+                continue
+            target.account(info.file_size)
+            if info.is_dir():
+                os.makedirs(path, exist_ok=True)
+            else:
+                files.append((info, path))
+
+        job.update(message='Extracting', bytes_done=0,
+                   bytes_total=sum(info.file_size for info, _ in files))
+        # One ZipFile handle per worker thread so members are read in parallel
+        local = threading.local()
+        handles = []
+        progress_lock = threading.Lock()
+
+        def extract(item):
+            info, path = item
+            job.raise_if_cancelled()
+            if not hasattr(local, 'zipf'):
+                local.zipf = zipfile.ZipFile(spool_path)
+                with progress_lock:
+                    handles.append(local.zipf)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with local.zipf.open(info) as source, open(path, 'wb') as f:
+                shutil.copyfileobj(source, f, EXPORT_CHUNK_SIZE)
+            mode = (info.external_attr >> 16) & 0o777
+            if mode:
+                os.chmod(path, mode | 0o600)
+            mtime = time.mktime(info.date_time + (0, 0, -1))
+            os.utime(path, (mtime, mtime))
+            with progress_lock:
+                job.update(bytes_done=job.bytes_done + info.file_size)
+
+        try:
+            with ThreadPoolExecutor(max_workers=IMPORT_WORKERS) as pool:
+                # list() re-raises the first failure
+                list(pool.map(extract, files))
+        finally:
+            for handle in handles:
+                handle.close()
+    finally:
+        if os.path.exists(spool_path):
+            os.remove(spool_path)
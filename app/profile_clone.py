@@ -0,0 +1,188 @@
+"""
+Profile Clone - Provision new profiles from a template profile
+"""
+import errno
+import fcntl
+import os
+import secrets
+import shutil
+import stat
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import CHROME_PROFILES_DIR, CLONE_STRIP_FILES, CLONE_WORKERS
+
+# linux/fs.h: _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+# Errors meaning the filesystem (or pair of filesystems) cannot share extents
+_NO_REFLINK = {errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.ENOSYS}
+
+
+class _TemplateTree:
+    """Directories, regular files and symlinks of a template, relative to it
+
+    Listed once and reused for every clone of a request. Lock and identity
+    files (CLONE_STRIP_FILES) and the contents of the top-level Downloads
+    folder are left out; symlinks are kept only if they stay inside the
+    template.
+    """
+
+    def __init__(self, template_dir):
+        self.dirs = []
+        self.files = []  # (relative path, mode, size)
+        self.links = []  # (relative path, target)
+        for root, subdirs, names in os.walk(template_dir):
+            rel_root = os.path.relpath(root, template_dir)
+            if rel_root == '.':
+                subdirs[:] = [d for d in subdirs if d != 'Downloads']
+                rel_root = ''
+            for name in list(subdirs):
+                if os.path.islink(os.path.join(root, name)):
+                    # os.walk does not descend into symlinked directories
+                    subdirs.remove(name)
+                    names.append(name)
+                else:
+                    self.dirs.append(os.path.join(rel_root, name))
+            for name in names:
+                if name in CLONE_STRIP_FILES:
+                    continue
+                path = os.path.join(root, name)
+                rel_path = os.path.join(rel_root, name)
+                try:
+                    st = os.lstat(path)
+                except OSError:
+                    continue
+                if stat.S_ISLNK(st.st_mode):
+                    target = os.readlink(path)
+                    resolved = os.path.normpath(os.path.join(root, target))
+                    if not os.path.isabs(target) and \
+                            resolved.startswith(os.path.join(template_dir, '')):
+                        self.links.append((rel_path, target))
+                elif stat.S_ISREG(st.st_mode):
+                    self.files.append((rel_path, stat.S_IMODE(st.st_mode), st.st_size))
+        self.bytes = sum(size for _path, _mode, size in self.files)
+
+
+class ProfileCloner:
+    """Creates new profile directories from a template
+
+    File data is shared with the template through FICLONE reflinks where
+    the filesystem supports them (btrfs, XFS, bcachefs, ...), so a clone
+    costs only metadata until either side writes. Elsewhere files are copied
+    with copy_file_range() on a thread pool. Hardlinks are never used: Chromium
+    rewrites files such as its SQLite databases in place, so a write through
+    one profile would show up in all of them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reflink = {}  # st_dev -> whether FICLONE works there
+
+    def clone(self, template_dir, target_names, job=None):
+        """Clone a template into each new profile; returns one result per target"""
+        if job:
+            job.update(message='Listing template files')
+        tree = _TemplateTree(template_dir)
+        if job:
+            job.update(bytes_total=tree.bytes * len(target_names))
+
+        results = []
+        with ThreadPoolExecutor(max_workers=CLONE_WORKERS, thread_name_prefix='clone') as pool:
+            for index, name in enumerate(target_names):
+                if job:
+                    job.raise_if_cancelled()
+                    job.update(message=f'Cloning {name} ({index + 1}/{len(target_names)})')
+                try:
+                    result = self._clone_one(template_dir, tree, name, pool, job)
+                except Exception as e:
+                    if job and job.cancelled:
+                        raise
+                    result = {'name': name, 'status': 'failed', 'error': str(e)}
+                results.append(result)
+                if job:
+                    job.update(entries=index + 1, bytes_done=tree.bytes * (index + 1))
+        return results
+
+    def _clone_one(self, template_dir, tree, profile_name, pool, job):
+        profile_dir = os.path.join(CHROME_PROFILES_DIR, profile_name)
+        if os.path.exists(profile_dir):
+            raise FileExistsError(f'Profile {profile_name} already exists')
+        staging_dir = os.path.join(CHROME_PROFILES_DIR, f'.clone-{secrets.token_hex(6)}')
+        try:
+            os.makedirs(os.path.join(staging_dir, 'Downloads'))
+            for rel_path in tree.dirs:
+                os.makedirs(os.path.join(staging_dir, rel_path), exist_ok=True)
+
+            def copy(entry):
+                if job:
+                    job.raise_if_cancelled()
+                rel_path, mode, _size = entry
+                return self._copy_file(os.path.join(template_dir, rel_path),
+                                       os.path.join(staging_dir, rel_path), mode)
+
+            reflinked = copied = 0
+            for was_reflinked in pool.map(copy, tree.files):
+                if was_reflinked is None:
+                    continue  # Vanished from the template
+                reflinked += was_reflinked
+                copied += not was_reflinked
+            for rel_path, target in tree.links:
+                os.symlink(target, os.path.join(staging_dir, rel_path))
+
+            if os.path.exists(profile_dir):
+                raise FileExistsError(f'Profile {profile_name} already exists')
+            os.rename(staging_dir, profile_dir)
+        except BaseException:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+        return {'name': profile_name, 'status': 'created', 'path': profile_dir,
+                'files': reflinked + copied, 'reflinked': reflinked, 'bytes': tree.bytes}
+
+    def _copy_file(self, source_path, target_path, mode):
+        """Reflink or copy one file; True if reflinked, None if the source is gone"""
+        try:
+            src_fd = os.open(source_path, os.O_RDONLY | os.O_CLOEXEC)
+        except FileNotFoundError:
+            return None
+        try:
+            dst_fd = os.open(target_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_CLOEXEC, mode)
+            try:
+                if self._try_reflink(src_fd, dst_fd):
+                    return True
+                self._copy_data(src_fd, dst_fd)
+                return False
+            finally:
+                os.close(dst_fd)
+        finally:
+            os.close(src_fd)
+
+    def _try_reflink(self, src_fd, dst_fd):
+        device = os.fstat(dst_fd).st_dev
+        with self._lock:
+            supported = self._reflink.get(device, True)
+        if not supported:
+            return False
+        try:
+            fcntl.ioctl(dst_fd, FICLONE, src_fd)
+            return True
+        except OSError as e:
+            if e.errno not in _NO_REFLINK:
+                raise
+            with self._lock:
+                self._reflink[device] = False
+            return False
+
+    def _copy_data(self, src_fd, dst_fd):
+        if hasattr(os, 'copy_file_range'):
+            try:
+                while os.copy_file_range(src_fd, dst_fd, 1 << 30):
+                    pass
+                return
+            except OSError as e:
+                if e.errno not in _NO_REFLINK:
+                    raise
+                # Kernel too old or cross-filesystem: start over with plain reads
+                os.lseek(src_fd, 0, os.SEEK_SET)
+                os.lseek(dst_fd, 0, os.SEEK_SET)
+                os.ftruncate(dst_fd, 0)
+        with open(src_fd, 'rb', closefd=False) as source, open(dst_fd, 'wb', closefd=False) as target:
+            shutil.copyfileobj(source, target, 1024 * 1024)
@@ -0,0 +1,211 @@
+"""
+Profile Compactor - Keep stopped profiles under their disk quota
+"""
+import docker
+import os
+import re
+import shutil
+import threading
+import time
+from config import COMPACTION_DIRS, COMPACTION_INTERVAL
+
+# Chromium's profile lock and the files that go with it
+SINGLETON_FILES = ('SingletonLock', 'SingletonSocket', 'SingletonCookie')
+# Containers run with their short ID as host name
+_CONTAINER_HOST_RE = re.compile(r'^[0-9a-f]{12}$')
+
+
+def _dir_usage(path):
+    """(total bytes, newest mtime) of a directory tree"""
+    total = 0
+    newest = os.lstat(path).st_mtime
+    for root, dirs, files in os.walk(path):
+        for name in dirs:
+            try:
+                newest = max(newest, os.lstat(os.path.join(root, name)).st_mtime)
+            except OSError:
+                continue
+        for name in files:
+            try:
+                st = os.lstat(os.path.join(root, name))
+            except OSError:
+                continue
+            total += st.st_size
+            newest = max(newest, st.st_mtime)
+    return total, newest
+
+
+class ProfileCompactor:
+    """Prunes disposable directories (COMPACTION_DIRS) of profiles over quota
+
+    Candidates are removed whole, least recently written first, until the
+    profile fits its quota_mb setting; Chromium recreates them on demand.
+    Running, paused and starting profiles are skipped, as are profiles whose
+    SingletonLock is held by anything but the profile's own stopped
+    container. A lock left by a container that no longer runs (e.g. one
+    replaced when the launch configuration changed) is stale and removed.
+    A scheduled pass runs every COMPACTION_INTERVAL seconds over profiles
+    that have a quota.
+    """
+
+    def __init__(self, docker_mgr, settings):
+        self.docker_mgr = docker_mgr
+        self.settings = settings
+        self._lock = threading.Lock()
+        self._results = {}  # profile name -> result of the last compaction
+        self._thread = None
+
+    def start(self):
+        """Start the scheduled compaction thread (idempotent)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='compactor', daemon=True)
+            self._thread.start()
+
+    def results(self):
+        """Last compaction result per profile"""
+        with self._lock:
+            return dict(self._results)
+
+    def forget(self, profile_name):
+        with self._lock:
+            self._results.pop(profile_name, None)
+
+    def _run(self):
+        while True:
+            time.sleep(COMPACTION_INTERVAL)
+            try:
+                self.compact_all()
+            except Exception as e:
+                print(f"⚠️  Scheduled compaction failed: {e}")
+
+    def compact_all(self):
+        """Compact every stopped profile that has a quota and exceeds it"""
+        statuses = self.docker_mgr.get_status_snapshot()
+        results = []
+        for profile_name in self.settings.names_with_setting('quota_mb'):
+            if statuses.get(profile_name) in ('running', 'paused', 'restarting'):
+                continue
+            if not os.path.isdir(self.docker_mgr.get_profile_dir(profile_name)):
+                continue
+            results.append(self.compact(profile_name))
+        reclaimed = sum(r.get('bytes_reclaimed', 0) for r in results)
+        if reclaimed:
+            print(f"🗑️  Compaction reclaimed {reclaimed / (1024 * 1024):.1f} MB "
+                  f"from {sum(1 for r in results if r.get('bytes_reclaimed'))} profile(s)")
+        return results
+
+    def compact(self, profile_name, job=None):
+        """Prune a stopped profile down to its quota (or all disposable data without one)"""
+        quota_mb = self.settings.get(profile_name).get('quota_mb')
+        result = {'profile': profile_name, 'quota_mb': quota_mb, 't': round(time.time(), 3)}
+        try:
+            container = self.docker_mgr.begin_maintenance(profile_name)
+        except RuntimeError as e:
+            result.update(status='skipped', reason=str(e))
+            return self._record(result)
+        try:
+            result.update(self._compact(profile_name, container, quota_mb, job))
+        finally:
+            self.docker_mgr.end_maintenance(profile_name)
+            self.docker_mgr.size_index.request_refresh(self.docker_mgr.get_profile_dir(profile_name))
+        return self._record(result)
+
+    def _record(self, result):
+        with self._lock:
+            self._results[result['profile']] = result
+        return result
+
+    def _compact(self, profile_name, container, quota_mb, job):
+        profile_dir = self.docker_mgr.get_profile_dir(profile_name)
+        lock_owner = self._lock_owner(profile_dir)
+        stale_lock = None
+        if lock_owner is not None and (container is None or not container.id.startswith(lock_owner)):
+            if not self._is_stale_lock(lock_owner):
+                return {'status': 'skipped', 'reason': f'profile is locked by {lock_owner}'}
+            print(f"🔓 Removing stale SingletonLock of {profile_name} "
+                  f"(container {lock_owner} no longer runs)")
+            self._remove_lock(profile_dir)
+            stale_lock = lock_owner
+
+        size = self.docker_mgr.size_index.scan(profile_dir)
+        target = quota_mb * 1024 * 1024 if quota_mb else 0
+        outcome = {'status': 'under_quota', 'bytes_before': size, 'bytes_reclaimed': 0,
+                   'dirs_removed': 0}
+        if stale_lock:
+            outcome['stale_lock_removed'] = stale_lock
+        if size > target:
+            if job:
+                job.update(message='Scanning disposable directories')
+            candidates = []
+            for path in self._candidates(profile_dir):
+                try:
+                    candidates.append((path, *_dir_usage(path)))
+                except OSError:
+                    continue
+            # Least recently written first
+            candidates.sort(key=lambda c: c[2])
+            if job:
+                job.update(bytes_total=min(size - target, sum(c[1] for c in candidates)))
+
+            for path, dir_bytes, _newest in candidates:
+                if size <= target:
+                    break
+                if job:
+                    job.raise_if_cancelled()
+                    job.update(message=f'Removing {os.path.relpath(path, profile_dir)}')
+                shutil.rmtree(path, ignore_errors=True)
+                if os.path.exists(path):
+                    continue
+                size -= dir_bytes
+                outcome['bytes_reclaimed'] += dir_bytes
+                outcome['dirs_removed'] += 1
+                if job:
+                    job.update(bytes_done=outcome['bytes_reclaimed'])
+            outcome['status'] = 'compacted' if size <= target else 'over_quota'
+        outcome['bytes_after'] = size
+        if outcome['bytes_reclaimed']:
+            print(f"🗑️  Compacted {profile_name}: reclaimed "
+                  f"{outcome['bytes_reclaimed'] / (1024 * 1024):.1f} MB")
+        return outcome
+
+    def _candidates(self, profile_dir):
+        """Paths of COMPACTION_DIRS directories in a profile (not nested in each other)"""
+        for root, dirs, _files in os.walk(profile_dir):
+            for name in [d for d in dirs if d in COMPACTION_DIRS]:
+                dirs.remove(name)
+                path = os.path.join(root, name)
+                if not os.path.islink(path):
+                    yield path
+
+    def _is_stale_lock(self, lock_owner):
+        """Whether a lock names a container that does not run anymore
+
+        Locks from other hosts (e.g. Chromium started on the host itself) are
+        never considered stale.
+        """
+        if not _CONTAINER_HOST_RE.match(lock_owner):
+            return False
+        try:
+            owner = self.docker_mgr.client.containers.get(lock_owner)
+        except docker.errors.NotFound:
+            return True
+        except docker.errors.APIError:
+            return False
+        return owner.status not in ('running', 'paused', 'restarting')
+
+    def _remove_lock(self, profile_dir):
+        for name in SINGLETON_FILES:
+            try:
+                os.unlink(os.path.join(profile_dir, name))
+            except FileNotFoundError:
+                pass
+
+    def _lock_owner(self, profile_dir):
+        """Host name recorded in Chromium's SingletonLock ('<hostname>-<pid>'), or None"""
+        try:
+            target = os.readlink(os.path.join(profile_dir, 'SingletonLock'))
+        except FileNotFoundError:
+            return None
+        except OSError:
+            return '(unreadable lock)'
+        return target.rpartition('-')[0] or target
@@ -0,0 +1,179 @@
+"""
+Profile Feed - Versioned profile list for conditional, paginated and delta polling
+"""
+import base64
+import json
+import secrets
+import threading
+import time
+from config import (PROFILE_FEED_TTL, PROFILE_FEED_TOMBSTONES, PROFILE_FEED_CPU_STEP,
+                    PROFILE_FEED_MEMORY_STEP_MB)
+
+# ?sort= values -> entry field
+SORT_FIELDS = {
+    'name': 'name',
+    'status': 'status',
+    'size': 'size_mb',
+    'last_started': 'last_started_at',
+}
+
+
+def _sort_key(entry, field):
+    """Total order over entries: never-set values first, ties broken by name"""
+    value = entry.get(field)
+    return (value is not None, value if value is not None else 0, entry['name'])
+
+
+def coarse_stats(sample):
+    """The CPU and memory of a stats sample, rounded for the list (None stays None)
+
+    Exact samples change every STATS_SAMPLE_INTERVAL, which would give every
+    running profile a new version on each rebuild.
+    """
+    if sample is None:
+        return None
+    cpu_percent = sample['cpu_percent']
+    memory_step = PROFILE_FEED_MEMORY_STEP_MB * 1024 * 1024
+    return {
+        'cpu_percent': (None if cpu_percent is None else
+                        round(cpu_percent / PROFILE_FEED_CPU_STEP) * PROFILE_FEED_CPU_STEP),
+        'memory_bytes': round(sample['memory_bytes'] / memory_step) * memory_step,
+    }
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not (isinstance(key, list) and len(key) == 3 and isinstance(key[0], bool)
+                and isinstance(key[2], str)):
+            raise ValueError
+        return tuple(key)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+
+class ProfileFilter:
+    """Server-side filter for the profile list (?q=, ?tag=, ?status=)"""
+
+    def __init__(self, q=None, tag=None, status=None):
+        self.q = q.lower() if q else None
+        self.tag = tag or None
+        self.status = status or None
+
+    def __call__(self, entry):
+        return ((self.q is None or self.q in entry['name'].lower()) and
+                (self.tag is None or self.tag in entry['tags']) and
+                (self.status is None or entry['status'] == self.status))
+
+
+class ProfileFeed:
+    """The profile list as a versioned snapshot
+
+    build() is called at most once per PROFILE_FEED_TTL seconds, however
+    many clients poll; each entry that changed since the previous build
+    gets a new version number. The feed's version ('<boot id>-<n>') serves
+    as the ETag of /api/profiles, and ?since=<version> returns only the
+    entries changed (or removed) after it. Removals are remembered for the
+    last PROFILE_FEED_TOMBSTONES profiles; older or foreign versions get
+    the full list instead.
+    """
+
+    def __init__(self, build):
+        self._build = build
+        self._lock = threading.Lock()
+        self._boot_id = secrets.token_hex(4)
+        self._counter = 0
+        self._entries = {}  # name -> (version counter, entry)
+        self._removed = {}  # name -> version counter of the removal
+        self._floor = 0  # oldest counter deltas can still be computed from
+        self._built_at = None
+
+    def invalidate(self):
+        """Rebuild on the next request (after something changed profiles)"""
+        with self._lock:
+            self._built_at = None
+
+    def _snapshot(self):
+        """(version counter, entries, removals, floor), rebuilt when older than the TTL"""
+        with self._lock:
+            now = time.monotonic()
+            if self._built_at is None or now - self._built_at > PROFILE_FEED_TTL:
+                self._refresh()
+                self._built_at = now
+            return self._counter, dict(self._entries), dict(self._removed), self._floor
+
+    def _version(self, counter):
+        return f'{self._boot_id}-{counter}'
+
+    def _refresh(self):
+        current = {entry['name']: entry for entry in self._build()}
+        for name, entry in current.items():
+            previous = self._entries.get(name)
+            if previous is None or self._comparable(previous[1]) != self._comparable(entry):
+                self._counter += 1
+                self._entries[name] = (self._counter, entry)
+                self._removed.pop(name, None)
+        for name in self._entries.keys() - current.keys():
+            self._counter += 1
+            del self._entries[name]
+            self._removed[name] = self._counter
+        if len(self._removed) > PROFILE_FEED_TOMBSTONES:
+            oldest = sorted(self._removed.items(), key=lambda item: item[1])
+            for name, counter in oldest[:len(self._removed) - PROFILE_FEED_TOMBSTONES]:
+                del self._removed[name]
+                self._floor = max(self._floor, counter)
+
+    def _comparable(self, entry):
+        # Rescans refresh size_updated_at even when nothing changed; only
+        # whether a size is known matters to clients
+        return {**entry, 'size_updated_at': entry.get('size_updated_at') is not None}
+
+    def page(self, matches, sort='name', descending=False, limit=None, cursor=None):
+        """(version, entries, total matching, next cursor) of one page of the list"""
+        counter, entries, _removed, _floor = self._snapshot()
+        field = SORT_FIELDS[sort]
+        selected = sorted((entry for _counter, entry in entries.values() if matches(entry)),
+                          key=lambda entry: _sort_key(entry, field), reverse=descending)
+        total = len(selected)
+        if cursor is not None:
+            after = decode_cursor(cursor)
+            try:
+                selected = [entry for entry in selected
+                            if (_sort_key(entry, field) < after if descending
+                                else _sort_key(entry, field) > after)]
+            except TypeError:
+                raise ValueError('Cursor does not belong to this sort order')
+        next_cursor = None
+        if limit is not None and len(selected) > limit:
+            selected = selected[:limit]
+            next_cursor = encode_cursor(list(_sort_key(selected[-1], field)))
+        return self._version(counter), selected, total, next_cursor
+
+    def changes(self, since, matches):
+        """(version, changed entries, removed names) after a version, or None if unknown
+
+        Entries that changed but no longer match the filter count as removed.
+        """
+        counter, entries, removed, floor = self._snapshot()
+        boot_id, _, since_counter = since.partition('-')
+        if boot_id != self._boot_id or not since_counter.isdigit():
+            return None
+        since_counter = int(since_counter)
+        if not floor <= since_counter <= counter:
+            return None
+        changed, gone = [], []
+        for name, (entry_counter, entry) in entries.items():
+            if entry_counter <= since_counter:
+                continue
+            if matches(entry):
+                changed.append(entry)
+            else:
+                gone.append(name)
+        gone.extend(name for name, removed_counter in removed.items()
+                    if removed_counter > since_counter)
+        changed.sort(key=lambda entry: entry['name'])
+        return self._version(counter), changed, sorted(gone)
@@ -0,0 +1,371 @@
+"""
+Profile Registry - Indexed record of every profile (SQLite, WAL mode)
+"""
+import contextlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from config import (CHROME_PROFILES_DIR, REGISTRY_DB_FILE, REGISTRY_RECONCILE_INTERVAL,
+                    REGISTRY_POOL_SIZE, PROFILE_SETTINGS_FILE, DEFAULT_PROFILE_RESOURCES, CACHE_DEFAULT_MODE)
+
+SCHEMA_VERSION = 1
+SCHEMA = [
+    """CREATE TABLE profiles (
+        name TEXT PRIMARY KEY,
+        path TEXT NOT NULL,
+        present INTEGER NOT NULL DEFAULT 1,
+        registered_at REAL NOT NULL,
+        last_started_at REAL,
+        size_bytes INTEGER,
+        size_updated_at REAL,
+        fingerprint TEXT,
+        settings TEXT NOT NULL DEFAULT '{}'
+    )""",
+    "CREATE UNIQUE INDEX profiles_path ON profiles (path)",
+    "CREATE INDEX profiles_last_started ON profiles (present, last_started_at)",
+    "CREATE INDEX profiles_size ON profiles (present, size_bytes)",
+    """CREATE TABLE profile_tags (
+        name TEXT NOT NULL REFERENCES profiles (name) ON DELETE CASCADE ON UPDATE CASCADE,
+        tag TEXT NOT NULL,
+        PRIMARY KEY (name, tag)
+    )""",
+    "CREATE INDEX profile_tags_tag ON profile_tags (tag, name)",
+]
+
+# list() sort keys -> ORDER BY expression
+SORT_COLUMNS = {
+    'name': 'p.name',
+    'last_started_at': 'p.last_started_at',
+    'size': 'p.size_bytes',
+    'registered_at': 'p.registered_at',
+}
+
+
+def is_valid_profile_name(profile_name):
+    """Profile names are limited to letters, numbers, dash and underscore"""
+    return bool(profile_name) and all(c.isalnum() or c in '-_' for c in profile_name)
+
+
+def _default_path(profile_name):
+    return os.path.join(CHROME_PROFILES_DIR, profile_name)
+
+
+class ProfileRegistry:
+    """Name, directory, settings, tags and cached state of every profile
+
+    The source of truth for which profiles exist and where their data lives
+    (a profile created with a custom location keeps it). Per-profile settings
+    (resources, cache mode, quota, ...) are a JSON column, tags a separate
+    indexed table. Listing is one query however many profiles there are.
+
+    Directories created or deleted behind the manager's back are picked up
+    by reconcile(): on startup, whenever the mtime of CHROME_PROFILES_DIR
+    changes (reconcile_if_changed) and every REGISTRY_RECONCILE_INTERVAL
+    seconds for custom locations. Profiles whose directory disappeared are
+    kept (with their settings) but hidden until it comes back.
+    """
+
+    def __init__(self, path=REGISTRY_DB_FILE):
+        self.db_path = path
+        self._idle = queue.LifoQueue(maxsize=REGISTRY_POOL_SIZE)
+        self._write_lock = threading.Lock()
+        self._dir_mtime = None
+        self._thread = None
+        self._paths = {}  # profile name -> directory, for the frequent path lookups
+        with self._connection() as conn:
+            conn.execute('PRAGMA journal_mode = WAL')
+        migrated = self._migrate()
+        with self._connection() as conn:
+            self._paths.update(conn.execute('SELECT name, path FROM profiles').fetchall())
+        if migrated:
+            try:
+                os.replace(PROFILE_SETTINGS_FILE, f"{PROFILE_SETTINGS_FILE}.migrated")
+            except OSError:
+                pass
+        self.reconcile()
+
+    @contextlib.contextmanager
+    def _connection(self):
+        """A connection from the pool (readers never wait for the writer in WAL mode)
+
+        Connections are reused across threads, one thread at a time, so
+        short-lived request threads do not each open (and set up) their own.
+        """
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None,
+                                   check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA foreign_keys = ON')
+            conn.execute('PRAGMA synchronous = NORMAL')
+        try:
+            yield conn
+        finally:
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    @contextlib.contextmanager
+    def _write(self):
+        """A write transaction; writers are serialised in-process"""
+        with self._connection() as conn, self._write_lock:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+
+    def _migrate(self):
+        """Create the schema; imports the old profile-settings.json once. True if it did"""
+        with self._write() as conn:
+            if conn.execute('PRAGMA user_version').fetchone()[0] >= SCHEMA_VERSION:
+                return False
+            for statement in SCHEMA:
+                conn.execute(statement)
+            conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+            try:
+                with open(PROFILE_SETTINGS_FILE) as f:
+                    legacy = json.load(f)
+            except FileNotFoundError:
+                return False
+            except (OSError, ValueError) as e:
+                print(f"⚠️  Failed to read {PROFILE_SETTINGS_FILE}, not migrating it: {e}")
+                return False
+            if not isinstance(legacy, dict):
+                return False
+            for profile_name, settings in legacy.items():
+                if not is_valid_profile_name(profile_name) or not isinstance(settings, dict):
+                    continue
+                self._ensure(conn, profile_name)
+                self._store(conn, profile_name, settings)
+        print(f"♻️  Migrated settings of {len(legacy)} profile(s) into the profile registry")
+        return True
+
+    def start(self):
+        """Start the periodic reconcile thread (idempotent)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='registry', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(REGISTRY_RECONCILE_INTERVAL)
+            try:
+                self.reconcile()
+            except Exception as e:
+                print(f"⚠️  Profile registry reconcile failed: {e}")
+
+    # --- Profiles ---------------------------------------------------------
+
+    def path(self, profile_name):
+        """Directory of a profile (the default location if it is not registered)"""
+        return self._paths.get(profile_name) or _default_path(profile_name)
+
+    def register(self, profile_name, profile_dir):
+        """Record a new (or re-created) profile and where its data lives"""
+        with self._write() as conn:
+            conn.execute(
+                'INSERT INTO profiles (name, path, present, registered_at) VALUES (?, ?, 1, ?) '
+                'ON CONFLICT (name) DO UPDATE SET path = excluded.path, present = 1',
+                (profile_name, profile_dir, time.time()))
+            self._paths[profile_name] = profile_dir
+
+    def remove(self, profile_name):
+        """Forget a profile, its settings and tags"""
+        with self._write() as conn:
+            conn.execute('DELETE FROM profiles WHERE name = ?', (profile_name,))
+            self._paths.pop(profile_name, None)
+
+    def list(self, tag=None, sort='name', descending=False):
+        """Profiles whose directory exists, with settings (defaults filled in) and tags"""
+        sql = ("SELECT p.*, (SELECT json_group_array(t.tag) FROM profile_tags t "
+               "WHERE t.name = p.name) AS tags FROM profiles p WHERE p.present = 1")
+        params = []
+        if tag is not None:
+            sql += ' AND p.name IN (SELECT name FROM profile_tags WHERE tag = ?)'
+            params.append(tag)
+        sql += f" ORDER BY {SORT_COLUMNS[sort]} {'DESC' if descending else 'ASC'}, p.name"
+
+        with self._connection() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        profiles = []
+        for row in rows:
+            settings = json.loads(row['settings'])
+            profiles.append({
+                'name': row['name'],
+                'path': row['path'],
+                'registered_at': row['registered_at'],
+                'last_started_at': row['last_started_at'],
+                'size_bytes': row['size_bytes'],
+                'size_updated_at': row['size_updated_at'],
+                'fingerprint': row['fingerprint'],
+                'tags': sorted(json.loads(row['tags'])),
+                'settings': settings,
+                'resources': self._resources(settings),
+                'cache_mode': settings.get('cache_mode', CACHE_DEFAULT_MODE),
+            })
+        return profiles
+
+    def record_size(self, profile_dir, size_bytes, updated_at):
+        """Cache a measured profile size (ProfileSizeIndex callback)"""
+        with self._write() as conn:
+            conn.execute('UPDATE profiles SET size_bytes = ?, size_updated_at = ? WHERE path = ?',
+                         (size_bytes, updated_at, profile_dir))
+
+    def cached_sizes(self):
+        """(profile_dir, size_bytes, updated_at) of every measured profile"""
+        with self._connection() as conn:
+            return [tuple(row) for row in conn.execute(
+                'SELECT path, size_bytes, size_updated_at FROM profiles '
+                'WHERE size_updated_at IS NOT NULL')]
+
+    def record_start(self, profile_name, fingerprint):
+        """Remember when a profile was last started and with which launch fingerprint"""
+        with self._write() as conn:
+            self._ensure(conn, profile_name)
+            conn.execute('UPDATE profiles SET last_started_at = ?, fingerprint = ? WHERE name = ?',
+                         (time.time(), fingerprint, profile_name))
+
+    def reconcile_if_changed(self):
+        """Reconcile if a directory was added to or removed from CHROME_PROFILES_DIR"""
+        try:
+            mtime = os.stat(CHROME_PROFILES_DIR).st_mtime_ns
+        except OSError:
+            return None
+        if mtime != self._dir_mtime:
+            return self.reconcile()
+        return None
+
+    def reconcile(self):
+        """Sync the registry with the directories on disk
+
+        Registers profile directories found in CHROME_PROFILES_DIR and flags
+        profiles whose directory vanished (or came back). Returns the names
+        of each.
+        """
+        try:
+            # Taken before listing, so a change during the listing triggers another pass
+            mtime = os.stat(CHROME_PROFILES_DIR).st_mtime_ns
+            on_disk = {name for name in os.listdir(CHROME_PROFILES_DIR)
+                       if not name.startswith('.') and is_valid_profile_name(name)
+                       and os.path.isdir(_default_path(name))}
+        except OSError as e:
+            print(f"⚠️  Failed to list {CHROME_PROFILES_DIR}: {e}")
+            return None
+
+        changes = {'added': [], 'missing': [], 'restored': []}
+        with self._write() as conn:
+            rows = conn.execute('SELECT name, path, present FROM profiles').fetchall()
+            known_paths = {row['path'] for row in rows}
+            known_names = {row['name'] for row in rows}
+            for profile_name in sorted(on_disk - known_names):
+                # A directory registered as another profile's custom location
+                if _default_path(profile_name) in known_paths:
+                    continue
+                self._ensure(conn, profile_name)
+                changes['added'].append(profile_name)
+
+            for row in rows:
+                if row['path'] == _default_path(row['name']):
+                    exists = row['name'] in on_disk
+                else:
+                    exists = os.path.isdir(row['path'])
+                if exists != bool(row['present']):
+                    conn.execute('UPDATE profiles SET present = ? WHERE name = ?',
+                                 (int(exists), row['name']))
+                    changes['restored' if exists else 'missing'].append(row['name'])
+        self._dir_mtime = mtime
+
+        if changes['added']:
+            print(f"ℹ️  Registered {len(changes['added'])} profile director"
+                  f"{'y' if len(changes['added']) == 1 else 'ies'} found on disk")
+        if changes['missing']:
+            print(f"⚠️  Profile directory missing: {', '.join(changes['missing'])}")
+        return changes
+
+    def _ensure(self, conn, profile_name):
+        """Register a profile at its default location unless it is known"""
+        if profile_name in self._paths:
+            return
+        path = _default_path(profile_name)
+        conn.execute('INSERT OR IGNORE INTO profiles (name, path, present, registered_at) '
+                     'VALUES (?, ?, ?, ?)',
+                     (profile_name, path, int(os.path.isdir(path)), time.time()))
+        self._paths[profile_name] = path
+
+    # --- Settings ---------------------------------------------------------
+
+    def _load(self, conn, profile_name):
+        row = conn.execute('SELECT settings FROM profiles WHERE name = ?', (profile_name,)).fetchone()
+        if row is None:
+            return {}
+        settings = json.loads(row['settings'])
+        tags = [tag for (tag,) in conn.execute(
+            'SELECT tag FROM profile_tags WHERE name = ? ORDER BY tag', (profile_name,))]
+        if tags:
+            settings['tags'] = tags
+        return settings
+
+    def _store(self, conn, profile_name, settings):
+        settings = dict(settings)
+        tags = settings.pop('tags', None) or []
+        conn.execute('UPDATE profiles SET settings = ? WHERE name = ?',
+                     (json.dumps(settings, sort_keys=True), profile_name))
+        conn.execute('DELETE FROM profile_tags WHERE name = ?', (profile_name,))
+        conn.executemany('INSERT OR IGNORE INTO profile_tags (name, tag) VALUES (?, ?)',
+                         [(profile_name, tag) for tag in tags])
+
+    def get(self, profile_name):
+        """Settings of a profile (empty dict if none were stored)"""
+        with self._connection() as conn:
+            return self._load(conn, profile_name)
+
+    def update(self, profile_name, **fields):
+        """Set fields of a profile; a value of None removes the field"""
+        with self._write() as conn:
+            self._ensure(conn, profile_name)
+            settings = self._load(conn, profile_name)
+            for key, value in fields.items():
+                if value is None:
+                    settings.pop(key, None)
+                else:
+                    settings[key] = value
+            self._store(conn, profile_name, settings)
+            return settings
+
+    def get_tags(self, profile_name):
+        return list(self.get(profile_name).get('tags', []))
+
+    def names_with_setting(self, key):
+        """Profiles where a setting is set to a true value, sorted by name"""
+        with self._connection() as conn:
+            rows = conn.execute(
+                'SELECT name, json_extract(settings, ?) AS value FROM profiles '
+                'WHERE json_type(settings, ?) IS NOT NULL ORDER BY name',
+                (f'$."{key}"', f'$."{key}"')).fetchall()
+        return [row['name'] for row in rows if row['value']]
+
+    def names_with_tag(self, tag):
+        """Profiles carrying a tag, sorted by name"""
+        with self._connection() as conn:
+            return [name for (name,) in conn.execute(
+                'SELECT name FROM profile_tags WHERE tag = ? ORDER BY name', (tag,))]
+
+    def get_resources(self, profile_name):
+        """Resource limits of a profile, defaults filled in"""
+        return self._resources(self.get(profile_name))
+
+    def _resources(self, settings):
+        return {**DEFAULT_PROFILE_RESOURCES, **settings.get('resources', {})}
+
+    def get_cache_mode(self, profile_name):
+        """Where the profile's caches live: 'disk', 'tmpfs' or 'scratch'"""
+        return self.get(profile_name).get('cache_mode', CACHE_DEFAULT_MODE)
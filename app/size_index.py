@@ -0,0 +1,275 @@
+"""
+Size Index - Incremental, cached profile directory sizes
+"""
+import ctypes
+import ctypes.util
+import os
+import queue
+import struct
+import threading
+import time
+from metrics import SIZE_SCAN_SECONDS
+from config import SIZE_REFRESH_INTERVAL, SIZE_FULL_RESCAN_INTERVAL, SIZE_INDEX_INOTIFY
+
+# inotify constants (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct('iIII')
+_WATCH_MASK = IN_MODIFY | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ONLYDIR
+
+
+class _DirEntry:
+    """Cached listing of one directory: its own file bytes and subdirectories"""
+    __slots__ = ('mtime_ns', 'file_bytes', 'subdirs', 'listed_at')
+
+    def __init__(self, mtime_ns, file_bytes, subdirs, listed_at):
+        self.mtime_ns = mtime_ns
+        self.file_bytes = file_bytes
+        self.subdirs = subdirs
+        self.listed_at = listed_at
+
+
+class ProfileSizeIndex:
+    """Per-profile size cache kept up to date by a background scanner
+
+    Each directory is listed with os.scandir() once and remembered together
+    with its mtime. Later scans only stat directories and re-list the ones
+    whose mtime changed, that inotify reported as modified, or that have not
+    been re-listed for SIZE_FULL_RESCAN_INTERVAL seconds (file growth does not
+    touch the directory mtime). Readers never walk the tree themselves.
+    Finished scans are reported to on_scanned(profile_dir, bytes, updated_at).
+    """
+
+    def __init__(self, on_scanned=None):
+        self._on_scanned = on_scanned
+        self._profiles = {}  # profile_dir -> {'dirs', 'bytes', 'updated_at', 'dirty'}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._watcher = None
+        if SIZE_INDEX_INOTIFY:
+            try:
+                self._watcher = _InotifyWatcher(self._on_dir_changed)
+            except OSError as e:
+                print(f"⚠️  inotify unavailable, size index will rely on rescans: {e}")
+        threading.Thread(target=self._worker, name='size-index', daemon=True).start()
+
+    def get(self, profile_dir, watch=False):
+        """Get (size_bytes, updated_at) for a profile without blocking
+
+        Stale or unknown entries are queued for a background rescan; until the
+        first scan finishes the size is reported as 0 with updated_at None.
+        With watch=True the profile's directories are also tracked via inotify
+        (used while the profile's container is running).
+        """
+        with self._lock:
+            entry = self._profiles.get(profile_dir)
+            if entry is None:
+                stale = True
+            else:
+                age = time.time() - entry['updated_at']
+                stale = age > SIZE_REFRESH_INTERVAL or (entry['dirty'] and age > 1)
+            result = (entry['bytes'], entry['updated_at']) if entry else (0, None)
+
+        if stale:
+            self.request_refresh(profile_dir)
+        if self._watcher:
+            if watch:
+                self._watcher.watch_profile(profile_dir, self._known_dirs(profile_dir))
+            else:
+                self._watcher.unwatch_profile(profile_dir)
+        return result
+
+    def request_refresh(self, profile_dir):
+        """Queue a background rescan of a profile (deduplicated)"""
+        with self._lock:
+            if profile_dir in self._pending:
+                return
+            self._pending.add(profile_dir)
+        self._queue.put(profile_dir)
+
+    def seed(self, profile_dir, size_bytes, updated_at):
+        """Start from a size measured earlier (e.g. before a restart) until rescanned"""
+        with self._lock:
+            if profile_dir not in self._profiles:
+                self._profiles[profile_dir] = {'dirs': {}, 'bytes': size_bytes,
+                                               'updated_at': updated_at, 'dirty': False}
+
+    def forget(self, profile_dir):
+        """Drop everything known about a profile (e.g. after deletion)"""
+        if self._watcher:
+            self._watcher.unwatch_profile(profile_dir)
+        with self._lock:
+            self._profiles.pop(profile_dir, None)
+
+    def scan(self, profile_dir):
+        """Incrementally rescan a profile and return its size in bytes"""
+        with self._lock:
+            entry = self._profiles.get(profile_dir)
+            old_dirs = entry['dirs'] if entry else {}
+            if entry:
+                entry['dirty'] = False
+
+        new_dirs = {}
+        with SIZE_SCAN_SECONDS.time():
+            total = self._scan_dir(profile_dir, old_dirs, new_dirs, time.time())
+
+        updated_at = time.time()
+        with self._lock:
+            exists = os.path.isdir(profile_dir)
+            if exists:
+                self._profiles[profile_dir] = {
+                    'dirs': new_dirs,
+                    'bytes': total,
+                    'updated_at': updated_at,
+                    'dirty': self._profiles.get(profile_dir, {}).get('dirty', False),
+                }
+            else:
+                self._profiles.pop(profile_dir, None)
+
+        if exists and self._on_scanned:
+            self._on_scanned(profile_dir, total, updated_at)
+        if self._watcher:
+            self._watcher.refresh_profile(profile_dir, new_dirs.keys())
+        return total
+
+    def _scan_dir(self, path, old_dirs, new_dirs, now):
+        """Size of one directory tree, reusing cached listings where valid"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return 0
+
+        cached = old_dirs.get(path)
+        if (cached is not None and cached.mtime_ns == st.st_mtime_ns and
+                now - cached.listed_at < SIZE_FULL_RESCAN_INTERVAL):
+            entry = cached
+        else:
+            file_bytes = 0
+            subdirs = []
+            try:
+                with os.scandir(path) as it:
+                    for item in it:
+                        try:
+                            if item.is_dir(follow_symlinks=False):
+                                subdirs.append(item.path)
+                            elif item.is_file():
+                                file_bytes += item.stat().st_size
+                        except OSError:
+                            # Vanished or unreadable while scanning
+                            continue
+            except OSError:
+                return 0
+            entry = _DirEntry(st.st_mtime_ns, file_bytes, subdirs, now)
+
+        new_dirs[path] = entry
+        total = entry.file_bytes
+        for subdir in entry.subdirs:
+            total += self._scan_dir(subdir, old_dirs, new_dirs, now)
+        return total
+
+    def _known_dirs(self, profile_dir):
+        with self._lock:
+            entry = self._profiles.get(profile_dir)
+            return list(entry['dirs']) if entry else []
+
+    def _on_dir_changed(self, profile_dir, dir_path):
+        """inotify callback: force a re-list of the directory on the next scan"""
+        with self._lock:
+            entry = self._profiles.get(profile_dir)
+            if entry is None:
+                return
+            entry['dirty'] = True
+            cached = entry['dirs'].get(dir_path)
+            if cached is not None:
+                cached.listed_at = 0
+
+    def _worker(self):
+        while True:
+            profile_dir = self._queue.get()
+            with self._lock:
+                self._pending.discard(profile_dir)
+            try:
+                self.scan(profile_dir)
+            except Exception as e:
+                print(f"⚠️  Failed to scan profile size for {profile_dir}: {e}")
+
+
+class _InotifyWatcher:
+    """Minimal inotify binding that maps directory changes back to profiles"""
+
+    def __init__(self, callback):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm_watch = libc.inotify_rm_watch
+        self._rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        self._fd = libc.inotify_init1(IN_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self._callback = callback
+        self._lock = threading.Lock()
+        self._watches = {}  # wd -> (profile_dir, dir_path)
+        self._profiles = {}  # profile_dir -> {dir_path: wd}
+        threading.Thread(target=self._reader, name='size-inotify', daemon=True).start()
+
+    def watch_profile(self, profile_dir, dir_paths):
+        """Start watching a profile (no-op if it is already watched)"""
+        with self._lock:
+            if profile_dir in self._profiles:
+                return
+            self._profiles[profile_dir] = {}
+        self.refresh_profile(profile_dir, dir_paths)
+
+    def refresh_profile(self, profile_dir, dir_paths):
+        """Sync the watch set of a watched profile with its current directories"""
+        with self._lock:
+            current = self._profiles.get(profile_dir)
+            if current is None:
+                return
+            wanted = set(dir_paths)
+            for dir_path in list(current):
+                if dir_path not in wanted:
+                    self._remove(current.pop(dir_path))
+            for dir_path in wanted - current.keys():
+                wd = self._add_watch(self._fd, os.fsencode(dir_path), _WATCH_MASK)
+                if wd < 0:
+                    # Usually fs.inotify.max_user_watches; rescans still cover it
+                    continue
+                current[dir_path] = wd
+                self._watches[wd] = (profile_dir, dir_path)
+
+    def unwatch_profile(self, profile_dir):
+        with self._lock:
+            for wd in self._profiles.pop(profile_dir, {}).values():
+                self._remove(wd)
+
+    def _remove(self, wd):
+        self._watches.pop(wd, None)
+        self._rm_watch(self._fd, wd)
+
+    def _reader(self):
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except OSError:
+                time.sleep(1)
+                continue
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(data):
+                wd, mask, _cookie, name_len = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size + name_len
+                with self._lock:
+                    target = self._watches.get(wd)
+                    if mask & IN_IGNORED and target:
+                        self._watches.pop(wd, None)
+                        self._profiles.get(target[0], {}).pop(target[1], None)
+                if target:
+                    self._callback(*target)
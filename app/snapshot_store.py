@@ -0,0 +1,272 @@
+"""
+Snapshot Store - Deduplicated, incremental profile snapshots
+"""
+import hashlib
+import json
+import os
+import re
+import secrets
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from config import SNAPSHOTS_DIR, SNAPSHOT_CHUNK_SIZE, SNAPSHOT_WORKERS
+from profile_archive import iter_profile_files
+
+SNAPSHOT_ID_RE = re.compile(r'^\d{8}T\d{6}Z-[0-9a-f]{6}$')
+
+# Chunk file prefix byte: zlib-compressed or raw payload
+_CHUNK_ZLIB = b'Z'
+_CHUNK_RAW = b'R'
+
+
+class SnapshotNotFound(Exception):
+    pass
+
+
+class SnapshotStore:
+    """Content-addressed chunk store shared by all profiles
+
+    Files are split into fixed-size chunks named by their SHA-256 and stored
+    once under chunks/, no matter how many profiles or snapshots contain them.
+    Each snapshot is a JSON manifest listing files and their chunk hashes.
+    Files whose size, mtime and inode match the previous snapshot of the same
+    profile reuse its chunk list without being read again.
+    """
+
+    def __init__(self, root=SNAPSHOTS_DIR):
+        self.chunks_dir = os.path.join(root, 'chunks')
+        self.manifests_dir = os.path.join(root, 'manifests')
+        os.makedirs(self.chunks_dir, exist_ok=True)
+        os.makedirs(self.manifests_dir, exist_ok=True)
+        # Snapshots and restores run concurrently; garbage collection needs
+        # them all finished
+        self._gc_cond = threading.Condition()
+        self._active = 0
+        self._collecting = False
+
+    def create(self, profile_name, profile_dir):
+        """Snapshot a profile directory and return the manifest summary"""
+        self._begin()
+        try:
+            previous = self._latest_manifest(profile_name)
+            previous_files = {f['path']: f for f in previous['files']} if previous else {}
+            stats = {'files': 0, 'bytes': 0, 'reused_files': 0, 'new_chunks': 0, 'new_bytes': 0}
+            stats_lock = threading.Lock()
+
+            def process(item):
+                file_path, _arcname, st = item
+                rel_path = os.path.relpath(file_path, profile_dir)
+                entry = {
+                    'path': rel_path,
+                    'mode': st.st_mode & 0o7777,
+                    'mtime_ns': st.st_mtime_ns,
+                    'size': st.st_size,
+                    'ino': st.st_ino,
+                }
+                old = previous_files.get(rel_path)
+                if old and all(old.get(k) == entry[k] for k in ('size', 'mtime_ns', 'ino')):
+                    entry['chunks'] = old['chunks']
+                    new_chunks = new_bytes = 0
+                    reused = 1
+                else:
+                    try:
+                        entry['chunks'], new_chunks, new_bytes = self._store_file(file_path)
+                    except OSError:
+                        return None  # Unreadable or vanished while snapshotting
+                    reused = 0
+                with stats_lock:
+                    stats['files'] += 1
+                    stats['bytes'] += st.st_size
+                    stats['reused_files'] += reused
+                    stats['new_chunks'] += new_chunks
+                    stats['new_bytes'] += new_bytes
+                return entry
+
+            with ThreadPoolExecutor(max_workers=SNAPSHOT_WORKERS) as pool:
+                files = [e for e in pool.map(process, iter_profile_files(profile_dir)) if e]
+
+            snapshot_id = time.strftime('%Y%m%dT%H%M%SZ', time.gmtime()) + '-' + secrets.token_hex(3)
+            manifest = {
+                'id': snapshot_id,
+                'profile': profile_name,
+                'created_at': time.time(),
+                'stats': stats,
+                'files': files,
+            }
+            manifest_dir = os.path.join(self.manifests_dir, profile_name)
+            os.makedirs(manifest_dir, exist_ok=True)
+            self._write_atomic(os.path.join(manifest_dir, f'{snapshot_id}.json'),
+                               json.dumps(manifest, separators=(',', ':')).encode())
+            return self._summary(manifest)
+        finally:
+            self._end()
+
+    def list(self, profile_name):
+        """List snapshot summaries of a profile, newest first"""
+        return [self._summary(self._load(profile_name, snapshot_id))
+                for snapshot_id in self._snapshot_ids(profile_name)]
+
+    def exists(self, profile_name, snapshot_id):
+        try:
+            return os.path.exists(self._manifest_path(profile_name, snapshot_id))
+        except SnapshotNotFound:
+            return False
+
+    def restore(self, profile_name, snapshot_id, target_dir):
+        """Recreate a snapshot in target_dir, which must not exist yet"""
+        # Garbage collection waits, so the chunks cannot vanish mid-restore
+        # even if the snapshot is deleted meanwhile
+        self._begin()
+        try:
+            return self._restore(profile_name, snapshot_id, target_dir)
+        finally:
+            self._end()
+
+    def _restore(self, profile_name, snapshot_id, target_dir):
+        manifest = self._load(profile_name, snapshot_id)
+        os.makedirs(target_dir)
+
+        def write(entry):
+            path = os.path.join(target_dir, entry['path'])
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                for digest in entry['chunks']:
+                    f.write(self._read_chunk(digest))
+            os.chmod(path, entry['mode'])
+            os.utime(path, ns=(entry['mtime_ns'], entry['mtime_ns']))
+
+        with ThreadPoolExecutor(max_workers=SNAPSHOT_WORKERS) as pool:
+            # list() re-raises the first failure
+            list(pool.map(write, manifest['files']))
+        return self._summary(manifest)
+
+    def delete(self, profile_name, snapshot_id):
+        """Delete one snapshot and the chunks nothing else references"""
+        path = self._manifest_path(profile_name, snapshot_id)
+        if not os.path.exists(path):
+            raise SnapshotNotFound(snapshot_id)
+        os.remove(path)
+        return self.collect_garbage()
+
+    def prune(self, keep_last, profile_name=None):
+        """Keep only the newest keep_last snapshots per profile, then collect garbage"""
+        profiles = [profile_name] if profile_name else sorted(os.listdir(self.manifests_dir))
+        removed = []
+        for name in profiles:
+            for snapshot_id in self._snapshot_ids(name)[keep_last:]:
+                os.remove(self._manifest_path(name, snapshot_id))
+                removed.append({'profile': name, 'id': snapshot_id})
+        result = self.collect_garbage()
+        result['removed_snapshots'] = removed
+        return result
+
+    def collect_garbage(self):
+        """Remove chunks no manifest references (mark and sweep)"""
+        with self._gc_cond:
+            self._collecting = True
+            self._gc_cond.wait_for(lambda: self._active == 0)
+        try:
+            referenced = set()
+            for name in os.listdir(self.manifests_dir):
+                for snapshot_id in self._snapshot_ids(name):
+                    for entry in self._load(name, snapshot_id)['files']:
+                        referenced.update(entry['chunks'])
+
+            removed_chunks = freed_bytes = 0
+            for prefix in os.listdir(self.chunks_dir):
+                prefix_dir = os.path.join(self.chunks_dir, prefix)
+                for digest in os.listdir(prefix_dir):
+                    if digest not in referenced:
+                        path = os.path.join(prefix_dir, digest)
+                        freed_bytes += os.path.getsize(path)
+                        os.remove(path)
+                        removed_chunks += 1
+            return {'removed_chunks': removed_chunks, 'freed_bytes': freed_bytes}
+        finally:
+            with self._gc_cond:
+                self._collecting = False
+                self._gc_cond.notify_all()
+
+    def _begin(self):
+        with self._gc_cond:
+            self._gc_cond.wait_for(lambda: not self._collecting)
+            self._active += 1
+
+    def _end(self):
+        with self._gc_cond:
+            self._active -= 1
+            self._gc_cond.notify_all()
+
+    def _store_file(self, file_path):
+        """Chunk a file into the store; return (chunk hashes, new chunks, new bytes)"""
+        digests = []
+        new_chunks = new_bytes = 0
+        with open(file_path, 'rb') as f:
+            while True:
+                data = f.read(SNAPSHOT_CHUNK_SIZE)
+                if not data:
+                    break
+                digest = hashlib.sha256(data).hexdigest()
+                digests.append(digest)
+                path = self._chunk_path(digest)
+                if os.path.exists(path):
+                    continue
+                compressed = zlib.compress(data, 1)
+                if len(compressed) < len(data):
+                    payload = _CHUNK_ZLIB + compressed
+                else:
+                    payload = _CHUNK_RAW + data
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                self._write_atomic(path, payload)
+                new_chunks += 1
+                new_bytes += len(payload)
+        return digests, new_chunks, new_bytes
+
+    def _read_chunk(self, digest):
+        with open(self._chunk_path(digest), 'rb') as f:
+            payload = f.read()
+        if payload[:1] == _CHUNK_ZLIB:
+            return zlib.decompress(payload[1:])
+        return payload[1:]
+
+    def _chunk_path(self, digest):
+        return os.path.join(self.chunks_dir, digest[:2], digest)
+
+    def _manifest_path(self, profile_name, snapshot_id):
+        if not SNAPSHOT_ID_RE.match(snapshot_id):
+            raise SnapshotNotFound(snapshot_id)
+        return os.path.join(self.manifests_dir, profile_name, f'{snapshot_id}.json')
+
+    def _snapshot_ids(self, profile_name):
+        manifest_dir = os.path.join(self.manifests_dir, profile_name)
+        if not os.path.isdir(manifest_dir):
+            return []
+        ids = [f[:-len('.json')] for f in os.listdir(manifest_dir) if f.endswith('.json')]
+        return sorted((i for i in ids if SNAPSHOT_ID_RE.match(i)), reverse=True)
+
+    def _load(self, profile_name, snapshot_id):
+        try:
+            with open(self._manifest_path(profile_name, snapshot_id)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise SnapshotNotFound(snapshot_id)
+
+    def _latest_manifest(self, profile_name):
+        ids = self._snapshot_ids(profile_name)
+        return self._load(profile_name, ids[0]) if ids else None
+
+    def _summary(self, manifest):
+        return {
+            'id': manifest['id'],
+            'profile': manifest['profile'],
+            'created_at': manifest['created_at'],
+            'stats': manifest['stats'],
+        }
+
+    @staticmethod
+    def _write_atomic(path, data):
+        tmp_path = f'{path}.tmp-{secrets.token_hex(4)}'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
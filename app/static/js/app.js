@@ -1,15 +1,114 @@
+// Profiles per /api/profiles page on a full load
+const PAGE_SIZE = 500;
+// Rows rendered above and below the viewport
+const OVERSCAN_ROWS = 3;
+// Rows rendered before the card height is known
+const INITIAL_ROWS = 12;
+// ?sort= value -> profile field, as sorted by the server
+const SORT_FIELDS = { name: 'name', status: 'status', size: 'size_mb', last_started: 'last_started_at' };
+
 // Minimalist React-like App
 class App {
     constructor() {
+        // Sorted as requested from the server; version is the list's ETag
         this.profiles = [];
+        this.version = null;
+        this.query = { q: '', sort: 'name:asc' };
+        // Rendered cards by profile name; only the rows near the viewport exist
+        this.cards = new Map();
+        this.layout = { columns: 1, rowHeight: 0 };
+        this.renderQueued = false;
+        this.syncQueue = Promise.resolve();
         this.state = { loading: false };
+        this.liveUpdates = false;
         this.init();
     }
 
     init() {
         this.setupEventListeners();
         this.loadProfiles();
-        setInterval(() => this.loadProfiles(), 5000);
+        this.connectEvents();
+        this.schedulePoll();
+        this.checkHealth();
+    }
+
+    async checkHealth(toast = null) {
+        // Show what the server is waiting for (Docker, image build) until it is ready
+        let health = null;
+        try {
+            health = await (await fetch('/api/health')).json();
+        } catch (error) {
+            // Server restarting; keep checking
+        }
+        if (health && health.ready) {
+            if (toast) toast.remove();
+            return;
+        }
+        const messages = {
+            connecting: 'Connecting to Docker...',
+            docker_unavailable: 'Docker is not available. Is the Docker service running?',
+            building: 'Building the browser image. This can take a few minutes...',
+            build_failed: 'Building the browser image failed'
+        };
+        const message = (health && messages[health.docker.state]) || 'Waiting for the server...';
+        if (toast) {
+            this.updateToast(toast, message);
+        } else {
+            toast = this.showToast(message, 'error', 0);
+        }
+        setTimeout(() => this.checkHealth(toast), 3000);
+    }
+
+    schedulePoll() {
+        // Polling is the fallback; with a live event stream it only refreshes sizes
+        const interval = this.liveUpdates ? 30000 : 5000;
+        setTimeout(async () => {
+            await this.refreshProfiles();
+            this.schedulePoll();
+        }, interval);
+    }
+
+    connectEvents() {
+        if (!window.EventSource) return;
+
+        // EventSource reconnects on its own after errors
+        const source = new EventSource('/api/events');
+        source.addEventListener('snapshot', (e) => {
+            this.liveUpdates = JSON.parse(e.data).connected;
+        });
+        source.onmessage = (e) => this.applyDelta(JSON.parse(e.data));
+        source.onerror = () => {
+            this.liveUpdates = false;
+        };
+    }
+
+    applyDelta(delta) {
+        switch (delta.event) {
+            case 'resync':
+                this.liveUpdates = true;
+                this.refreshProfiles();
+                return;
+            case 'disconnected':
+                this.liveUpdates = false;
+                return;
+            case 'oom_killed':
+                this.showToast(`Profile "${delta.name}" ran out of memory`, 'error');
+                break;
+            case 'idle': {
+                const verb = { hibernate: 'hibernated', stop: 'stopped' }[delta.action];
+                const message = verb && !delta.dry_run
+                    ? `Profile "${delta.name}" was ${verb} after ${Math.round(delta.idle_minutes)} idle minutes`
+                    : `Profile "${delta.name}" has been idle for ${Math.round(delta.idle_minutes)} minutes`;
+                this.showToast(message, 'success', 8000);
+                return;
+            }
+        }
+
+        const profile = this.profiles.find(p => p.name === delta.name);
+        if (profile) {
+            profile.status = delta.status;
+            this.scheduleRender();
+        }
     }
 
     setupEventListeners() {
@@ -21,20 +120,124 @@ class App {
         document.getElementById('cancelBtn').addEventListener('click', () => this.hideModal());
         document.getElementById('modalBackdrop').addEventListener('click', () => this.hideModal());
         document.getElementById('createForm').addEventListener('submit', (e) => this.handleCreate(e));
+        document.getElementById('filterInput').addEventListener('input', (e) => {
+            clearTimeout(this.filterTimer);
+            this.filterTimer = setTimeout(() => {
+                this.query.q = e.target.value.trim();
+                this.loadProfiles();
+            }, 250);
+        });
+        document.getElementById('sortSelect').addEventListener('change', (e) => {
+            this.query.sort = e.target.value;
+            this.loadProfiles();
+        });
+
+        // One listener for the buttons of every card, however often cards change
+        document.getElementById('profiles-container').addEventListener('click', (e) => {
+            const button = e.target.closest('[data-action]');
+            const card = button && button.closest('.profile-card');
+            if (card) this.handleAction(button.dataset.action, card.dataset.name);
+        });
+        window.addEventListener('scroll', () => this.scheduleRender(), { passive: true });
+        window.addEventListener('resize', () => {
+            this.layout.rowHeight = 0;
+            this.scheduleRender();
+        });
     }
 
-    async loadProfiles() {
-        try {
-            this.setState({ loading: true });
-            const res = await fetch('/api/profiles');
-            const data = await res.json();
-            this.profiles = data.profiles || [];
-            this.render();
-        } catch (error) {
-            this.showToast('Failed to load profiles', 'error');
-        } finally {
-            this.setState({ loading: false });
+    profilesUrl(params = {}) {
+        const [sort, order] = this.query.sort.split(':');
+        const query = new URLSearchParams({ ...params, sort, order });
+        if (this.query.q) query.set('q', this.query.q);
+        return `/api/profiles?${query}`;
+    }
+
+    enqueueSync(task) {
+        // Loads and refreshes run one at a time, so responses apply in order
+        this.syncQueue = this.syncQueue.then(task);
+        return this.syncQueue;
+    }
+
+    loadProfiles() {
+        // Full load, page by page (e.g. after the filter or sort changed)
+        return this.enqueueSync(async () => {
+            try {
+                this.setState({ loading: true });
+                const profiles = new Map();
+                let version = null;
+                let cursor = null;
+                let pages = 0;
+                do {
+                    const params = cursor ? { limit: PAGE_SIZE, cursor } : { limit: PAGE_SIZE };
+                    const res = await fetch(this.profilesUrl(params), { cache: 'no-store' });
+                    const data = await res.json();
+                    if (!res.ok) throw new Error(data.error);
+                    // Changes made while later pages load come with the next refresh
+                    version = version || data.version;
+                    data.profiles.forEach(p => profiles.set(p.name, p));
+                    cursor = data.next_cursor;
+                    pages++;
+                } while (cursor);
+                this.profiles = [...profiles.values()].sort((a, b) => this.compareProfiles(a, b));
+                this.version = version;
+                this.cards.forEach(card => card.remove());
+                this.cards.clear();
+                window.scrollTo({ top: 0 });
+                if (pages > 1) await this.fetchChanges();
+            } catch (error) {
+                this.showToast('Failed to load profiles', 'error');
+            } finally {
+                this.setState({ loading: false });
+            }
+        });
+    }
+
+    refreshProfiles() {
+        // Only what changed since the last load; 304 if nothing did
+        return this.enqueueSync(async () => {
+            try {
+                await this.fetchChanges();
+                this.scheduleRender();
+            } catch (error) {
+                this.showToast('Failed to load profiles', 'error');
+            }
+        });
+    }
+
+    async fetchChanges() {
+        if (!this.version) return;
+        const res = await fetch(this.profilesUrl({ since: this.version }), {
+            cache: 'no-store',
+            headers: { 'If-None-Match': `"${this.version}"` }
+        });
+        if (res.status === 304) return;
+        const data = await res.json();
+        if (!res.ok) throw new Error(data.error);
+
+        if (data.full) {
+            // Version too old or from before a server restart
+            this.profiles = data.profiles;
+        } else if (data.changed.length || data.removed.length) {
+            const profiles = new Map(this.profiles.map(p => [p.name, p]));
+            data.removed.forEach(name => profiles.delete(name));
+            data.changed.forEach(p => profiles.set(p.name, p));
+            this.profiles = [...profiles.values()].sort((a, b) => this.compareProfiles(a, b));
         }
+        this.version = data.version;
+    }
+
+    compareProfiles(a, b) {
+        // Same order as the server: unset values first, ties by name
+        const [sort, order] = this.query.sort.split(':');
+        const field = SORT_FIELDS[sort];
+        const key = (p) => [p[field] !== null && p[field] !== undefined, p[field] ?? 0, p.name];
+        const keyA = key(a);
+        const keyB = key(b);
+        let result = 0;
+        for (let i = 0; i < keyA.length && !result; i++) {
+            result = keyA[i] < keyB[i] ? -1 : keyA[i] > keyB[i] ? 1 : 0;
+        }
+        return order === 'desc' ? -result : result;
     }
 
     setState(newState) {
@@ -42,21 +245,92 @@ class App {
         this.render();
     }
 
+    scheduleRender() {
+        if (this.renderQueued) return;
+        this.renderQueued = true;
+        requestAnimationFrame(() => {
+            this.renderQueued = false;
+            this.render();
+        });
+    }
+
     render() {
         const container = document.getElementById('profiles-container');
         
-        if (this.state.loading && this.profiles.length === 0) {
-            container.innerHTML = this.renderLoading();
+        if (this.profiles.length === 0) {
+            this.cards.clear();
+            container.style.paddingTop = container.style.paddingBottom = '';
+            container.innerHTML = this.state.loading ? this.renderLoading() : this.renderEmpty();
             return;
         }
 
-        if (this.profiles.length === 0) {
-            container.innerHTML = this.renderEmpty();
-            return;
+        // Drop the loading or empty state
+        container.querySelectorAll(':scope > :not(.profile-card)').forEach(el => el.remove());
+        this.renderWindow(container);
+    }
+
+    renderWindow(container) {
+        // Cards of the rows around the viewport; padding stands in for the rest
+        const { columns, rowHeight } = this.measureLayout(container);
+        const rows = Math.ceil(this.profiles.length / columns);
+        let first = 0;
+        let last = Math.min(rows, INITIAL_ROWS);
+        if (rowHeight) {
+            const offset = window.scrollY - (container.getBoundingClientRect().top + window.scrollY);
+            first = Math.max(0, Math.floor(offset / rowHeight) - OVERSCAN_ROWS);
+            last = Math.min(rows, Math.ceil((offset + window.innerHeight) / rowHeight) + OVERSCAN_ROWS);
+            first = Math.min(first, last);
+        }
+        container.style.paddingTop = `${first * rowHeight}px`;
+        container.style.paddingBottom = `${(rows - last) * rowHeight}px`;
+        this.patchCards(container, this.profiles.slice(first * columns, last * columns));
+
+        if (!rowHeight && this.measureLayout(container).rowHeight) {
+            // First cards are in place and measured: render the real window
+            this.scheduleRender();
+        }
+    }
+
+    measureLayout(container) {
+        if (!this.layout.rowHeight) {
+            const card = container.querySelector('.profile-card');
+            if (card) {
+                const style = getComputedStyle(container);
+                this.layout.columns = Math.max(1, style.gridTemplateColumns.split(' ').length);
+                this.layout.rowHeight = card.offsetHeight + (parseFloat(style.rowGap) || 0);
+            }
+        }
+        return this.layout;
+    }
+
+    patchCards(container, visible) {
+        // Keyed by profile name: cards are only created, rewritten or moved when needed
+        const wanted = new Set(visible.map(p => p.name));
+        for (const [name, card] of this.cards) {
+            if (!wanted.has(name)) {
+                card.remove();
+                this.cards.delete(name);
+            }
         }
 
-        container.innerHTML = this.profiles.map(p => this.renderProfileCard(p)).join('');
-        this.attachCardListeners();
+        let previous = null;
+        for (const profile of visible) {
+            let card = this.cards.get(profile.name);
+            if (!card) {
+                card = document.createElement('div');
+                card.className = 'profile-card';
+                card.dataset.name = profile.name;
+                this.cards.set(profile.name, card);
+            }
+            const html = this.renderProfileCard(profile);
+            if (card.renderedHtml !== html) {
+                card.innerHTML = html;
+                card.renderedHtml = html;
+            }
+            const expected = previous ? previous.nextSibling : container.firstChild;
+            if (card !== expected) container.insertBefore(card, expected);
+            previous = card;
+        }
     }
 
     renderLoading() {
@@ -83,42 +357,48 @@ class App {
     renderProfileCard(profile) {
         const statusText = {
             'running': 'Running',
+            'paused': 'Hibernated',
             'exited': 'Stopped',
             'not_found': 'Not Started'
         }[profile.status] || profile.status;
 
+        // Contents of the card element (see patchCards)
         return `
-            <div class="profile-card" data-name="${this.escape(profile.name)}">
-                <div class="profile-header">
-                    <div class="profile-name">${this.escape(profile.name)}</div>
-                    <span class="status-badge status-${profile.status}">${statusText}</span>
-                </div>
-                <div class="profile-info">
-                    <div>Storage: ${profile.size_mb} MB</div>
-                    <div>Desktop: ${profile.has_desktop_entry ? 'Yes' : 'No'}</div>
-                </div>
-                <div class="profile-actions">
-                    ${profile.status === 'running'
-                        ? `<button class="btn btn-danger btn-sm" data-action="stop">Stop</button>`
-                        : `<button class="btn btn-success btn-sm" data-action="start">Start</button>`
-                    }
-                    <button class="btn btn-secondary btn-sm" data-action="export">Export</button>
-                    <button class="btn btn-danger btn-sm" data-action="delete">Delete</button>
-                </div>
+            <div class="profile-header">
+                <div class="profile-name" title="${this.escape(profile.name)}">${this.escape(profile.name)}</div>
+                <span class="status-badge status-${profile.status}">${statusText}</span>
+            </div>
+            <div class="profile-info">
+                <div>Storage: ${profile.size_updated_at ? `${profile.size_mb} MB` : 'calculating…'}</div>
+                ${this.renderStats(profile.stats)}
+                <div>Desktop: ${profile.has_desktop_entry ? 'Yes' : 'No'}</div>
+            </div>
+            <div class="profile-actions">
+                ${this.renderStateActions(profile.status)}
+                <button class="btn btn-secondary btn-sm" data-action="export">Export</button>
+                <button class="btn btn-danger btn-sm" data-action="delete">Delete</button>
             </div>
         `;
     }
 
-    attachCardListeners() {
-        document.querySelectorAll('.profile-card').forEach(card => {
-            const name = card.dataset.name;
-            card.querySelectorAll('[data-action]').forEach(btn => {
-                btn.addEventListener('click', (e) => {
-                    const action = e.target.dataset.action;
-                    this.handleAction(action, name);
-                });
-            });
-        });
+    renderStats(stats) {
+        // Always a line, so all cards have the same height
+        if (!stats) return '<div>CPU: – · Memory: –</div>';
+        const cpu = stats.cpu_percent === null ? '…' : `${stats.cpu_percent}%`;
+        const memoryMb = Math.round(stats.memory_bytes / (1024 * 1024));
+        return `<div>CPU: ${cpu} · Memory: ${memoryMb} MB</div>`;
+    }
+
+    renderStateActions(status) {
+        if (status === 'running') {
+            return `<button class="btn btn-secondary btn-sm" data-action="hibernate">Hibernate</button>
+                    <button class="btn btn-danger btn-sm" data-action="stop">Stop</button>`;
+        }
+        if (status === 'paused') {
+            return `<button class="btn btn-success btn-sm" data-action="resume">Resume</button>
+                    <button class="btn btn-danger btn-sm" data-action="stop">Stop</button>`;
+        }
+        return `<button class="btn btn-success btn-sm" data-action="start">Start</button>`;
     }
 
     async handleAction(action, name) {
@@ -129,6 +409,12 @@ class App {
             case 'stop':
                 await this.stopProfile(name);
                 break;
+            case 'hibernate':
+                await this.profileAction(name, 'hibernate', 'hibernated');
+                break;
+            case 'resume':
+                await this.profileAction(name, 'resume', 'resumed');
+                break;
             case 'delete':
                 await this.deleteProfile(name);
                 break;
@@ -146,7 +432,7 @@ class App {
             const data = await res.json();
             if (res.ok) {
                 this.showToast(`Profile "${name}" started`, 'success');
-                await this.loadProfiles();
+                await this.refreshProfiles();
             } else {
                 this.showToast(data.error || 'Failed to start', 'error');
             }
@@ -163,7 +449,7 @@ class App {
             const data = await res.json();
             if (res.ok) {
                 this.showToast(`Profile "${name}" stopped`, 'success');
-                await this.loadProfiles();
+                await this.refreshProfiles();
             } else {
                 this.showToast(data.error || 'Failed to stop', 'error');
             }
@@ -172,6 +458,26 @@ class App {
         }
     }
 
+    async profileAction(name, action, pastTense) {
+        try {
+            const res = await fetch(`/api/profiles/${encodeURIComponent(name)}/${action}`, {
+                method: 'POST'
+            });
+            const data = await res.json();
+            if (res.status === 202) {
+                // The browser image is still being prepared; the start runs once it is ready
+                this.showToast(`Profile "${name}" will start once the browser image is ready`, 'success');
+            } else if (res.ok) {
+                this.showToast(`Profile "${name}" ${pastTense}`, 'success');
+                await this.refreshProfiles();
+            } else {
+                this.showToast(data.error || `Failed to ${action}`, 'error');
+            }
+        } catch (error) {
+            this.showToast(`Failed to ${action} profile`, 'error');
+        }
+    }
+
     async deleteProfile(name) {
         const confirmed = await this.showConfirm(
             'Delete Profile',
@@ -186,7 +492,7 @@ class App {
             const data = await res.json();
             if (res.ok) {
                 this.showToast(`Profile "${name}" deleted`, 'success');
-                await this.loadProfiles();
+                await this.refreshProfiles();
             } else {
                 this.showToast(data.error || 'Failed to delete', 'error');
             }
@@ -236,26 +542,53 @@ class App {
         const file = e.target.files[0];
         if (!file) return;
 
-        const formData = new FormData();
-        formData.append('file', file);
+        const toast = this.showToast('Importing profile...', 'success', 0);
+        let progress = null;
 
         try {
-            this.showToast('Importing profile...', 'success');
-            const res = await fetch('/api/profiles/import', {
+            // Create the job first so progress can be followed while uploading
+            const jobRes = await fetch('/api/imports', { method: 'POST' });
+            const { job_id: jobId } = await jobRes.json();
+            progress = new EventSource(`/api/jobs/${jobId}/events`);
+            const finished = new Promise((resolve) => {
+                progress.onmessage = (event) => {
+                    const job = JSON.parse(event.data);
+                    if (['succeeded', 'failed', 'cancelled'].includes(job.state)) {
+                        resolve(job);
+                    } else if (job.progress !== null) {
+                        const step = job.message === 'Extracting' ? 'Extracting' : 'Uploading';
+                        this.updateToast(toast, `${step} profile... ${Math.round(job.progress * 100)}%`);
+                    }
+                };
+            });
+
+            // Raw body: the server extracts while the upload is still arriving,
+            // then answers 202 and finishes the import in the background
+            const params = new URLSearchParams({ filename: file.name, job_id: jobId });
+            const res = await fetch(`/api/profiles/import?${params}`, {
                 method: 'POST',
-                body: formData
+                headers: { 'Content-Type': 'application/octet-stream' },
+                body: file
             });
 
-            const data = await res.json();
-            if (res.ok) {
-                this.showToast(`Profile "${data.name}" imported successfully`, 'success');
-                await this.loadProfiles();
-            } else {
+            if (!res.ok) {
+                const data = await res.json();
                 this.showToast(data.error || 'Failed to import profile', 'error');
+                return;
+            }
+
+            const job = await finished;
+            if (job.state === 'succeeded') {
+                this.showToast(`Profile "${job.result.name}" imported successfully`, 'success');
+                await this.refreshProfiles();
+            } else {
+                this.showToast(job.error || 'Failed to import profile', 'error');
             }
         } catch (error) {
             this.showToast('Failed to import profile', 'error');
         } finally {
+            if (progress) progress.close();
+            toast.remove();
             // Reset file input
             e.target.value = '';
         }
@@ -295,7 +628,7 @@ class App {
             if (res.ok) {
                 this.showToast(`Profile "${name}" created`, 'success');
                 this.hideModal();
-                await this.loadProfiles();
+                await this.refreshProfiles();
             } else {
                 this.showToast(data.error || 'Failed to create', 'error');
             }
@@ -304,7 +637,7 @@ class App {
         }
     }
 
-    showToast(message, type = 'success') {
+    showToast(message, type = 'success', duration = 4000) {
         const container = document.getElementById('toastContainer');
         const toast = document.createElement('div');
         toast.className = `toast toast-${type}`;
@@ -313,7 +646,13 @@ class App {
             <span class="toast-close" onclick="this.parentElement.remove()">×</span>
         `;
         container.appendChild(toast);
-        setTimeout(() => toast.remove(), 4000);
+        // duration 0 keeps the toast until the caller removes it
+        if (duration) setTimeout(() => toast.remove(), duration);
+        return toast;
+    }
+
+    updateToast(toast, message) {
+        toast.querySelector('.toast-message').textContent = message;
     }
 
     escape(text) {
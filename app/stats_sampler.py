@@ -0,0 +1,242 @@
+"""
+Stats Sampler - CPU, memory, network and block I/O history of running profiles
+"""
+import collections
+import os
+import threading
+import time
+import docker
+import cgroups
+from config import STATS_SAMPLE_INTERVAL, STATS_HISTORY
+
+
+def _read_int(path):
+    with open(path) as f:
+        return int(f.read().split()[0])
+
+
+def _read_keyed(path):
+    """'key value' lines (cpu.stat, memory.stat) as a dict of ints"""
+    values = {}
+    with open(path) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 2:
+                values[parts[0]] = int(parts[1])
+    return values
+
+
+def _read_io_v2(path):
+    """Total read and written bytes from a cgroup v2 io.stat"""
+    read = written = 0
+    with open(path) as f:
+        for line in f:
+            for field in line.split()[1:]:
+                key, _, value = field.partition('=')
+                if key == 'rbytes':
+                    read += int(value)
+                elif key == 'wbytes':
+                    written += int(value)
+    return read, written
+
+
+def _read_io_v1(path):
+    """Total read and written bytes from blkio.throttle.io_service_bytes"""
+    read = written = 0
+    with open(path) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[1] == 'Read':
+                read += int(parts[2])
+            elif len(parts) == 3 and parts[1] == 'Write':
+                written += int(parts[2])
+    return read, written
+
+
+def _read_net_dev(pid):
+    """Received and transmitted bytes of all non-loopback interfaces in a process's netns"""
+    rx = tx = 0
+    with open(f'/proc/{pid}/net/dev') as f:
+        for line in f.readlines()[2:]:
+            name, _, data = line.partition(':')
+            if name.strip() == 'lo':
+                continue
+            fields = data.split()
+            rx += int(fields[0])
+            tx += int(fields[8])
+    return rx, tx
+
+
+class _Target:
+    """Where to read one container's counters from"""
+    __slots__ = ('container_id', 'pid', 'cgroup_dir', 'v1_root', 'history', 'last')
+
+    def __init__(self, container_id, pid, cgroup_dir):
+        self.container_id = container_id
+        self.pid = pid
+        self.cgroup_dir = cgroup_dir
+        # cgroup v1 keeps each controller in its own hierarchy
+        self.v1_root = None
+        if not os.path.exists(os.path.join(cgroup_dir, 'cgroup.controllers')):
+            self.v1_root = cgroup_dir.split('/memory/', 1)
+        self.history = collections.deque(maxlen=STATS_HISTORY)
+        self.last = None  # (monotonic time, raw counters) of the previous read
+
+    def alive(self):
+        """The cached PID still belongs to this container (not restarted or reused)"""
+        try:
+            with open(f'/proc/{self.pid}/cgroup') as f:
+                return self.container_id in f.read()
+        except OSError:
+            return False
+
+    def _v1(self, controller, name):
+        root, rest = self.v1_root
+        return os.path.join(root, controller, rest, name)
+
+    def read(self):
+        """Raw cumulative counters: cpu (usec), memory (bytes), io and net (bytes)"""
+        if self.v1_root is None:
+            cpu_usec = _read_keyed(os.path.join(self.cgroup_dir, 'cpu.stat'))['usage_usec']
+            memory_stat = _read_keyed(os.path.join(self.cgroup_dir, 'memory.stat'))
+            rss = memory_stat.get('anon', 0)
+            memory = _read_int(os.path.join(self.cgroup_dir, 'memory.current'))
+            io_path = os.path.join(self.cgroup_dir, 'io.stat')
+            block = _read_io_v2(io_path) if os.path.exists(io_path) else (0, 0)
+        else:
+            cpu_usec = _read_int(self._v1('cpuacct', 'cpuacct.usage')) // 1000
+            memory_stat = _read_keyed(self._v1('memory', 'memory.stat'))
+            rss = memory_stat.get('total_rss', memory_stat.get('rss', 0))
+            memory = _read_int(self._v1('memory', 'memory.usage_in_bytes'))
+            io_path = self._v1('blkio', 'blkio.throttle.io_service_bytes')
+            block = _read_io_v1(io_path) if os.path.exists(io_path) else (0, 0)
+        try:
+            net = _read_net_dev(self.pid)
+        except OSError:
+            net = (0, 0)
+        return cpu_usec, rss, memory, block, net
+
+
+class StatsSampler:
+    """One thread sampling every running profile container from its cgroup files
+
+    Reading a few small files per container is far cheaper than the Docker
+    stats API (which takes about a second per call and per container), so
+    the cost stays flat as profiles are added. Each profile keeps the last
+    STATS_HISTORY samples in a ring buffer; history is dropped when the
+    profile stops.
+    """
+
+    def __init__(self, docker_mgr):
+        self.docker_mgr = docker_mgr
+        self._targets = {}  # profile name -> _Target
+        self._unavailable = set()  # profiles whose cgroup could not be found
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """Start the sampler thread (idempotent)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='stats-sampler', daemon=True)
+            self._thread.start()
+
+    def history(self, profile_name, since=None):
+        """Samples of a profile, oldest first; only those newer than since if given"""
+        with self._lock:
+            target = self._targets.get(profile_name)
+            samples = list(target.history) if target else []
+        if since is not None:
+            samples = [s for s in samples if s['t'] > since]
+        return samples
+
+    def summary(self, profile_name):
+        """Latest sample of a profile, or None"""
+        with self._lock:
+            target = self._targets.get(profile_name)
+            return dict(target.history[-1]) if target and target.history else None
+
+    def is_available(self, profile_name):
+        return profile_name not in self._unavailable
+
+    def _run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                self.sample()
+            except Exception as e:
+                print(f"⚠️  Stats sampling failed: {e}")
+            time.sleep(max(STATS_SAMPLE_INTERVAL - (time.monotonic() - started), 0.1))
+
+    def sample(self):
+        """Take one sample of every running profile"""
+        statuses = self.docker_mgr.get_status_snapshot()
+        running = {name for name, status in statuses.items() if status == 'running'}
+
+        with self._lock:
+            for name in list(self._targets):
+                if name not in running:
+                    del self._targets[name]
+            self._unavailable &= running
+            targets = dict(self._targets)
+
+        for name in running:
+            target = targets.get(name)
+            if target is None or not target.alive():
+                if name in self._unavailable and target is None:
+                    continue
+                target = self._resolve(name)
+                if target is None:
+                    continue
+            try:
+                self._record(target, target.read())
+            except (OSError, KeyError, ValueError):
+                # Exited between the status snapshot and the read
+                continue
+            with self._lock:
+                self._targets[name] = target
+
+    def _resolve(self, profile_name):
+        """Inspect a container once to find its host PID and cgroup"""
+        try:
+            container = self.docker_mgr.client.containers.get(
+                self.docker_mgr.get_container_name(profile_name))
+        except docker.errors.NotFound:
+            return None
+        pid = (container.attrs.get('State') or {}).get('Pid')
+        cgroup_dir = cgroups.find_container_cgroup(container.id)
+        if not pid or cgroup_dir is None:
+            self._unavailable.add(profile_name)
+            return None
+        return _Target(container.id, pid, cgroup_dir)
+
+    def _record(self, target, counters):
+        now = time.monotonic()
+        cpu_usec, rss, memory, (block_read, block_write), (net_rx, net_tx) = counters
+        sample = {
+            't': round(time.time(), 3),
+            'cpu_percent': None,
+            'rss_bytes': rss,
+            'memory_bytes': memory,
+            'net_rx_bytes': net_rx,
+            'net_tx_bytes': net_tx,
+            'block_read_bytes': block_read,
+            'block_write_bytes': block_write,
+            'net_rx_rate': None,
+            'net_tx_rate': None,
+            'block_read_rate': None,
+            'block_write_rate': None,
+        }
+        if target.last is not None:
+            last_time, last = target.last
+            elapsed = now - last_time
+            if elapsed > 0:
+                # Percent of one core, like `docker stats`
+                sample['cpu_percent'] = round(
+                    max(cpu_usec - last[0], 0) / (elapsed * 1e6) * 100, 1)
+                for key, value, previous in (('net_rx_rate', net_rx, last[4][0]),
+                                             ('net_tx_rate', net_tx, last[4][1]),
+                                             ('block_read_rate', block_read, last[3][0]),
+                                             ('block_write_rate', block_write, last[3][1])):
+                    sample[key] = round(max(value - previous, 0) / elapsed)
+        target.last = (now, counters)
+        target.history.append(sample)
@@ -0,0 +1,171 @@
+"""
+Stealth Identity - Per-profile spoofed hardware, user agent and Chromium flags
+"""
+import json
+import os
+import random
+import threading
+
+HARDWARE_FILE = 'hardware-signature.json'
+USER_AGENT_FILE = 'user-agent.txt'
+
+RAM_SIZES = (4, 8, 16, 32)
+GPU_MODELS = ("NVIDIA GeForce GTX 1050", "NVIDIA GeForce GTX 1060", "AMD Radeon RX 580",
+              "Intel UHD Graphics 630")
+RESOLUTIONS = ("1920x1080", "2560x1440", "1366x768", "1440x900")
+TIMEZONES = ("America/New_York", "America/Los_Angeles", "Europe/London", "Asia/Tokyo")
+# Strictly Linux user agents: spoofing Windows on a Linux container leaks via
+# fonts and canvas, a "normal Linux user" is safer than a "fake Windows user"
+CHROME_VERSIONS = ("120.0.6099.129", "121.0.6167.85", "122.0.6261.94", "119.0.6045.199")
+USER_AGENT_TEMPLATE = ("Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+                       "(KHTML, like Gecko) Chrome/{version} Safari/537.36")
+
+STEALTH_FLAGS = [
+    "--no-first-run",
+    "--no-default-browser-check",
+    "--disable-features=VizDisplayCompositor",
+    "--disable-webgl-image-chromium",
+    "--disable-webgl2",
+    "--disable-accelerated-2d-canvas",
+    "--disable-background-networking",
+    "--disable-background-timer-throttling",
+    "--disable-backgrounding-occluded-windows",
+    "--disable-renderer-backgrounding",
+    "--disable-sync",
+    "--disable-translate",
+    "--disable-dev-shm-usage",
+    "--disable-logging",
+    "--log-level=3",
+    "--disable-blink-features=AutomationControlled",
+    "--disable-infobars",
+    "--start-maximized",
+    "--test-type",
+]
+
+_random = random.SystemRandom()
+
+
+def generate_identity(profile_name):
+    """A new random hardware signature (the hardware-signature.json layout)"""
+    return {
+        'profile': profile_name,
+        'hardware': {
+            'cpu_cores': _random.randint(2, 16),
+            'ram_gb': _random.choice(RAM_SIZES),
+            'gpu_model': _random.choice(GPU_MODELS),
+            'screen_resolution': _random.choice(RESOLUTIONS),
+            'mac_address': '02:' + ':'.join(f'{_random.randrange(256):02x}' for _ in range(5)),
+        },
+        'system': {
+            'timezone': _random.choice(TIMEZONES),
+            'hostname': 'DESKTOP-' + ''.join(_random.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789')
+                                             for _ in range(7)),
+        },
+    }
+
+
+def _write_atomic(path, text):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+class StealthIdentities:
+    """Loads or creates each profile's identity and turns it into launch options
+
+    The identity lives in the profile directory (hardware-signature.json and
+    user-agent.txt, the files the image's launch scripts used to write), so it
+    travels with exports, snapshots and restores. Missing files or fields are
+    generated once and written back; parsed identities are cached and only
+    re-read when one of the files changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cache = {}  # profile_dir -> (file mtimes, identity, user agent)
+
+    def _file_key(self, profile_dir):
+        key = []
+        for name in (HARDWARE_FILE, USER_AGENT_FILE):
+            try:
+                key.append(os.stat(os.path.join(profile_dir, name)).st_mtime_ns)
+            except FileNotFoundError:
+                key.append(None)
+        return tuple(key)
+
+    def get(self, profile_name, profile_dir):
+        """(identity dict, user agent) of a profile, creating whatever is missing"""
+        with self._lock:
+            key = self._file_key(profile_dir)
+            cached = self._cache.get(profile_dir)
+            if cached and cached[0] == key and None not in key:
+                return cached[1], cached[2]
+
+            identity, user_agent = self._load_or_create(profile_name, profile_dir)
+            self._cache[profile_dir] = (self._file_key(profile_dir), identity, user_agent)
+            return identity, user_agent
+
+    def _load_or_create(self, profile_name, profile_dir):
+        hardware_path = os.path.join(profile_dir, HARDWARE_FILE)
+        user_agent_path = os.path.join(profile_dir, USER_AGENT_FILE)
+        generated = generate_identity(profile_name)
+        try:
+            with open(hardware_path) as f:
+                identity = json.load(f)
+            if not isinstance(identity, dict):
+                raise ValueError('not an object')
+        except FileNotFoundError:
+            identity = {}
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Unreadable {HARDWARE_FILE} for {profile_name}, generating a new one: {e}")
+            identity = {}
+
+        # Fill in fields missing from older or hand-edited files
+        changed = False
+        for section in ('hardware', 'system'):
+            current = identity.get(section)
+            if not isinstance(current, dict):
+                current = identity[section] = {}
+            for field, value in generated[section].items():
+                if field not in current:
+                    current[field] = value
+                    changed = True
+        if 'profile' not in identity:
+            identity['profile'] = profile_name
+            changed = True
+        if changed:
+            _write_atomic(hardware_path, json.dumps(identity, indent=4) + '\n')
+
+        try:
+            with open(user_agent_path) as f:
+                user_agent = f.read().strip()
+        except FileNotFoundError:
+            user_agent = ''
+        if not user_agent:
+            user_agent = USER_AGENT_TEMPLATE.format(version=_random.choice(CHROME_VERSIONS))
+            _write_atomic(user_agent_path, user_agent + '\n')
+        return identity, user_agent
+
+    def launch_options(self, profile_name, profile_dir):
+        """(environment, Chromium flags) that apply a profile's identity"""
+        identity, user_agent = self.get(profile_name, profile_dir)
+        hardware, system = identity['hardware'], identity['system']
+        resolution = str(hardware['screen_resolution'])
+        environment = {
+            'CHROME_CPU_CORES': str(hardware['cpu_cores']),
+            'CHROME_RAM_GB': str(hardware['ram_gb']),
+            'CHROME_RESOLUTION': resolution,
+            'CHROME_USER_AGENT': user_agent,
+            'TZ': system['timezone'],
+            'HOSTNAME': system['hostname'],
+        }
+        flags = STEALTH_FLAGS + [
+            f"--user-agent={user_agent}",
+            f"--window-size={resolution.replace('x', ',')}",
+        ]
+        return environment, flags
+
+    def forget(self, profile_dir):
+        with self._lock:
+            self._cache.pop(profile_dir, None)
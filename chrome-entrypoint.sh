@@ -0,0 +1,9 @@
+#!/bin/sh
+# Container entrypoint: the manager (app/stealth_identity.py) passes the
+# profile's identity as environment variables and the stealth flags as
+# arguments, so all that is left here is to exec Chromium.
+unset DOCKER_CONTAINER container
+if [ -n "$DISPLAY" ] && [ ! -S "/tmp/.X11-unix/X${DISPLAY##*:}" ]; then
+    echo "⚠️  Warning: X11 socket not found for display $DISPLAY" >&2
+fi
+exec chromium-browser "$@"
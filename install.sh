@@ -80,6 +80,12 @@ fi
 
 echo -e "${GREEN}✅ curl found${NC}"
 
+# xdotool lets launches wait for the browser window and raise running profiles
+if ! command -v xdotool &> /dev/null && ! command -v wmctrl &> /dev/null; then
+    echo -e "${YELLOW}⚠️  xdotool not found, installing...${NC}"
+    sudo apt install -y xdotool
+fi
+
 echo ""
 echo "📦 Installing Python dependencies..."
 
@@ -109,11 +115,14 @@ mkdir -p "$INSTALL_DIR"
 echo "📋 Copying application files..."
 cp -r "$SCRIPT_DIR/app" "$INSTALL_DIR/"
 cp "$SCRIPT_DIR/Dockerfile" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/chrome-entrypoint.sh" "$INSTALL_DIR/"
 cp "$SCRIPT_DIR/requirements.txt" "$INSTALL_DIR/"
 mkdir -p "$INSTALL_DIR/scripts"
 cp "$SCRIPT_DIR/scripts/chrome-launcher.sh" "$INSTALL_DIR/scripts/"
+cp "$SCRIPT_DIR/scripts/chrome-launch.py" "$INSTALL_DIR/scripts/"
 cp "$SCRIPT_DIR/scripts/startup.sh" "$INSTALL_DIR/scripts/"
 chmod +x "$INSTALL_DIR/scripts/chrome-launcher.sh"
+chmod +x "$INSTALL_DIR/scripts/chrome-launch.py"
 chmod +x "$INSTALL_DIR/scripts/startup.sh"
 
 echo -e "${GREEN}✅ Files copied to $INSTALL_DIR${NC}"
@@ -121,7 +130,16 @@ echo -e "${GREEN}✅ Files copied to $INSTALL_DIR${NC}"
 echo ""
 echo "🐳 Building Docker image..."
 cd "$INSTALL_DIR"
-DOCKER_BUILDKIT=1 docker build -t isolated-chrome .
+# Tag and label the image exactly like the manager's own builds, so it
+# recognises this image as current instead of building it again
+IMAGE_INFO=$(cd "$INSTALL_DIR/app" && python3 -c '
+from config import DOCKER_IMAGE_NAME, IMAGE_CONTEXT_LABEL
+from docker_manager import image_context_hash, image_tag_for
+context_hash = image_context_hash()
+print(image_tag_for(context_hash), f"{IMAGE_CONTEXT_LABEL}={context_hash}", f"{DOCKER_IMAGE_NAME}:latest")
+')
+read -r IMAGE_TAG IMAGE_LABEL IMAGE_LATEST <<< "$IMAGE_INFO"
+DOCKER_BUILDKIT=1 docker build --label "$IMAGE_LABEL" -t "$IMAGE_TAG" -t "$IMAGE_LATEST" .
 
 echo ""
 echo "📁 Setting up directories..."
@@ -0,0 +1,532 @@
+#!/usr/bin/env python3
+"""
+Benchmark - Reproducible performance measurements without a Docker daemon
+
+Runs the manager against a fake Docker client with a configurable per-call
+latency and against synthetic profile trees (thousands of small cache files
+plus databases and extensions, generated from a fixed seed). HOME is
+redirected to a temporary directory, so nothing outside it is touched.
+
+Usage:
+    scripts/benchmark.py --output results.json
+    scripts/benchmark.py --compare baseline.json --threshold 0.15
+
+Results are JSON. Metric names end in their unit; those ending in _per_s or
+_mb_s are throughputs (higher is better), everything else is a latency or
+duration (lower is better). --compare exits with status 1 when a p50/p95
+latency or a throughput is worse than the baseline by more than the
+threshold. Worst samples and per-phase breakdowns are printed but not gated
+on. Compare runs made with the same arguments on the same machine; small
+--scale or --repeat values make the numbers noisy enough to need a larger
+threshold.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HIGHER_IS_BETTER = ('_per_s', '_mb_s')
+
+# Synthetic profile shape: (directory, file count, min size, max size) per
+# unit of --scale; modelled on a Chromium profile after a few weeks of use
+PROFILE_SHAPE = [
+    ('Default/Cache/Cache_Data', 1500, 512, 48 * 1024),
+    ('Default/Code Cache/js', 400, 1024, 64 * 1024),
+    ('Default/Code Cache/wasm', 40, 4 * 1024, 256 * 1024),
+    ('Default/GPUCache', 8, 1024, 512 * 1024),
+    ('Default/Service Worker/CacheStorage', 120, 1024, 128 * 1024),
+    ('Default/IndexedDB/https_example.com_0.indexeddb.leveldb', 30, 16 * 1024, 2 * 1024 * 1024),
+    ('Default/Local Storage/leveldb', 12, 1024, 512 * 1024),
+    ('Default/Extensions', 300, 256, 96 * 1024),
+    ('Default', 25, 16 * 1024, 4 * 1024 * 1024),
+]
+
+
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+# --- Fake Docker client ------------------------------------------------------
+
+class FakeDocker:
+    """Just enough of docker.DockerClient for the manager, every call taking latency seconds"""
+
+    def __init__(self, latency, errors):
+        self.latency = latency
+        self.errors = errors
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._ids = itertools.count(1)
+        self.containers = _FakeContainers(self)
+        self.images = _FakeImages(self)
+        self.api = types.SimpleNamespace(hooks={'response': []})
+
+    def call(self):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def ping(self):
+        self.call()
+        return True
+
+    def events(self, **kwargs):
+        self.call()
+        return self._no_events()
+
+    def _no_events(self):
+        # Nothing happens outside the benchmark's own calls
+        while not self._closed.wait(3600):
+            pass
+        yield from ()
+
+    def close(self):
+        self._closed.set()
+
+
+class _FakeContainer:
+    def __init__(self, docker, name, labels, image):
+        self._docker = docker
+        self.id = f'{next(docker._ids):064x}'
+        self.name = name
+        self.labels = labels or {}
+        self.image = image
+        self.status = 'running'
+        self.attrs = {'Id': self.id, 'Names': [f'/{name}'], 'Image': image,
+                      'Config': {'Labels': self.labels}, 'State': {'Pid': 0}}
+
+    def _set(self, status):
+        self._docker.call()
+        self.status = status
+
+    def start(self):
+        self._set('running')
+
+    def stop(self, timeout=None):
+        self._set('exited')
+
+    def pause(self):
+        self._set('paused')
+
+    def unpause(self):
+        self._set('running')
+
+    def reload(self):
+        self._docker.call()
+
+    def remove(self, force=False):
+        self._docker.call()
+        self._docker.containers._by_name.pop(self.name, None)
+
+    def top(self, **kwargs):
+        self._docker.call()
+        return {'Processes': [['1', 'chromium-browser']]}
+
+
+class _FakeContainers:
+    def __init__(self, docker):
+        self._docker = docker
+        self._by_name = {}
+
+    def get(self, name):
+        self._docker.call()
+        container = self._by_name.get(name)
+        if container is None:
+            container = next((c for c in self._by_name.values() if c.id == name), None)
+        if container is None:
+            raise self._docker.errors.NotFound(f'No such container: {name}')
+        return container
+
+    def list(self, all=False, sparse=False, filters=None, **kwargs):
+        self._docker.call()
+        return [c for c in list(self._by_name.values()) if all or c.status == 'running']
+
+    def run(self, image, name=None, labels=None, **kwargs):
+        self._docker.call()
+        container = _FakeContainer(self._docker, name, labels, image)
+        self._by_name[name] = container
+        return container
+
+
+class _FakeImages:
+    def __init__(self, docker):
+        self._docker = docker
+
+    def get(self, name):
+        self._docker.call()
+        return types.SimpleNamespace(id='sha256:' + '0' * 64, tags=[name], labels={})
+
+    def list(self, *args, **kwargs):
+        self._docker.call()
+        return []
+
+    def remove(self, *args, **kwargs):
+        self._docker.call()
+
+
+# --- Synthetic data ----------------------------------------------------------
+
+def make_profile(profile_dir, rng, scale):
+    """Create a synthetic profile; returns (files, bytes)"""
+    files = total = 0
+    for directory, count, min_size, max_size in PROFILE_SHAPE:
+        path = os.path.join(profile_dir, directory)
+        os.makedirs(path, exist_ok=True)
+        for index in range(max(1, int(count * scale))):
+            # Log-uniform sizes: mostly small files, a few large ones
+            size = int(min_size * (max_size / min_size) ** rng.random())
+            with open(os.path.join(path, f'f{index:05d}'), 'wb') as f:
+                # Half random, half zeros: compresses like real profile data
+                f.write(rng.randbytes(size // 2) + bytes(size - size // 2))
+            files += 1
+            total += size
+    os.makedirs(os.path.join(profile_dir, 'Downloads'), exist_ok=True)
+    return files, total
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return {
+        'p50_ms': round(statistics.median(samples) * 1000, 3),
+        'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 3),
+        'max_ms': round(samples[-1] * 1000, 3),
+    }
+
+
+# --- Benchmarks --------------------------------------------------------------
+
+def bench_list_profiles(env, args):
+    """GET /api/profiles latency as the number of profiles grows
+
+    'cold' requests rebuild the list snapshot (registry query, status and
+    size lookups); 'cached' ones are served from the snapshot, as polling
+    clients within PROFILE_FEED_TTL are.
+    """
+    client = env.app.app.test_client()
+    env.app.profile_feed.invalidate()
+    baseline = len(client.get('/api/profiles').json['profiles'])
+    results = {}
+    existing = 0
+    for count in args.profile_counts:
+        for index in range(existing, count):
+            os.makedirs(os.path.join(env.profiles_dir, f'list-{index:04d}', 'Downloads'))
+        existing = count
+        env.app.registry.reconcile()
+
+        def timed_get(cold):
+            if cold:
+                env.app.profile_feed.invalidate()
+            started = time.perf_counter()
+            response = client.get('/api/profiles')
+            elapsed = time.perf_counter() - started
+            assert response.status_code == 200
+            assert len(response.json['profiles']) == baseline + count, \
+                f"listed {len(response.json['profiles'])} profiles, expected {baseline + count}"
+            return elapsed
+
+        timed_get(cold=True)  # Warm up caches and queue size scans
+        cold = [timed_get(cold=True) for _ in range(args.repeat)]
+        cached = [timed_get(cold=False) for _ in range(args.repeat)]
+        results[f'profiles_{count}'] = {'cold': percentiles(cold), 'cached': percentiles(cached)}
+        log(f"  /api/profiles with {count} profiles: cold {results[f'profiles_{count}']['cold']['p50_ms']} ms, "
+            f"cached {results[f'profiles_{count}']['cached']['p50_ms']} ms")
+    for index in range(existing):
+        shutil.rmtree(os.path.join(env.profiles_dir, f'list-{index:04d}'))
+        env.app.registry.remove(f'list-{index:04d}')
+    return results
+
+
+def bench_profile_size(env, args):
+    """Profile size scan: cold (new index) and warm (nothing changed / one dir changed)"""
+    from size_index import ProfileSizeIndex
+    index = ProfileSizeIndex()
+    profile_dir = env.sample_profile
+    started = time.perf_counter()
+    size = index.scan(profile_dir)
+    cold = time.perf_counter() - started
+
+    warm = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        index.scan(profile_dir)
+        warm.append(time.perf_counter() - started)
+
+    touched = []
+    cache_dir = os.path.join(profile_dir, 'Default/Cache/Cache_Data')
+    for i in range(args.repeat):
+        with open(os.path.join(cache_dir, f'new{i}'), 'wb') as f:
+            f.write(b'x')
+        started = time.perf_counter()
+        index.scan(profile_dir)
+        touched.append(time.perf_counter() - started)
+        os.remove(os.path.join(cache_dir, f'new{i}'))
+    return {
+        'bytes': size,
+        'cold_scan_ms': round(cold * 1000, 3),
+        'warm_scan': percentiles(warm),
+        'changed_dir_scan': percentiles(touched),
+    }
+
+
+def bench_archive(env, args):
+    """Export to file and import back, per codec (median of --archive-repeat runs)"""
+    from jobs import Job
+    from profile_archive import write_profile_export, receive_profile_upload, zstandard
+    codecs = ['store', 'deflate'] + (['zstd'] if zstandard else [])
+    data_mb = env.sample_bytes / (1024 * 1024)
+    results = {}
+    for codec in codecs:
+        export_times, import_times = [], []
+        for _ in range(args.archive_repeat):
+            source = os.path.join(env.profiles_dir, 'archive-src')
+            shutil.copytree(env.sample_profile, source)
+            archive = os.path.join(env.home, f'export.{codec}')
+            started = time.perf_counter()
+            size = write_profile_export(source, archive, Job('export'), codec)
+            export_times.append(time.perf_counter() - started)
+            shutil.rmtree(source)
+
+            started = time.perf_counter()
+            with open(archive, 'rb') as f:
+                pending = receive_profile_upload(f, os.path.basename(archive), Job('import'))
+                _name, imported_dir = pending.complete()
+            import_times.append(time.perf_counter() - started)
+            shutil.rmtree(imported_dir)
+            os.remove(archive)
+
+        export_seconds = statistics.median(export_times)
+        import_seconds = statistics.median(import_times)
+        results[codec] = {
+            'archive_bytes': size,
+            'export_s': round(export_seconds, 4),
+            'export_mb_s': round(data_mb / export_seconds, 2),
+            'import_s': round(import_seconds, 4),
+            'import_mb_s': round(data_mb / import_seconds, 2),
+        }
+        log(f"  {codec}: export {results[codec]['export_mb_s']} MB/s, "
+            f"import {results[codec]['import_mb_s']} MB/s")
+    return results
+
+
+def bench_lifecycle(env, args):
+    """start_container / stop_container latency with many profiles at once"""
+    from bulk import run_bulk
+    from metrics import LAUNCH_PHASE_SECONDS
+    docker_mgr = env.app.docker_mgr
+    results = {}
+    for concurrency in args.concurrency:
+        names = [f'life-{concurrency}-{i:03d}' for i in range(args.lifecycle_profiles)]
+        for name in names:
+            os.makedirs(os.path.join(env.profiles_dir, name, 'Downloads'))
+            # Created with the profile in real use; creating it here would also
+            # try to download the icon into the repository
+            with open(docker_mgr.desktop_mgr.get_desktop_file_path(name), 'w') as f:
+                f.write('[Desktop Entry]\n')
+        for phase, operation in (('create', docker_mgr.start_container),
+                                 ('stop', docker_mgr.stop_container),
+                                 ('restart', docker_mgr.start_container),
+                                 ('stop_again', docker_mgr.stop_container)):
+            samples = []
+            phases_before = LAUNCH_PHASE_SECONDS.totals()
+            calls_before = env.docker.calls
+            started = time.perf_counter()
+            for result in run_bulk(names, operation, concurrency):
+                if 'error' in result:
+                    raise RuntimeError(f'{phase} of {result["name"]} failed: {result["error"]}')
+                samples.append(result['elapsed'])
+            wall = time.perf_counter() - started
+            results[f'c{concurrency}_{phase}'] = {
+                **percentiles(samples),
+                'ops_per_s': round(len(names) / wall, 2),
+                'docker_calls_per_op': round((env.docker.calls - calls_before) / len(names), 2),
+            }
+            # Mean time per launch phase, from the manager's own metrics
+            for (phase_name,), (total, count) in LAUNCH_PHASE_SECONDS.totals().items():
+                before_total, before_count = phases_before.get((phase_name,), (0.0, 0))
+                if count > before_count:
+                    results[f'c{concurrency}_{phase}'][f'phase_{phase_name}_mean_ms'] = round(
+                        (total - before_total) / (count - before_count) * 1000, 3)
+        log(f"  concurrency {concurrency}: create p50 "
+            f"{results[f'c{concurrency}_create']['p50_ms']} ms, "
+            f"{results[f'c{concurrency}_create']['ops_per_s']} starts/s")
+        for name in names:
+            docker_mgr.remove_container(name)
+            shutil.rmtree(os.path.join(env.profiles_dir, name))
+            os.remove(docker_mgr.desktop_mgr.get_desktop_file_path(name))
+    return results
+
+
+BENCHMARKS = {
+    'list_profiles': bench_list_profiles,
+    'profile_size': bench_profile_size,
+    'archive': bench_archive,
+    'lifecycle': bench_lifecycle,
+}
+
+
+# --- Setup, output and comparison --------------------------------------------
+
+def setup(args):
+    """Redirect HOME, build the synthetic profile and import the app with the fake client"""
+    home = tempfile.mkdtemp(prefix='chrome-benchmark-')
+    os.environ['HOME'] = home
+    os.environ.pop('DISPLAY', None)
+    sys.path.insert(0, os.path.join(REPO_DIR, 'app'))
+
+    import docker.errors
+    fake = FakeDocker(args.latency_ms / 1000, docker.errors)
+
+    import docker_manager
+
+    class BenchmarkDockerManager(docker_manager.DockerManager):
+        def __init__(self, registry=None, **kwargs):
+            super().__init__(registry, client=fake, **kwargs)
+
+    docker_manager.DockerManager = BenchmarkDockerManager
+    import config
+    os.makedirs(config.CHROME_PROFILES_DIR, exist_ok=True)
+    sample_profile = os.path.join(home, 'sample-profile')
+    log(f"📁 Generating synthetic profile (scale {args.scale}, seed {args.seed})...")
+    files, size = make_profile(sample_profile, random.Random(args.seed), args.scale)
+    log(f"   {files} files, {size / (1024 * 1024):.1f} MB")
+
+    import app
+    deadline = time.monotonic() + 30
+    while not app.docker_mgr.is_ready:
+        if time.monotonic() > deadline:
+            raise RuntimeError(f'Manager did not become ready: {app.docker_mgr.readiness}')
+        time.sleep(0.05)
+    return types.SimpleNamespace(home=home, app=app, docker=fake,
+                                 profiles_dir=config.CHROME_PROFILES_DIR,
+                                 sample_profile=sample_profile, sample_files=files,
+                                 sample_bytes=size)
+
+
+def flatten(results, prefix=''):
+    flat = {}
+    for key, value in results.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            flat.update(flatten(value, f'{name}.'))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def compare(current, baseline, threshold, min_delta_ms):
+    """Print metric changes; returns the names of regressed metrics"""
+    now, before = flatten(current['results']), flatten(baseline['results'])
+    regressions = []
+    log(f"{'metric':60} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name in sorted(now.keys() & before.keys()):
+        old, new = before[name], now[name]
+        if not old or name.endswith('_bytes') or name.endswith('.bytes'):
+            continue
+        change = (new - old) / old
+        worse = -change if name.endswith(HIGHER_IS_BETTER) else change
+        # Single worst samples, per-phase breakdowns (diagnostics for a
+        # regression in the totals) and small absolute jitter are not gated on
+        noisy = (name.endswith('max_ms') or '.phase_' in name
+                 or (name.endswith('_ms') and abs(new - old) < min_delta_ms))
+        flag = ''
+        if worse > threshold and not noisy:
+            regressions.append(name)
+            flag = '  ❌'
+        log(f"{name:60} {old:>12} {new:>12} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', '-C', REPO_DIR, 'rev-parse', '--short', 'HEAD'],
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip(),
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help='benchmarks to run')
+    parser.add_argument('--latency-ms', type=float, default=5.0, help='fake Docker API call latency')
+    parser.add_argument('--scale', type=float, default=1.0, help='synthetic profile size factor')
+    parser.add_argument('--seed', type=int, default=1, help='seed for the synthetic data')
+    parser.add_argument('--repeat', type=int, default=20, help='samples per latency measurement')
+    parser.add_argument('--archive-repeat', type=int, default=3, help='runs per export/import codec')
+    parser.add_argument('--profile-counts', type=int, nargs='+', default=[10, 100, 500])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--lifecycle-profiles', type=int, default=32)
+    parser.add_argument('--output', help='write results JSON here (default: stdout)')
+    parser.add_argument('--compare', metavar='BASELINE', help='results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='relative change counted as a regression (default 0.10)')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                        help='latency changes smaller than this are never regressions')
+    parser.add_argument('--keep', action='store_true', help='keep the temporary HOME')
+    args = parser.parse_args()
+
+    # The manager logs with print(); keep stdout for the results
+    stdout, sys.stdout = sys.stdout, sys.stderr
+    env = setup(args)
+    results = {}
+    try:
+        for name in args.only or list(BENCHMARKS):
+            log(f"⏱️  {name}")
+            results[name] = BENCHMARKS[name](env, args)
+    finally:
+        if args.keep:
+            log(f"ℹ️  Kept temporary HOME at {env.home}")
+        else:
+            shutil.rmtree(env.home, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'args': {k: v for k, v in vars(args).items()
+                     if k not in ('output', 'compare', 'threshold', 'min_delta_ms', 'keep')},
+            'sample_profile': {'files': env.sample_files, 'bytes': env.sample_bytes},
+        },
+        'results': results,
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+        log(f"✅ Results written to {args.output}")
+    else:
+        stdout.write(text + '\n')
+        stdout.flush()
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline['meta'].get('args') != report['meta']['args']:
+            log("⚠️  Baseline was run with different arguments; numbers may not be comparable")
+        regressions = compare(report, baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            log(f"❌ {len(regressions)} metric(s) regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+        log("✅ No regressions")
+    # Background threads of the app (samplers, event stream) are daemons
+    sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
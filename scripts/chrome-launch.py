@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Launch isolated Chrome profiles (the Exec target of their desktop entries)
+
+    chrome-launch.py [--timeout SECONDS] [--quiet] PROFILE [PROFILE ...]
+
+Asks the manager to start each profile and waits until its window is up
+(POST /api/profiles/<name>/launch); a profile that already runs gets its
+window raised instead. Talks to the manager over its Unix socket, falling
+back to http://127.0.0.1:5000, with one connection for all profiles
+($CHROME_MANAGER_SOCKET overrides the socket path).
+
+Exit status: 0 when every profile is ready, 2 if the only failures were
+timeouts, 1 otherwise. Failures are also shown as desktop notifications, since
+desktop entries run without a terminal.
+
+Standard library only, so it starts fast and needs no virtualenv.
+"""
+import argparse
+import http.client
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import urllib.parse
+
+# Must match LAUNCHER_SOCKET in app/config.py
+SOCKET_PATH = os.path.join(os.path.expanduser('~/.local/state/chrome-isolation-manager'),
+                           'chrome-isolation-manager.sock')
+HTTP_HOST = '127.0.0.1'
+HTTP_PORT = 5000
+DEFAULT_TIMEOUT = 30
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP/1.1 over a Unix domain socket"""
+
+    def __init__(self, path, timeout):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def open_connection(timeout):
+    # The socket is preferred: no TCP setup and only this user can connect
+    socket_path = os.environ.get('CHROME_MANAGER_SOCKET', SOCKET_PATH)
+    if not os.path.exists(socket_path):
+        reason = 'it does not exist'
+    else:
+        connection = UnixHTTPConnection(socket_path, timeout)
+        try:
+            connection.connect()
+            return connection
+        except OSError as e:
+            connection.close()  # Stale socket file, manager gone or restarting
+            reason = e
+    print(f'warning: cannot use the manager socket {socket_path} ({reason}); '
+          f'falling back to http://{HTTP_HOST}:{HTTP_PORT}', file=sys.stderr)
+    return http.client.HTTPConnection(HTTP_HOST, HTTP_PORT, timeout=timeout)
+
+
+def launch(connection, profile_name, timeout):
+    """(HTTP status, response body) of one launch request"""
+    path = (f'/api/profiles/{urllib.parse.quote(profile_name, safe="")}/launch'
+            f'?timeout={timeout:g}')
+    connection.request('POST', path, headers={'Content-Length': '0'})
+    response = connection.getresponse()
+    body = response.read()
+    try:
+        return response.status, json.loads(body)
+    except ValueError:
+        return response.status, {'error': f'HTTP {response.status}'}
+
+
+def notify(message):
+    print(message, file=sys.stderr)
+    if shutil.which('notify-send'):
+        subprocess.run(['notify-send', '--app-name=Chrome Isolation Manager',
+                        '--icon=dialog-error', 'Chrome profile', message], check=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Launch isolated Chrome profiles')
+    parser.add_argument('profiles', nargs='+', metavar='PROFILE')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT,
+                        help=f'seconds to wait for each profile (default {DEFAULT_TIMEOUT})')
+    parser.add_argument('--quiet', action='store_true', help='only report failures')
+    args = parser.parse_args()
+
+    # The manager answers at the latest when its own timeout expires
+    connection = open_connection(args.timeout + 10)
+    exit_code = 0
+    try:
+        for profile_name in args.profiles:
+            try:
+                status, data = launch(connection, profile_name, args.timeout)
+            except (OSError, http.client.HTTPException) as e:
+                notify(f'Cannot reach the Chrome Isolation Manager: {e}')
+                return 1
+            if status == 200:
+                if not args.quiet:
+                    print(f'{profile_name}: {data["status"]} '
+                          f'(ready: {data["ready"]}, {data["elapsed"]}s)')
+                continue
+            notify(f'{profile_name}: {data.get("error", "launch failed")}')
+            exit_code = 1 if status != 504 else exit_code or 2
+    finally:
+        connection.close()
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,22 +1,13 @@
 #!/bin/bash
 
 # Chrome Launcher Script
-# This script is called by desktop entries to launch isolated Chrome profiles
+# This script is called by desktop entries to launch isolated Chrome profiles.
+# It starts the profile (or raises its window) and waits until it is ready;
+# see chrome-launch.py.
 
-PROFILE_NAME="$1"
-
-if [ -z "$PROFILE_NAME" ]; then
+if [ -z "$1" ]; then
     echo "Usage: $0 [ProfileName]"
     exit 1
 fi
 
-# API endpoint
-API_URL="http://127.0.0.1:5000/api/profiles/${PROFILE_NAME}/start"
-
-# Start the container via API
-curl -s -X POST "$API_URL" > /dev/null 2>&1
-
-# Give it a moment to start
-sleep 1
-
-exit 0
+exec python3 "$(dirname "$(readlink -f "$0")")/chrome-launch.py" --quiet "$1"
@@ -70,7 +70,8 @@ fi
 echo ""
 echo "🖼️  Removing Docker image..."
 if docker images | grep -q "isolated-chrome"; then
-    docker rmi isolated-chrome > /dev/null 2>&1 || true
+    # All content-hash tags, not only :latest
+    docker images -q isolated-chrome | sort -u | xargs docker rmi -f > /dev/null 2>&1 || true
     echo -e "${GREEN}✅ Docker image removed${NC}"
 else
     echo "  Image not found"